@@ -0,0 +1,77 @@
+"""Benchmark batched segmentation against the per-image rembg path.
+
+Usage:
+    python benchmarks/bench_batch_inference.py [--model u2net] [--batch-size 4] [--repeat 3]
+
+Images are built from the bundled samples, resized the same way the app does
+before inference, and run through ``rembg.remove`` one at a time and through
+``remove_batch`` for batches of 1, 4 and 10 images.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from PIL import Image
+from rembg import new_session, remove
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bg_remove_core.segmentation import DEFAULT_BATCH_SIZE, remove_batch  # noqa: E402
+
+SAMPLES = ["zebra.jpg", "wallaby.png"]
+BATCH_COUNTS = [1, 4, 10]
+MAX_IMAGE_SIZE = 2000
+
+
+def load_samples(count):
+    root = os.path.join(os.path.dirname(__file__), "..")
+    images = []
+    for i in range(count):
+        img = Image.open(os.path.join(root, SAMPLES[i % len(SAMPLES)]))
+        img.thumbnail((MAX_IMAGE_SIZE, MAX_IMAGE_SIZE), Image.BICUBIC)
+        images.append(img)
+    return images
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="u2net")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    session = new_session(args.model)
+    # Warm up graph optimisation so the first measurement is not penalised
+    remove(load_samples(1)[0], session=session)
+
+    print(f"model={args.model} batch_size={args.batch_size} repeat={args.repeat}")
+    print(
+        f"{'images':>6} | {'per-image (s)':>13} | {'batched (s)':>11} | {'speed-up':>8}"
+    )
+    print("-" * 50)
+    for count in BATCH_COUNTS:
+        images = load_samples(count)
+        per_image = best_of(
+            args.repeat, lambda: [remove(img, session=session) for img in images]
+        )
+        batched = best_of(
+            args.repeat, lambda: remove_batch(images, session, args.batch_size)
+        )
+        print(
+            f"{count:>6} | {per_image:>13.3f} | {batched:>11.3f} | {per_image / batched:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Benchmark the reduced-scale blur against a full-resolution Gaussian blur.
+
+Usage:
+    python benchmarks/bench_blur.py [--size 2000] [--repeat 3]
+
+For radii across the range the app offers, the zebra sample is blurred at
+working resolution twice: the previous way (BICUBIC resize to
+the target size, then GaussianBlur at full resolution) and with
+``pyramid_blur``. The last column is the PSNR of the reduced-scale result
+against the full-resolution one.
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bg_remove_core.blur import pyramid_blur, reduction_factor  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+RADII = (5, 6, 10, 15, 25, 35, 50)
+
+
+def full_blur(image, size, radius):
+    """The blur apply_background_replacement used before."""
+    return image.resize(size, Image.BICUBIC).filter(
+        ImageFilter.GaussianBlur(radius=radius)
+    )
+
+
+def psnr(a, b):
+    diff = np.asarray(a, dtype=np.float64) - np.asarray(b, dtype=np.float64)
+    mse = np.mean(diff * diff)
+    return math.inf if mse == 0 else 10 * math.log10(255 * 255 / mse)
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    original = Image.open(os.path.join(ROOT, "zebra.jpg")).convert("RGB")
+    working = original.copy()
+    working.thumbnail((args.size, args.size), Image.BICUBIC)
+    size = working.size
+
+    print(
+        f"source={original.width}x{original.height} target={size[0]}x{size[1]} repeat={args.repeat}"
+    )
+    print(
+        f"{'radius':>6} | {'factor':>6} | {'full (ms)':>9} | {'pyramid (ms)':>12} | {'speed-up':>8} | {'PSNR (dB)':>9}"
+    )
+    print("-" * 68)
+    for radius in RADII:
+        full = best_of(args.repeat, lambda: full_blur(original, size, radius))
+        fast = best_of(args.repeat, lambda: pyramid_blur(original, size, radius))
+        quality = psnr(
+            full_blur(original, size, radius), pyramid_blur(original, size, radius)
+        )
+        print(
+            f"{radius:>6} | {reduction_factor(radius):>6} | {full * 1000:>9.1f} | {fast * 1000:>12.1f}"
+            f" | {full / fast:>7.2f}x | {quality:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Measure the in-memory cache footprint of full results against compact masks.
+
+Usage:
+    python benchmarks/bench_cache_memory.py [--model u2net] [--synthetic] [--repeat 5]
+
+``st.cache_data`` stores the pickled return value of a cached function, so the
+size of that pickle is what each entry costs. For every sample (and the sample
+upscaled to the largest accepted upload) this prints the entry size when the
+decoded original and the cutout are cached, the size of the compact mask entry
+with and without compression, and the cost of a cache hit in each design:
+unpickling the full result versus unpickling the mask and rebuilding the cutout.
+``--synthetic`` replaces model inference with a feathered ellipse mask so the
+script runs without downloading a model.
+"""
+
+import argparse
+import os
+import pickle
+import sys
+import time
+
+from PIL import Image, ImageDraw, ImageFilter, ImageOps
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bg_remove_core.mask_cache import CompactMask  # noqa: E402
+from bg_remove_core.segmentation import cutout  # noqa: E402
+
+SAMPLES = ["zebra.jpg", "wallaby.png"]
+MAX_IMAGE_SIZE = 2000
+MAX_SOURCE_DIMENSION = 6000
+
+
+def load_sources():
+    root = os.path.join(os.path.dirname(__file__), "..")
+    for name in SAMPLES:
+        img = Image.open(os.path.join(root, name))
+        img.load()
+        yield name, img
+        scale = MAX_SOURCE_DIMENSION / max(img.size)
+        big = img.resize(
+            (int(img.width * scale), int(img.height * scale)), Image.BICUBIC
+        )
+        yield f"{name} @{big.width}x{big.height}", big
+
+
+def synthetic_mask(size):
+    mask = Image.new("L", size, 0)
+    w, h = size
+    ImageDraw.Draw(mask).ellipse((w // 6, h // 8, w * 5 // 6, h * 7 // 8), fill=255)
+    return mask.filter(ImageFilter.GaussianBlur(4))
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def mb(size):
+    return f"{size / 1024 / 1024:.2f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="u2net")
+    parser.add_argument("--synthetic", action="store_true")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.synthetic:
+
+        def predict(img):
+            return synthetic_mask(img.size)
+
+    else:
+        from rembg import new_session, remove
+
+        session = new_session(args.model)
+
+        def predict(img):
+            return remove(img, session=session, only_mask=True)
+
+    print(
+        f"mask source: {'synthetic' if args.synthetic else args.model}, repeat={args.repeat}"
+    )
+    print(
+        f"{'image':<24} | {'full entry (MB)':>15} | {'raw mask (MB)':>13} | {'png mask (MB)':>13}"
+        f" | {'reduction':>9} | {'full hit (ms)':>13} | {'mask hit (ms)':>13}"
+    )
+    print("-" * 120)
+    for name, image in load_sources():
+        working = image.copy()
+        working.thumbnail((MAX_IMAGE_SIZE, MAX_IMAGE_SIZE), Image.BICUBIC)
+        working = ImageOps.exif_transpose(working)
+        mask = predict(working)
+        fixed = cutout(working, mask)
+
+        full_entry = pickle.dumps((image, fixed))
+        raw_entry = pickle.dumps([CompactMask.from_image(mask, "key", compress=False)])
+        png_entry = pickle.dumps([CompactMask.from_image(mask, "key")])
+
+        full_hit = best_of(args.repeat, lambda: pickle.loads(full_entry))
+        mask_hit = best_of(
+            args.repeat, lambda: cutout(working, pickle.loads(png_entry)[0].to_image())
+        )
+        print(
+            f"{name:<24} | {mb(len(full_entry)):>15} | {mb(len(raw_entry)):>13} | {mb(len(png_entry)):>13}"
+            f" | {len(full_entry) / len(png_entry):>8.0f}x | {full_hit * 1000:>13.1f} | {mask_hit * 1000:>13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Benchmark what showing a result costs on every Streamlit rerun.
+
+Usage:
+    python benchmarks/bench_display.py [--size 2000] [--repeat 3]
+
+A transparent cutout and the same cutout on a solid background are built
+from the zebra sample, as in bench_encoding.py. For each, the original and
+the result are passed through Streamlit's own st.image conversion
+(image_to_url) as PIL images, as the app did before, and as the cached
+display renditions the app shows now. The per-rerun time and the bytes sent
+to the browser for the two images are printed, plus the one-off cost of
+making the renditions. The "thumbnail" row is one batch grid cell: the
+result alone, at THUMBNAIL_SIZE.
+"""
+
+import argparse
+import os
+import sys
+
+from streamlit.elements.lib import image_utils
+from streamlit.elements.lib.image_utils import WidthBehavior, image_to_url
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_encoding import best_of, load_cutout  # noqa: E402
+from bg_remove_core.compositing import composite  # noqa: E402
+from bg_remove_core.processing import make_rendition  # noqa: E402
+
+THUMBNAIL_SIZE = 240  # as in bg_remove.py
+
+sent = []
+_ensure = image_utils._ensure_image_size_and_format
+
+
+def _record(image_data, width, image_format):
+    image_data = _ensure(image_data, width, image_format)
+    sent.append(len(image_data))
+    return image_data
+
+
+image_utils._ensure_image_size_and_format = _record
+
+
+def show(image, output_format="auto"):
+    """What st.image(image, use_container_width=True) does with the image."""
+    image_to_url(
+        image,
+        WidthBehavior.MAX_IMAGE_OR_CONTAINER,
+        False,
+        "RGB",
+        output_format,
+        "bench",
+    )
+
+
+def rerun(images):
+    sent.clear()
+    for image, output_format in images:
+        show(image, output_format)
+    return sum(sent)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cutout = load_cutout(args.size)
+    original = composite(cutout, rgb=True)
+    print(f"cutout={cutout.width}x{cutout.height} repeat={args.repeat}")
+    print(
+        f"{'result':<12} | {'shown as':<10} | {'per rerun (ms)':>14} | {'sent (KB)':>9} | {'one-off (ms)':>12}"
+    )
+    print("-" * 70)
+    for label, result in (("transparent", cutout), ("solid", original)):
+        pil = [(original, "auto"), (result, "auto")]
+        seconds, nbytes = best_of(args.repeat, lambda: rerun(pil))
+        print(
+            f"{label:<12} | {'PIL':<10} | {seconds * 1000:>14.1f} | {nbytes / 1024:>9.1f} | {'-':>12}"
+        )
+
+        made, renditions = best_of(
+            args.repeat, lambda: [make_rendition(original), make_rendition(result)]
+        )
+        seconds, nbytes = best_of(args.repeat, lambda: rerun(renditions))
+        print(
+            f"{label:<12} | {'rendition':<10} | {seconds * 1000:>14.1f} | {nbytes / 1024:>9.1f} | {made * 1000:>12.1f}"
+        )
+
+        made, thumbnail = best_of(
+            args.repeat, lambda: [make_rendition(result, THUMBNAIL_SIZE)]
+        )
+        seconds, nbytes = best_of(args.repeat, lambda: rerun(thumbnail))
+        print(
+            f"{label:<12} | {'thumbnail':<10} | {seconds * 1000:>14.1f} | {nbytes / 1024:>9.1f} | {made * 1000:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Benchmark encode time against output size for each encoder preset.
+
+Usage:
+    python benchmarks/bench_encoding.py [--size 2000] [--repeat 3]
+
+A cutout is built from the zebra sample at working resolution with a
+synthetic feathered mask, as the app produces it: RGBA for PNG and WEBP,
+flattened onto white for JPEG. It is then encoded with every preset of
+bg_remove_core.encoding, through convert_image_to_format. Times are the
+best of --repeat runs; the last columns compare each preset with balanced
+(the previous fixed settings).
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from PIL import Image, ImageDraw, ImageFilter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bg_remove_core.compositing import composite  # noqa: E402
+from bg_remove_core.encoding import ENCODER_PRESETS  # noqa: E402
+from bg_remove_core.processing import OUTPUT_FORMATS, convert_image_to_format  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+
+def load_cutout(size):
+    working = Image.open(os.path.join(ROOT, "zebra.jpg"))
+    working.thumbnail((size, size), Image.BICUBIC)
+
+    mask = Image.new("L", working.size, 0)
+    w, h = working.size
+    ImageDraw.Draw(mask).ellipse((w // 6, h // 8, w * 5 // 6, h * 7 // 8), fill=255)
+    mask = mask.filter(ImageFilter.GaussianBlur(4))
+    return Image.composite(working, Image.new("RGBA", working.size, 0), mask)
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cutout = load_cutout(args.size)
+    flattened = composite(cutout, rgb=True)
+    print(f"cutout={cutout.width}x{cutout.height} repeat={args.repeat}")
+    print(
+        f"{'format':<6} | {'preset':<9} | {'encode (ms)':>11} | {'size (KB)':>9} | {'time vs balanced':>16} | {'size vs balanced':>16}"
+    )
+    print("-" * 84)
+    for output_format in OUTPUT_FORMATS:
+        image = flattened if output_format == "JPEG" else cutout
+        results = {
+            preset: best_of(
+                args.repeat,
+                lambda preset=preset: convert_image_to_format(
+                    image, output_format, preset
+                ),
+            )
+            for preset in ENCODER_PRESETS
+        }
+        base_time, base_bytes = results["balanced"]
+        for preset, (seconds, data) in results.items():
+            print(
+                f"{output_format:<6} | {preset:<9} | {seconds * 1000:>11.1f} | {len(data) / 1024:>9.1f} | "
+                f"{seconds / base_time:>15.2f}x | {len(data) / len(base_bytes):>15.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
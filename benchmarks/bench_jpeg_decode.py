@@ -0,0 +1,128 @@
+"""Benchmark JPEG draft-mode decoding against a full decode plus resize.
+
+Usage:
+    python benchmarks/bench_jpeg_decode.py [--sizes 6000x4000 4000x3000 2400x1600] [--repeat 5]
+
+For each source size, a JPEG is made from the zebra sample (quality 90) and
+brought to the 2000px working size in two ways. The "full" path is the
+previous decode_image/resize_image: decode every pixel, then a BICUBIC
+resize. The "draft" path lets libjpeg decode at the largest 1/2, 1/4 or 1/8
+DCT scale that still covers the working size, then finishes with the same
+resize. Each path runs in a fresh process, so its peak resident memory
+(VmHWM above the process baseline, Linux only) is attributable to the decode
+alone.
+The PSNR column compares the two working images.
+"""
+
+import argparse
+import math
+import multiprocessing
+import os
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+MAX_IMAGE_SIZE = 2000
+
+
+def working_size(size, max_size):
+    width, height = size
+    if width <= max_size and height <= max_size:
+        return width, height
+    if width > height:
+        return max_size, int(height * (max_size / width))
+    return int(width * (max_size / height)), max_size
+
+
+def to_working(data, draft):
+    image = Image.open(BytesIO(data))
+    target = working_size(image.size, MAX_IMAGE_SIZE)
+    if draft:
+        image.draft(image.mode, target)
+    image.load()
+    decoded = image.size
+    if image.size != target:
+        image = image.resize(target, Image.BICUBIC)
+    return image, decoded
+
+
+def memory_kb(field):
+    """VmRSS/VmHWM of this process (Linux); unlike ru_maxrss, VmHWM starts afresh at exec."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise RuntimeError(f"{field} not found in /proc/self/status")
+
+
+def measure(data, draft, repeat, queue):
+    """Child process: best-of-N time and peak RSS growth of one decode path."""
+    baseline = memory_kb("VmHWM")
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        image, decoded = to_working(data, draft)
+        timings.append(time.perf_counter() - start)
+    peak = memory_kb("VmHWM") - baseline
+    queue.put((min(timings), peak * 1024, decoded, image.tobytes(), image.size))
+
+
+def run(data, draft, repeat):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=measure, args=(data, draft, repeat, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def make_jpeg(size):
+    image = (
+        Image.open(os.path.join(ROOT, "zebra.jpg"))
+        .convert("RGB")
+        .resize(size, Image.BICUBIC)
+    )
+    buf = BytesIO()
+    image.save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def psnr(a, b):
+    diff = np.frombuffer(a, dtype=np.uint8).astype(np.float64) - np.frombuffer(
+        b, dtype=np.uint8
+    )
+    mse = np.mean(diff * diff)
+    return math.inf if mse == 0 else 10 * math.log10(255 * 255 / mse)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", nargs="+", default=["6000x4000", "4000x3000", "2400x1600"]
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        f"{'source':>9} | {'decoded':>9} | {'full (ms)':>9} | {'draft (ms)':>10} | {'speed-up':>8}"
+        f" | {'full peak':>9} | {'draft peak':>10} | {'PSNR (dB)':>9}"
+    )
+    print("-" * 94)
+    for spec in args.sizes:
+        size = tuple(int(v) for v in spec.split("x"))
+        data = make_jpeg(size)
+        full_time, full_peak, _, full_pixels, _ = run(data, False, args.repeat)
+        draft_time, draft_peak, decoded, draft_pixels, _ = run(data, True, args.repeat)
+        print(
+            f"{spec:>9} | {decoded[0]}x{decoded[1]:<4} | {full_time * 1000:>9.1f} | {draft_time * 1000:>10.1f}"
+            f" | {full_time / draft_time:>7.2f}x | {full_peak / 2**20:>7.1f}MB | {draft_peak / 2**20:>8.1f}MB"
+            f" | {psnr(full_pixels, draft_pixels):>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Compare the latency and memory of the selectable segmentation models.
+
+Usage:
+    python benchmarks/bench_models.py [--models u2net u2netp silueta] [--repeat 5]
+
+Each model runs in a fresh process: the session is loaded with
+``rembg.new_session`` (downloading the weights on first use), warmed up once,
+then predicts the mask of the zebra sample at the app's 2000px working size
+``--repeat`` times, the way the app does for a single upload. Reported per
+model:
+
+- weights: size of the ONNX file in U2NET_HOME
+- load: time to create the session
+- median / best: mask prediction time
+- session RSS: resident memory added by loading the session
+- peak RSS: resident high-water mark above the process baseline, including
+  inference buffers (Linux only, from /proc/self/status)
+
+The table is printed as Markdown so it can be pasted into the README.
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from bg_remove_core.models import MODELS  # noqa: E402
+
+MAX_IMAGE_SIZE = 2000
+
+
+def memory_kb(field):
+    """VmRSS/VmHWM of this process (Linux); unlike ru_maxrss, VmHWM starts afresh at exec."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise RuntimeError(f"{field} not found in /proc/self/status")
+
+
+def weights_path(model_name):
+    home = os.path.expanduser(
+        os.getenv("U2NET_HOME", os.path.join(os.getenv("XDG_DATA_HOME", "~"), ".u2net"))
+    )
+    return os.path.join(home, f"{model_name}.onnx")
+
+
+def measure(model_name, repeat, queue):
+    """Child process: load one model and time its mask predictions."""
+    try:
+        from PIL import Image, ImageOps
+        from rembg import new_session, remove
+
+        image = Image.open(os.path.join(ROOT, "zebra.jpg"))
+        image.thumbnail((MAX_IMAGE_SIZE, MAX_IMAGE_SIZE), Image.BICUBIC)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+        baseline = memory_kb("VmRSS")
+        start = time.perf_counter()
+        session = new_session(model_name)
+        load = time.perf_counter() - start
+        session_rss = memory_kb("VmRSS") - baseline
+
+        remove(image, session=session, only_mask=True)  # Warm-up
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            remove(image, session=session, only_mask=True)
+            timings.append(time.perf_counter() - start)
+        peak_rss = memory_kb("VmHWM") - baseline
+        queue.put(
+            (load, statistics.median(timings), min(timings), session_rss, peak_rss)
+        )
+    except Exception as e:
+        queue.put(e)
+
+
+def run(model_name, repeat):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=measure, args=(model_name, repeat, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--models", nargs="+", default=list(MODELS), choices=list(MODELS)
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        f"zebra.jpg at {MAX_IMAGE_SIZE}px, {args.repeat} runs per model, {os.cpu_count()} CPUs"
+    )
+    print()
+    print(
+        "| model | weights | load (s) | median (ms) | best (ms) | session RSS | peak RSS |"
+    )
+    print(
+        "| ----- | ------: | -------: | ----------: | --------: | ----------: | -------: |"
+    )
+    for model_name in args.models:
+        result = run(model_name, args.repeat)
+        if isinstance(result, Exception):
+            print(f"| {model_name} | failed: {result} | | | | | |")
+            continue
+        load, median, best, session_rss, peak_rss = result
+        path = weights_path(model_name)
+        weights = (
+            f"{os.path.getsize(path) / 2**20:.1f} MB" if os.path.exists(path) else "?"
+        )
+        print(
+            f"| {model_name} | {weights} | {load:.2f} | {median * 1000:.0f} | {best * 1000:.0f}"
+            f" | {session_rss / 1024:.0f} MB | {peak_rss / 1024:.0f} MB |"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Compare an INT8-quantized model with its FP32 original: speed and mask agreement.
+
+Usage:
+    python benchmarks/bench_quantization.py [--model u2net] [--images IMAGE_OR_DIR ...] [--repeat 3]
+
+Build the quantized model first (python -m bg_remove_core.quantize). Every
+image is resized to the app's 2000px working size, and its mask is predicted
+by both models through the same session path the app uses. Reported per
+image, then as mean / worst over the set:
+
+- FP32 / INT8: best-of-N model run time (preprocessing excluded, it is the
+  same for both), and the speed-up
+- end-to-end: speed-up of the whole mask prediction, pre/post-processing included
+- IoU: intersection over union of the foregrounds (alpha >= 128)
+- MAE: mean absolute alpha difference, in 0-255 levels
+
+Use held-out images that look like production uploads, not the calibration set.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageOps
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from bg_remove_core.quantize import (  # noqa: E402
+    QUANTIZABLE_MODELS,
+    QUANTIZED_SUFFIX,
+    SAMPLE_IMAGES,
+    calibration_files,
+)
+from bg_remove_core.segmentation import (  # noqa: E402
+    MODEL_PARAMS,
+    predict_masks,
+    preprocess,
+    run_batched,
+)
+from bg_remove_core.session_options import create_session  # noqa: E402
+
+MAX_IMAGE_SIZE = 2000
+
+
+def load(path):
+    image = ImageOps.exif_transpose(Image.open(path))
+    image.thumbnail((MAX_IMAGE_SIZE, MAX_IMAGE_SIZE), Image.BICUBIC)
+    return image.convert("RGB")
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def mask_iou(a, b, threshold=128):
+    fg_a = np.asarray(a) >= threshold
+    fg_b = np.asarray(b) >= threshold
+    union = np.logical_or(fg_a, fg_b).sum()
+    return 1.0 if union == 0 else np.logical_and(fg_a, fg_b).sum() / union
+
+
+def mask_mae(a, b):
+    return np.abs(np.asarray(a, dtype=np.int16) - np.asarray(b, dtype=np.int16)).mean()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="u2net", choices=QUANTIZABLE_MODELS)
+    parser.add_argument("--images", nargs="+", default=SAMPLE_IMAGES)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    fp32 = create_session(args.model)
+    int8 = create_session(args.model + QUANTIZED_SUFFIX)
+    files = calibration_files(args.images)
+
+    print(f"model={args.model} images={len(files)} repeat={args.repeat}")
+    mean, std, size = MODEL_PARAMS[args.model]
+    header = (
+        f"{'image':<24} | {'FP32 (ms)':>9} | {'INT8 (ms)':>9} | {'speed-up':>8}"
+        f" | {'end-to-end':>10} | {'IoU':>6} | {'MAE':>5}"
+    )
+    print(header)
+    print("-" * len(header))
+    rows = []
+    for path in files:
+        image = load(path)
+        tensor = preprocess(image, mean, std, size)
+        for session in (fp32, int8):  # Warm-up
+            run_batched(session, [tensor])
+        fp32_run, _ = best_of(args.repeat, lambda: run_batched(fp32, [tensor]))
+        int8_run, _ = best_of(args.repeat, lambda: run_batched(int8, [tensor]))
+        fp32_total, (fp32_mask,) = best_of(
+            args.repeat, lambda: predict_masks([image], fp32)
+        )
+        int8_total, (int8_mask,) = best_of(
+            args.repeat, lambda: predict_masks([image], int8)
+        )
+        row = (
+            fp32_run,
+            int8_run,
+            fp32_total / int8_total,
+            mask_iou(fp32_mask, int8_mask),
+            mask_mae(fp32_mask, int8_mask),
+        )
+        rows.append(row)
+        print(
+            f"{os.path.basename(path)[:24]:<24} | {row[0] * 1000:>9.0f} | {row[1] * 1000:>9.0f}"
+            f" | {row[0] / row[1]:>7.2f}x | {row[2]:>9.2f}x | {row[3]:>6.4f} | {row[4]:>5.2f}"
+        )
+
+    if rows:
+        fp32_runs, int8_runs, totals, ious, maes = (np.array(col) for col in zip(*rows))
+        print("-" * len(header))
+        print(
+            f"{'mean':<24} | {fp32_runs.mean() * 1000:>9.0f} | {int8_runs.mean() * 1000:>9.0f}"
+            f" | {fp32_runs.mean() / int8_runs.mean():>7.2f}x | {totals.mean():>9.2f}x"
+            f" | {ious.mean():>6.4f} | {maes.mean():>5.2f}"
+        )
+        print(
+            f"{'worst':<24} | {'':>9} | {'':>9} | {(fp32_runs / int8_runs).min():>7.2f}x"
+            f" | {totals.min():>9.2f}x | {ious.min():>6.4f} | {maes.max():>5.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Benchmark onnxruntime thread layouts for concurrent segmentation requests.
+
+Usage:
+    python benchmarks/bench_session_options.py [--model u2net] [--layouts 0x1 4x1 2x2 1x4]
+        [--requests 16] [--optimization all] [--gate 1]
+
+A layout THREADSxCONCURRENCY runs `--requests` mask predictions of the zebra
+sample (2000px working size) from CONCURRENCY threads sharing one session
+with THREADS intra-op threads (0 = onnxruntime's default of one per physical
+core), the way concurrent users share the in-process session. Every layout
+runs once with spin-waiting thread pools and once without, each in a fresh
+process. With ``--gate N``, every request first waits for a slot of an
+InferenceGate running N predictions at a time (see bg_remove_core.admission),
+as the app's requests do; the latencies then include the time spent queued.
+Reported per run:
+
+- img/s: throughput over the whole run
+- p50 / p95: per-request latency
+- CPU/img: process CPU time (user + system) per image; oversubscribed or
+  spinning pools cost CPU without adding throughput
+- idle CPU: CPU used in the second after the last request finished
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from bg_remove_core.admission import InferenceGate  # noqa: E402
+from bg_remove_core.session_options import (  # noqa: E402
+    GRAPH_OPTIMIZATION_LEVELS,
+    SessionConfig,
+    create_session,
+)
+
+MAX_IMAGE_SIZE = 2000
+
+
+def cpu_seconds():
+    times = os.times()
+    return times.user + times.system
+
+
+def measure(model_name, config, concurrency, requests, gate, queue):
+    """Child process: run `requests` predictions from `concurrency` threads,
+    at most `gate` at a time if it is set."""
+    try:
+        from PIL import Image
+        from rembg import remove
+
+        image = Image.open(os.path.join(ROOT, "zebra.jpg"))
+        image.thumbnail((MAX_IMAGE_SIZE, MAX_IMAGE_SIZE), Image.BICUBIC)
+        image.load()
+        session = create_session(model_name, config)
+        remove(image, session=session, only_mask=True)  # Warm-up
+        slots = InferenceGate(gate or concurrency, requests)
+
+        def request(_):
+            start = time.perf_counter()
+            with slots.slot():
+                remove(image, session=session, only_mask=True)
+            return time.perf_counter() - start
+
+        cpu_start = cpu_seconds()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = sorted(executor.map(request, range(requests)))
+        elapsed = time.perf_counter() - start
+        cpu_busy = cpu_seconds() - cpu_start
+
+        time.sleep(1.0)
+        cpu_idle = cpu_seconds() - cpu_start - cpu_busy
+        queue.put(
+            (
+                requests / elapsed,
+                statistics.median(latencies),
+                latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                cpu_busy / requests,
+                cpu_idle,
+            )
+        )
+    except Exception as e:
+        queue.put(e)
+
+
+def run(model_name, config, concurrency, requests, gate):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(
+        target=measure, args=(model_name, config, concurrency, requests, gate, queue)
+    )
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="u2net")
+    parser.add_argument("--layouts", nargs="+", default=["0x1", "4x1", "2x2", "1x4"])
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument(
+        "--optimization", default="all", choices=list(GRAPH_OPTIMIZATION_LEVELS)
+    )
+    parser.add_argument(
+        "--gate",
+        type=int,
+        default=0,
+        help="predictions allowed at once (0: as many as the concurrency)",
+    )
+    args = parser.parse_args()
+
+    print(
+        f"model={args.model} requests={args.requests} optimization={args.optimization}"
+        f" gate={args.gate or 'off'} cpus={os.cpu_count()}"
+    )
+    print(
+        f"{'layout':>7} | {'spin':>4} | {'img/s':>6} | {'p50 (ms)':>8} | {'p95 (ms)':>8}"
+        f" | {'CPU/img (s)':>11} | {'idle CPU (s)':>12}"
+    )
+    print("-" * 78)
+    for layout in args.layouts:
+        threads, concurrency = (int(v) for v in layout.split("x"))
+        for spin_wait in (True, False):
+            config = SessionConfig(
+                intra_op_threads=threads,
+                graph_optimization=args.optimization,
+                spin_wait=spin_wait,
+            )
+            result = run(args.model, config, concurrency, args.requests, args.gate)
+            if isinstance(result, Exception):
+                print(
+                    f"{layout:>7} | {'on' if spin_wait else 'off':>4} | failed: {result}"
+                )
+                continue
+            throughput, p50, p95, cpu_per_image, cpu_idle = result
+            print(
+                f"{layout:>7} | {'on' if spin_wait else 'off':>4} | {throughput:>6.2f}"
+                f" | {p50 * 1000:>8.0f} | {p95 * 1000:>8.0f} | {cpu_per_image:>11.3f}"
+                f" | {cpu_idle:>12.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,67 @@
 import streamlit as st
-from rembg import remove, new_session
-from PIL import Image, ImageFilter
+from PIL import Image, ImageOps
 from io import BytesIO
+import math
 import os
+import tempfile
+import threading
 import traceback
 import time
+import weakref
 import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from bg_remove_core.admission import ServerBusy
+from bg_remove_core.blur import pyramid_blur
+from bg_remove_core.encoding import ENCODER_PRESET_LABELS, ENCODER_PRESETS
+from bg_remove_core.mask_cache import CompactMask
+from bg_remove_core.metrics import BYTES_ENCODED, BYTES_RECEIVED, ERRORS, IMAGES_RECEIVED, REGISTRY, REJECTIONS
+from bg_remove_core.models import MODELS
+from bg_remove_core.pipeline import LazyOriginal, StageCache, decoded, source_key
+from bg_remove_core.processing import (
+    DISPLAY_MAX_SIZE,
+    MAX_FILE_SIZE,
+    MAX_IMAGE_SIZE,
+    MAX_SOURCE_DIMENSION,
+    OUTPUT_FORMATS,
+    ImageRejected,
+    apply_background_replacement,
+    check_upload,
+    convert_image_to_format,
+    cutout_with_mask,
+    get_format_extension,
+    get_format_mime,
+    image_cost,
+    make_rendition,
+    mask_cache_key,
+    open_image,
+    resize_image,
+    segment_masks,
+    timed,
+)
+from bg_remove_core.settings import (
+    ENCODER_PRESET,
+    INFERENCE_BATCH_SIZE,
+    MODEL_NAME,
+    MODEL_VERSION,
+    PREVIEW_MODEL_NAME,
+    REJECTED_UPLOADS_MAX,
+    SELECTABLE_MODELS,
+    inference_gate,
+    mask_cache,
+    model_registry,
+    token_buckets,
+)
+from bg_remove_core.validation import RejectedUploads
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:  # Older/newer Streamlit layout: batch workers run without a script context
+
+    def get_script_run_ctx():
+        return None
+
+    def add_script_run_ctx(thread=None, ctx=None):
+        return thread
 
 st.set_page_config(layout="wide", page_title="Image Background Remover", page_icon="✂️")
 
@@ -20,84 +76,158 @@ st.markdown(
 # --- Sidebar Configuration ---
 st.sidebar.header("Upload & Settings")
 
-# Increased file size limit
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
-
-# Maximum allowed source dimensions to prevent DoS via resizing
-MAX_SOURCE_DIMENSION = 6000
-
-# Max dimensions for processing
-MAX_IMAGE_SIZE = 2000  # pixels
+# Default output size: cut out the source at full resolution (mask upsampled from
+# MAX_IMAGE_SIZE) instead of the resized working image
+FULL_RESOLUTION = os.environ.get("BG_REMOVE_FULL_RESOLUTION", "0") == "1"
 
 # Allowed default images
 DEFAULT_IMAGES = ["./zebra.jpg", "./wallaby.png"]
 
-# Supported output formats
-OUTPUT_FORMATS = ["PNG", "WEBP", "JPEG"]
-
 # Maximum images allowed in batch processing
-MAX_BATCH_SIZE = 10
+MAX_BATCH_SIZE = int(os.environ.get("BG_REMOVE_MAX_BATCH_SIZE", 10))
+
+# Batch results are shown as a grid of result thumbnails, a page at a time
+THUMBNAIL_SIZE = 240
+BATCH_GRID_COLUMNS = 4
+BATCH_PAGE_SIZE = 12
+
+# ZIP downloads: already-compressed outputs are stored, not deflated, and the archive
+# is spooled to a temporary file once it outgrows this size while it is built. The
+# finished archive is still read into memory for st.download_button (see display_batch_results)
+STORED_EXTENSIONS = (".png", ".webp", ".jpg", ".jpeg")
+ZIP_SPOOL_MAX_SIZE = 16 * 1024 * 1024
 
+# Worker threads used to process a batch concurrently (onnxruntime releases the GIL during inference)
+BATCH_WORKERS = max(1, int(os.environ.get("BG_REMOVE_BATCH_WORKERS", min(4, os.cpu_count() or 1))))
 
-def check_rate_limit():
-    """Rate limiting to prevent DoS via repeated processing"""
-    if "request_times" not in st.session_state:
-        st.session_state["request_times"] = []
+# Memory budget for memoized render stages (resized, segmented, composited and encoded
+# images), so sidebar changes only redo the stages they affect; 0 disables it
+RENDER_CACHE_MAX_BYTES = int(os.environ.get("BG_REMOVE_RENDER_CACHE_MB", 256)) * 1024 * 1024
 
-    now = time.time()
-    # Clean up old requests (1 minute window)
-    st.session_state["request_times"] = [
-        t for t in st.session_state["request_times"] if now - t < 60
-    ]
+# Header carrying the client address when the app is behind a reverse proxy (e.g.
+# X-Forwarded-For); without it the rate limit is keyed by the peer address
+CLIENT_IP_HEADER = os.environ.get("BG_REMOVE_CLIENT_IP_HEADER", "")
 
-    if len(st.session_state["request_times"]) >= 5:  # Limit: 5 per minute
-        return False
+# PNG-compress the masks held in the in-memory result cache (set to 0 to keep raw bytes)
+COMPRESS_CACHED_MASKS = os.environ.get("BG_REMOVE_COMPRESS_MASKS", "1") != "0"
 
-    st.session_state["request_times"].append(now)
-    return True
+
+def client_identity():
+    """Rate limit key of the current user: their address, shared by all their tabs and sessions.
+
+    Behind a reverse proxy, CLIENT_IP_HEADER names the header holding the client
+    address (its first entry is used); otherwise the peer address of the
+    browser's websocket is used.
+    """
+    if CLIENT_IP_HEADER:
+        forwarded = st.context.headers.get(CLIENT_IP_HEADER)
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    try:
+        # Streamlit 1.42 has no public accessor for the client address
+        from streamlit.runtime.context import _get_request
+
+        request = _get_request()
+    except Exception:  # not running in a Streamlit server
+        request = None
+    return request.remote_ip if request is not None else "unknown"
+
+
+def meter_uploads(uploads):
+    """Count the uploads this session has not received before in the metrics (reruns see the same uploads).
+
+    Returns:
+        set: file_id (or name) of the uploads that are new
+    """
+    seen = st.session_state.setdefault("metered_uploads", set())
+    new = set()
+    for upload in uploads:
+        upload_id = getattr(upload, "file_id", upload.name)
+        if upload_id not in seen:
+            seen.add(upload_id)
+            new.add(upload_id)
+            IMAGES_RECEIVED.inc(frontend="app")
+            BYTES_RECEIVED.inc(upload.size, frontend="app")
+    return new
+
+
+def charge_rate_limit(uploads, model_name=MODEL_NAME, full_resolution=False, settings_key=None):
+    """Charge the processing cost of `uploads` (see image_cost) to this client's token bucket.
+
+    Only work that will run is charged. An image this session already
+    segmented with the model is charged just its compositing and encoding
+    for new settings (its mask comes from the cache), and settings it was
+    already rendered with are free (the result comes from the render cache).
+
+    Returns:
+        0.0 if the request may run, else the seconds to wait until it can
+    """
+    # (upload id, model) -> {(full_resolution, settings_key)} rendered; only the current uploads are kept
+    rendered = st.session_state.get("rate_limit_charged", {})
+    render_key = (full_resolution, settings_key)
+    current = {}
+    charged = []
+    cost = 0.0
+    for upload in uploads:
+        upload_key = (getattr(upload, "file_id", upload.name), model_name)
+        renders = current[upload_key] = rendered.get(upload_key, set())
+        if render_key in renders:
+            continue
+        with upload.getbuffer() as data:
+            cost += image_cost(data, model_name, full_resolution, segmented=bool(renders))
+        charged.append(upload_key)
+
+    if cost:
+        wait = get_token_buckets().take(client_identity(), cost)
+        if wait:
+            return wait
+    for upload_key in charged:
+        current[upload_key] = current[upload_key] | {render_key}
+    st.session_state["rate_limit_charged"] = current
+    return 0.0
 
 
 def validate_uploaded_file(upload):
-    """Validate an uploaded file for size and format.
+    """Validate an uploaded file for size, format and dimensions.
+
+    Only the image header is parsed (see sniff_image), so bad files are
+    rejected before they are copied, hashed or charged to the rate limit.
 
     Returns:
         tuple: (is_valid: bool, error_message: str or None)
     """
-    if upload.size > MAX_FILE_SIZE:
-        return False, f"File '{upload.name}' is too large ({upload.size / 1024 / 1024:.1f}MB). Maximum: {MAX_FILE_SIZE / 1024 / 1024:.1f}MB."
-    return True, None
+    with upload.getbuffer() as data:
+        error_msg = check_upload(upload.name, upload.size, data)
+    return error_msg is None, error_msg
 
 
-def convert_image_to_format(img, output_format="PNG"):
-    """Convert a PIL image to the specified format and return bytes.
+def previous_rejection(upload):
+    """Error message an identical upload failed to decode with earlier, or None."""
+    return get_rejected_uploads().get(source_key(upload.getvalue()))
 
-    Args:
-        img: PIL Image object
-        output_format: One of 'PNG', 'WEBP', 'JPEG'
+
+def upload_errors(uploads):
+    """Why each upload is rejected: its header (see validate_uploaded_file), then an identical upload that failed to decode (see previous_rejection).
+
+    Verdicts are kept in the session per upload, so reruns do not copy, hash
+    and log the same upload again; decode_image drops them when an upload
+    fails to decode.
 
     Returns:
-        bytes: The image encoded in the specified format
+        list: One error message per upload, None for the valid ones
     """
-    buf = BytesIO()
-    save_kwargs = {}
-
-    if output_format == "JPEG":
-        # JPEG does not support transparency; composite onto white background
-        if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
-            background = Image.new("RGB", img.size, (255, 255, 255))
-            if img.mode == "P":
-                img = img.convert("RGBA")
-            background.paste(img, mask=img.split()[-1])
-            img = background
-        elif img.mode != "RGB":
-            img = img.convert("RGB")
-        save_kwargs["quality"] = 95
-    elif output_format == "WEBP":
-        save_kwargs["quality"] = 90
-        save_kwargs["lossless"] = False
-
-    img.save(buf, format=output_format, **save_kwargs)
-    return buf.getvalue()
+    # file_id (or name) -> error message or None; only the current uploads are kept
+    checked = st.session_state.get("upload_verdicts", {})
+    current = {}
+    for upload in uploads:
+        upload_id = getattr(upload, "file_id", upload.name)
+        if upload_id in checked:
+            current[upload_id] = checked[upload_id]
+        elif upload_id not in current:
+            is_valid, error_msg = validate_uploaded_file(upload)
+            current[upload_id] = previous_rejection(upload) if is_valid else error_msg
+    st.session_state["upload_verdicts"] = current
+    return [current[getattr(upload, "file_id", upload.name)] for upload in uploads]
 
 
 # Download the fixed image (legacy wrapper for backward compatibility)
@@ -109,66 +239,290 @@ def convert_image(img):
     return byte_im
 
 
-# Resize image while maintaining aspect ratio
-def resize_image(image, max_size):
-    width, height = image.size
-    if width <= max_size and height <= max_size:
-        return image
+# Model sessions, the inference gate, the mask cache and the rate limit buckets are process-wide (see
+# bg_remove_core.settings), so the sessions warmed up by serve.py at startup are the ones requests use
+def get_model_registry():
+    return model_registry()
 
-    if width > height:
-        new_width = max_size
-        new_height = int(height * (max_size / width))
-    else:
-        new_height = max_size
-        new_width = int(width * (max_size / height))
 
-    return image.resize((new_width, new_height), Image.BICUBIC)
+def get_mask_cache():
+    return mask_cache()
 
 
-@st.cache_resource
-def get_session():
-    return new_session("u2net")
+def get_token_buckets():
+    return token_buckets()
+
+
+def get_inference_gate():
+    return inference_gate()
+
+
+@st.cache_resource(show_spinner=False)
+def get_stage_cache():
+    stages = StageCache(RENDER_CACHE_MAX_BYTES)
+    REGISTRY.register_collector("render_cache", stages.collect_metrics)
+    return stages
+
+
+@st.cache_resource(show_spinner=False)
+def get_rejected_uploads():
+    return RejectedUploads(REJECTED_UPLOADS_MAX)
 
 
 @st.cache_data(max_entries=10, ttl=3600)
-def process_image(image_bytes):
-    """Process image with caching to avoid redundant processing"""
+def compute_masks(image_bytes_list, _images, model_name=MODEL_NAME):
+    """Segment images and cache only their compact masks.
+
+    The cached entry is a few hundred KB per image instead of the decoded
+    original and cutout; callers rebuild the cutout with apply_mask.
+
+    Args:
+        image_bytes_list: Tuple of raw upload bytes (the cache key)
+        _images: The matching EXIF-corrected working images (not hashed)
+        model_name: Segmentation model
+
+    Returns:
+        list: One CompactMask per image
+    """
+    keys = [mask_cache_key(image_bytes, model_name) for image_bytes in image_bytes_list]
+    masks = segment_masks(keys, _images, model_name)
+    return [CompactMask.from_image(mask, key, compress=COMPRESS_CACHED_MASKS) for mask, key in zip(masks, keys)]
+
+
+def apply_mask(image, compact_mask, source_image=None):
+    """Rebuild the RGBA cutout of a working image from its cached mask (see cutout_with_mask)."""
+    return cutout_with_mask(image, compact_mask.to_image(), source_image)
+
+
+def decode_image(image_bytes, max_size=None, source=None):
+    """Open and validate image bytes, showing why an image was rejected.
+
+    Args:
+        image_bytes: Raw upload bytes
+        max_size: Working size the image will be resized to, if it is only
+            needed at that size. JPEGs are then decoded with libjpeg's DCT
+            scaling (1/2, 1/4 or 1/8) to the smallest size still covering it,
+            so the full-resolution pixels are never materialized.
+        source: source_key of image_bytes; files that can never be decoded
+            are recorded under it in the rejected uploads cache
+
+    Returns:
+        The decoded PIL image, or None if the image was rejected
+    """
     try:
-        image = Image.open(BytesIO(image_bytes))
+        return open_image(image_bytes, max_size)
+    except ImageRejected as e:
+        st.error(str(e))
+        get_rejected_uploads().add(source, str(e))
+        # Check the uploads again on the next run, so this one is rejected before decoding
+        st.session_state.pop("upload_verdicts", None)
+        return None
+    except Exception as e:
+        print(f"Error processing image: {str(e)}")  # Log for debugging
+        ERRORS.inc(frontend="app")
+        st.error("An error occurred while processing the image. Please try again.")
+        return None
 
-        # Security: Enforce strict format validation
-        # PIL detects the format based on the file header, not extension
-        if image.format not in ["JPEG", "PNG"]:
-            print(
-                f"Security Warning: Unsupported image format detected: {image.format}"
-            )
-            st.error("Unsupported image format. Please upload a PNG or JPEG image.")
-            return None, None
 
-        # Security: Check dimensions to prevent DoS via resizing
-        if image.width > MAX_SOURCE_DIMENSION or image.height > MAX_SOURCE_DIMENSION:
-            print(f"Security Warning: Image dimensions too large: {image.size}")
-            st.error(
-                f"Image is too large in dimensions. Max allowed: {MAX_SOURCE_DIMENSION}x{MAX_SOURCE_DIMENSION}"
-            )
-            return None, None
+def lazy_original(image_bytes, source=None, full_resolution=False):
+    """LazyOriginal decoding and validating image bytes (see decode_image) when its pixels are first needed.
 
+    Args:
+        full_resolution: Keep the original at full size; otherwise large
+            JPEGs are decoded at a reduced scale
+    """
+    source = source or source_key(image_bytes)
+    max_size = None if full_resolution else MAX_IMAGE_SIZE
+
+    def decode():
+        with timed(None, "decode"):
+            return decode_image(image_bytes, max_size, source)
+
+    return LazyOriginal(decode, source, full_resolution)
+
+
+def load_image(image_bytes, stages=None, source=None, full_resolution=False, original=None):
+    """Resize and EXIF-correct an upload for inference, decoding it only if the resize stage misses.
+
+    Args:
+        image_bytes: Raw upload bytes
+        stages: Optional StageCache memoizing the resize stage (the decoded original is not memoized)
+        source: source_key of image_bytes, if already computed
+        full_resolution: Keep the original at full size; otherwise large
+            JPEGs are decoded at a reduced scale (see decode_image)
+        original: LazyOriginal of the upload from an earlier call, so it is decoded at most once
+
+    Returns:
+        tuple: (original, working_image), where original is a LazyOriginal
+        (see decoded), or (None, None) if the image was rejected
+    """
+    stages = stages if stages is not None else StageCache(0)
+    source = source or source_key(image_bytes)
+    original = original or lazy_original(image_bytes, source, full_resolution)
+
+    def resize():
+        image = original.get()
+        if image is None:
+            return None
         # Resize large images to prevent memory issues
-        resized = resize_image(image, MAX_IMAGE_SIZE)
-        # Process the image
-        session = get_session()
-        fixed = remove(resized, session=session)
+        return ImageOps.exif_transpose(resize_image(image, MAX_IMAGE_SIZE))
+
+    try:
+        working = stages.run("resize", (source, MAX_IMAGE_SIZE), resize)
+        if working is None:
+            return None, None
+        return original, working
+    except Exception as e:
+        print(f"Error processing image: {str(e)}")  # Log for debugging
+        ERRORS.inc(frontend="app")
+        st.error("An error occurred while processing the image. Please try again.")
+        return None, None
+
+
+def segment_key(source, model_name=MODEL_NAME, full_resolution=False):
+    """Stage key of a cutout: the upload plus every setting that changes it."""
+    if source is None:
+        return None
+    return (source, model_name, MODEL_VERSION, MAX_IMAGE_SIZE, full_resolution)
+
+
+def source_image_for(image, full_resolution):
+    """The EXIF-corrected original to cut out at full resolution, or None for working-size output."""
+    return ImageOps.exif_transpose(decoded(image)) if full_resolution else None
+
+
+def segment_image(image_bytes, image, working, stages, source, model_name=MODEL_NAME, full_resolution=False):
+    """Cutout of an image; skips inference when the mask is in the session cache or on disk."""
+    return stages.run(
+        "segment",
+        segment_key(source, model_name, full_resolution),
+        lambda: apply_mask(
+            working,
+            compute_masks((image_bytes,), [working], model_name)[0],
+            source_image_for(image, full_resolution),
+        ),
+    )
+
+
+def mask_ready(image_bytes, stages, source, full_resolution=False, model_name=MODEL_NAME):
+    """Whether the model's cutout can be produced without running inference."""
+    if ("segment", segment_key(source, model_name, full_resolution)) in stages:
+        return True
+    cache = get_mask_cache()
+    return cache is not None and mask_cache_key(image_bytes, model_name) in cache
+
+
+def process_image(image_bytes, stages=None, source=None, full_resolution=False, model_name=MODEL_NAME, original=None):
+    """Process image; only the mask is cached, the cutout is rebuilt unless `stages` holds it
+
+    Args:
+        image_bytes: Raw upload bytes
+        stages: Optional StageCache memoizing the resize and segment stages
+        source: source_key of image_bytes, if already computed
+        full_resolution: Cut out the source at full size instead of the working image
+        model_name: Segmentation model (see SELECTABLE_MODELS)
+        original: LazyOriginal of the upload, e.g. from preview_image (see load_image)
+    """
+    stages = stages if stages is not None else StageCache(0)
+    source = source or source_key(image_bytes)
+
+    image, working = load_image(image_bytes, stages, source, full_resolution, original)
+    if image is None:
+        return None, None
+
+    try:
+        fixed = segment_image(image_bytes, image, working, stages, source, model_name, full_resolution)
         return image, fixed
-    except Image.DecompressionBombError as e:
-        print(f"Decompression Bomb Error: {e}")  # Log for security audit
-        st.error("Image is too large to process.")
+    except ServerBusy as e:
+        REJECTIONS.inc(frontend="app", reason="busy")
+        st.error(str(e))
         return None, None
     except Exception as e:
         print(f"Error processing image: {str(e)}")  # Log for debugging
+        ERRORS.inc(frontend="app")
         st.error("An error occurred while processing the image. Please try again.")
         return None, None
 
 
+def preview_image(image_bytes, stages=None, source=None, full_resolution=False):
+    """Quick cutout from the preview model, shown while the full model runs.
+
+    A failing preview is only logged: the full model still produces the result.
+    `full_resolution` only selects how the original is decoded, so the full
+    run can reuse it; the preview itself is always at working size.
+
+    Returns:
+        tuple: (original, preview_image), original being a LazyOriginal;
+        (None, None) if the image was rejected, (original, None) if the preview failed
+    """
+    stages = stages if stages is not None else StageCache(0)
+    source = source or source_key(image_bytes)
+
+    image, working = load_image(image_bytes, stages, source, full_resolution)
+    if image is None:
+        return None, None
+
+    try:
+        return image, segment_image(image_bytes, image, working, stages, source, PREVIEW_MODEL_NAME)
+    except ServerBusy:
+        # No preview; the full run waits in the queue or reports that it is full
+        return image, None
+    except Exception as e:
+        print(f"Error computing preview: {str(e)}")  # Log for debugging
+        ERRORS.inc(frontend="app")
+        return image, None
+
+
+def process_images(image_bytes_list, stages=None, sources=None, full_resolution=False, model_name=MODEL_NAME):
+    """Batched variant of process_image: one segmentation pass for several images.
+
+    Args:
+        image_bytes_list: Tuple of raw image bytes
+        stages: Optional StageCache memoizing the resize and segment stages
+        sources: source_key of each image, if already computed
+        full_resolution: Cut out the sources at full size instead of the working images
+        model_name: Segmentation model (see SELECTABLE_MODELS)
+
+    Returns:
+        list: One (original, fixed_image) tuple per input, original being a
+        LazyOriginal; (None, None) for rejected images
+    """
+    stages = stages if stages is not None else StageCache(0)
+    sources = sources or [source_key(image_bytes) for image_bytes in image_bytes_list]
+    with _batch_executor(len(image_bytes_list)) as executor:
+        count = len(image_bytes_list)
+        loaded = list(executor.map(load_image, image_bytes_list, [stages] * count, sources, [full_resolution] * count))
+
+    results = [(None, None)] * len(loaded)
+    valid = [idx for idx, (image, _) in enumerate(loaded) if image is not None]
+    if not valid:
+        return results
+
+    try:
+        keys = {idx: segment_key(sources[idx], model_name, full_resolution) for idx in valid}
+        fixed = {idx: stages.get("segment", keys[idx]) for idx in valid}
+        missing = [idx for idx in valid if fixed[idx] is None]
+        if missing:
+            working = [loaded[idx][1] for idx in missing]
+            compact_masks = compute_masks(tuple(image_bytes_list[idx] for idx in missing), working, model_name)
+            for idx, image, compact_mask in zip(missing, working, compact_masks):
+                fixed[idx] = apply_mask(image, compact_mask, source_image_for(loaded[idx][0], full_resolution))
+                stages.put("segment", keys[idx], fixed[idx])
+        for idx in valid:
+            results[idx] = (loaded[idx][0], fixed[idx])
+    except ServerBusy as e:
+        REJECTIONS.inc(frontend="app", reason="busy")
+        st.error(str(e))
+        return [(None, None)] * len(loaded)
+    except Exception as e:
+        print(f"Error processing image batch: {str(e)}")  # Log for debugging
+        ERRORS.inc(frontend="app")
+        st.error("An error occurred while processing the images. Please try again.")
+        return [(None, None)] * len(loaded)
+
+    return results
+
+
 def format_file_size(size_in_bytes):
     """Format a file size in bytes to a human-readable string."""
     if size_in_bytes < 1024:
@@ -179,89 +533,147 @@ def format_file_size(size_in_bytes):
         return f"{size_in_bytes / (1024 * 1024):.1f} MB"
 
 
-def apply_background_replacement(fixed_img, bg_mode, bg_color=None, bg_blur_radius=15, bg_custom_image=None, original_img=None):
-    """Apply background replacement to a processed (transparent) image.
+def create_zip_archive(images_data, output=None):
+    """Write a ZIP archive of (filename, bytes) tuples to a file object.
+
+    PNG, WEBP and JPEG payloads are already compressed, so they are stored
+    as-is (ZIP_STORED); deflating them again costs CPU for no size gain.
+    Other files are deflated.
 
     Args:
-        fixed_img: PIL Image with transparent background (RGBA)
-        bg_mode: One of 'transparent', 'solid_color', 'blur', 'custom_image'
-        bg_color: Hex color string for solid_color mode
-        bg_blur_radius: Blur radius for blur mode
-        bg_custom_image: PIL Image for custom_image mode
-        original_img: Original PIL Image for blur mode
+        images_data: Iterable of (filename, image_bytes) tuples
+        output: Writable, seekable binary file; defaults to a spooled temporary
+            file kept in memory up to ZIP_SPOOL_MAX_SIZE, then moved to disk
+
+    Returns:
+        The file object holding the archive, rewound to the start. Reading
+        it for st.download_button still materializes the whole archive.
+    """
+    if output is None:
+        output = tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_MAX_SIZE)
+    with timed(None, "zip"), zipfile.ZipFile(output, "w") as zf:
+        for filename, img_bytes in images_data:
+            compress_type = (
+                zipfile.ZIP_STORED
+                if filename.lower().endswith(STORED_EXTENSIONS)
+                else zipfile.ZIP_DEFLATED
+            )
+            zf.writestr(filename, img_bytes, compress_type=compress_type)
+    BYTES_ENCODED.inc(output.tell(), format="ZIP")
+    output.seek(0)
+    return output
+
+
+def read_upload(upload):
+    """Read the raw bytes of an upload or of an allowed default image path.
 
     Returns:
-        PIL Image with the replacement background applied
+        tuple: (image_bytes, original_filename), or None if the source was rejected
     """
-    if bg_mode == "transparent":
-        return fixed_img
-
-    # Ensure the fixed image is RGBA
-    if fixed_img.mode != "RGBA":
-        fixed_img = fixed_img.convert("RGBA")
-
-    target_size = fixed_img.size
-
-    if bg_mode == "solid_color" and bg_color is not None:
-        # Parse hex color
-        hex_color = bg_color.lstrip("#")
-        r, g, b = int(hex_color[0:2], 16), int(hex_color[2:4], 16), int(hex_color[4:6], 16)
-        background = Image.new("RGBA", target_size, (r, g, b, 255))
-        background.paste(fixed_img, (0, 0), fixed_img)
-        return background
-
-    if bg_mode == "blur" and original_img is not None:
-        blurred = original_img.copy()
-        blurred = blurred.resize(target_size, Image.BICUBIC)
-        blurred = blurred.filter(ImageFilter.GaussianBlur(radius=bg_blur_radius))
-        if blurred.mode != "RGBA":
-            blurred = blurred.convert("RGBA")
-        blurred.paste(fixed_img, (0, 0), fixed_img)
-        return blurred
-
-    if bg_mode == "custom_image" and bg_custom_image is not None:
-        custom_bg = bg_custom_image.copy()
-        custom_bg = custom_bg.resize(target_size, Image.BICUBIC)
-        if custom_bg.mode != "RGBA":
-            custom_bg = custom_bg.convert("RGBA")
-        custom_bg.paste(fixed_img, (0, 0), fixed_img)
-        return custom_bg
-
-    # Fallback: return as-is
-    return fixed_img
-
-
-def create_zip_archive(images_data):
-    """Create a ZIP archive from a list of (filename, bytes) tuples.
+    if isinstance(upload, str):
+        # Default image path
+        if upload not in DEFAULT_IMAGES:
+            st.error("Invalid image path.")
+            print(
+                f"Security Warning: Attempted access to disallowed file: {upload}"
+            )
+            return None
+
+        if not os.path.exists(upload):
+            st.error(f"Default image not found at path: {upload}")
+            return None
+        with open(upload, "rb") as f:
+            image_bytes = f.read()
+        return image_bytes, os.path.basename(upload)
+
+    # Uploaded file
+    return upload.getvalue(), upload.name
+
+
+def background_key(bg_mode, bg_color=None, bg_blur_radius=15, bg_custom_key=None):
+    """The background settings a composite depends on, or None if they cannot be identified."""
+    if bg_mode == "solid_color":
+        return (bg_mode, bg_color)
+    if bg_mode == "blur":
+        return (bg_mode, bg_blur_radius)
+    if bg_mode == "custom_image":
+        return (bg_mode, bg_custom_key) if bg_custom_key is not None else None
+    return (bg_mode,)
+
+
+def render_result(image, fixed, original_filename, output_format="PNG", bg_mode="transparent", bg_color=None, bg_blur_radius=15, bg_custom_image=None, stages=None, source=None, bg_custom_key=None, model_name=MODEL_NAME, encode=True, full_resolution=False, encoder_preset=ENCODER_PRESET):
+    """Apply the background replacement to a processed image and encode it.
 
     Args:
-        images_data: List of (filename, image_bytes) tuples
+        stages: Optional StageCache memoizing the composite and encode stages
+        source: source_key of the upload; without it nothing is memoized
+        bg_custom_key: source_key of the custom background upload; custom
+            backgrounds are only memoized when it is given
+        model_name: Model that produced `fixed`
+        full_resolution: Whether `fixed` was cut out at full resolution
+        encoder_preset: Encoder preset for the output (see bg_remove_core.encoding)
+        encode: Skip encoding (result_bytes is None) when False, e.g. for previews
 
     Returns:
-        bytes: ZIP archive content
+        tuple: (original_image, result_image, output_filename, result_bytes)
     """
-    zip_buffer = BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-        for filename, img_bytes in images_data:
-            zf.writestr(filename, img_bytes)
-    return zip_buffer.getvalue()
+    stages = stages if stages is not None else StageCache(0)
+    composite_key = None
+    bg_key = background_key(bg_mode, bg_color, bg_blur_radius, bg_custom_key)
+    # JPEG has no alpha channel, so composite straight to RGB
+    rgb = output_format == "JPEG"
+    if source is not None and bg_key is not None:
+        composite_key = (segment_key(source, model_name, full_resolution), bg_key, rgb)
+
+    def replace_background():
+        blurred = None
+        if bg_mode == "blur" and image is not None:
+            # Kept apart from the composite so a radius can be revisited in any output format
+            blur_key = (source, bg_blur_radius, fixed.size) if source is not None else None
+            blurred = stages.run(
+                "background", blur_key, lambda: pyramid_blur(decoded(image), fixed.size, bg_blur_radius)
+            )
+        return apply_background_replacement(
+            fixed_img=fixed,
+            bg_mode=bg_mode,
+            bg_color=bg_color,
+            bg_blur_radius=bg_blur_radius,
+            bg_custom_image=bg_custom_image,
+            # The blurred original is computed above, so its pixels are only decoded on a background miss
+            original_img=None,
+            rgb=rgb,
+            blurred_background=blurred,
+        )
 
+    # Apply background replacement
+    result = stages.run("composite", composite_key, replace_background)
 
-def get_format_extension(output_format):
-    """Get the file extension for a given output format."""
-    extensions = {"PNG": "png", "WEBP": "webp", "JPEG": "jpg"}
-    return extensions.get(output_format, "png")
+    # Generate output filename
+    ext = get_format_extension(output_format)
+    filename_base = os.path.splitext(original_filename)[0]
+    output_filename = f"{filename_base}_rmbg.{ext}"
 
+    if not encode:
+        return image, result, output_filename, None
 
-def get_format_mime(output_format):
-    """Get the MIME type for a given output format."""
-    mimes = {"PNG": "image/png", "WEBP": "image/webp", "JPEG": "image/jpeg"}
-    return mimes.get(output_format, "image/png")
+    # Convert to output format
+    result_bytes = stages.run(
+        "encode",
+        (composite_key, output_format, encoder_preset) if composite_key is not None else None,
+        lambda: convert_image_to_format(result, output_format, encoder_preset),
+    )
+
+    return image, result, output_filename, result_bytes
 
 
-def fix_image(upload, output_format="PNG", bg_mode="transparent", bg_color=None, bg_blur_radius=15, bg_custom_image=None):
+def fix_image(upload, output_format="PNG", bg_mode="transparent", bg_color=None, bg_blur_radius=15, bg_custom_image=None, bg_custom_key=None, on_preview=None, full_resolution=False, model_name=MODEL_NAME, encoder_preset=ENCODER_PRESET):
     """Process a single image: remove background, apply replacement, display results.
 
+    Every stage is memoized in the shared StageCache, so a rerun only
+    recomputes the stages whose inputs changed. When the full model has to
+    run, `on_preview` first receives the result rendered from the
+    lightweight preview model (with result_bytes None).
+
     Args:
         upload: File upload object or string path to default image
         output_format: Output format (PNG, WEBP, JPEG)
@@ -269,72 +681,239 @@ def fix_image(upload, output_format="PNG", bg_mode="transparent", bg_color=None,
         bg_color: Hex color for solid_color mode
         bg_blur_radius: Blur radius for blur mode
         bg_custom_image: PIL Image for custom background
+        bg_custom_key: source_key of the custom background upload
+        on_preview: Optional callback receiving the preview result tuple
+        full_resolution: Cut out the source at full size (mask upsampled from the working image)
+        model_name: Segmentation model (see SELECTABLE_MODELS); no preview is
+            shown when it is the preview model itself
+        encoder_preset: Encoder preset for the output (see bg_remove_core.encoding)
 
     Returns:
-        tuple: (original_image, result_image, output_filename, result_bytes) or None on failure
+        tuple: (original, result_image, output_filename, result_bytes) or None on failure;
+        original is a LazyOriginal, decoded only if a stage needs it
     """
     try:
-        # Read image bytes
-        if isinstance(upload, str):
-            # Default image path
-            if upload not in DEFAULT_IMAGES:
-                st.error("Invalid image path.")
-                print(
-                    f"Security Warning: Attempted access to disallowed file: {upload}"
-                )
-                return None
-
-            if not os.path.exists(upload):
-                st.error(f"Default image not found at path: {upload}")
-                return None
-            with open(upload, "rb") as f:
-                image_bytes = f.read()
-            original_filename = os.path.basename(upload)
-        else:
-            # Uploaded file
-            image_bytes = upload.getvalue()
-            original_filename = upload.name
-
-        # Process image (using cache if available)
-        image, fixed = process_image(image_bytes)
-        if image is None or fixed is None:
+        source = read_upload(upload)
+        if source is None:
             return None
-
-        # Apply background replacement
-        result = apply_background_replacement(
-            fixed_img=fixed,
+        image_bytes, original_filename = source
+        stages = get_stage_cache()
+        key = source_key(image_bytes)
+        render_kwargs = dict(
+            output_format=output_format,
             bg_mode=bg_mode,
             bg_color=bg_color,
             bg_blur_radius=bg_blur_radius,
             bg_custom_image=bg_custom_image,
-            original_img=image,
+            stages=stages,
+            source=key,
+            bg_custom_key=bg_custom_key,
+            encoder_preset=encoder_preset,
         )
 
-        # Generate output filename
-        ext = get_format_extension(output_format)
-        filename_base = os.path.splitext(original_filename)[0]
-        output_filename = f"{filename_base}_rmbg.{ext}"
+        image = None
+        if (
+            on_preview is not None
+            and PREVIEW_MODEL_NAME
+            and model_name != PREVIEW_MODEL_NAME
+            and not mask_ready(image_bytes, stages, key, full_resolution, model_name)
+        ):
+            image, preview = preview_image(image_bytes, stages=stages, source=key, full_resolution=full_resolution)
+            if image is None:
+                return None
+            if preview is not None:
+                on_preview(
+                    render_result(
+                        image, preview, original_filename, model_name=PREVIEW_MODEL_NAME, encode=False, **render_kwargs
+                    )
+                )
 
-        # Convert to output format
-        result_bytes = convert_image_to_format(result, output_format)
+        # Process image (using cache if available)
+        image, fixed = process_image(
+            image_bytes, stages=stages, source=key, full_resolution=full_resolution, model_name=model_name, original=image
+        )
+        if image is None or fixed is None:
+            return None
 
-        return image, result, output_filename, result_bytes
+        return render_result(
+            image, fixed, original_filename, model_name=model_name, full_resolution=full_resolution, **render_kwargs
+        )
 
     except Exception:
         st.error("An error occurred. Please try again.")
         print(f"Error in fix_image: {traceback.format_exc()}")
+        ERRORS.inc(frontend="app")
         return None
 
 
-def display_single_result(image, result, output_filename, result_bytes, output_format, is_default=False, key_suffix=""):
-    """Display the before/after comparison and download button for a single image."""
+def _attach_script_run_ctx(ctx):
+    """Thread initializer so worker threads can call Streamlit elements (st.error, caches)."""
+    if ctx is not None:
+        add_script_run_ctx(threading.current_thread(), ctx)
+
+
+def _batch_executor(jobs, max_workers=None):
+    """Create a thread pool for at most `jobs` tasks that can use Streamlit from its workers."""
+    return ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers or BATCH_WORKERS, jobs)),
+        thread_name_prefix="bg_remove_batch",
+        initializer=_attach_script_run_ctx,
+        initargs=(get_script_run_ctx(),),
+    )
+
+
+def process_batch(uploads, on_progress=None, max_workers=None, batch_size=None, **render_kwargs):
+    """Process several uploads with batched inference and a thread pool for the rest.
+
+    Uploads are segmented in chunks of `batch_size` images (one model call per
+    chunk). While the next chunk is being segmented, the background replacement
+    and encoding of finished chunks run on the worker threads.
+
+    Args:
+        uploads: List of file upload objects or default image paths
+        on_progress: Optional callback(done, total) invoked as each image finishes
+        max_workers: Number of worker threads (defaults to BATCH_WORKERS)
+        batch_size: Images per inference call (defaults to INFERENCE_BATCH_SIZE)
+        **render_kwargs: Output options forwarded to render_result (stages are
+            memoized in the shared StageCache)
+
+    Returns:
+        list: One entry per upload, in input order. Each entry is the fix_image
+        result tuple, or None if that image failed.
+    """
+    results = [None] * len(uploads)
+    if not uploads:
+        return results
+
+    # PIL decodes lazily; load the shared background once instead of racing on it from every worker
+    bg_custom_image = render_kwargs.get("bg_custom_image")
+    if bg_custom_image is not None:
+        bg_custom_image.load()
+
+    total = len(uploads)
+    done = 0
+
+    def finish(idx, result):
+        nonlocal done
+        results[idx] = result
+        done += 1
+        if on_progress is not None:
+            on_progress(done, total)
+
+    def collect(futures):
+        for future in futures:
+            idx = pending.pop(future)
+            try:
+                finish(idx, future.result())
+            except Exception:
+                st.error("An error occurred. Please try again.")
+                print(f"Error in batch worker: {traceback.format_exc()}")
+                ERRORS.inc(frontend="app")
+                finish(idx, None)
+
+    sources = []
+    for idx, upload in enumerate(uploads):
+        source = read_upload(upload)
+        if source is None:
+            finish(idx, None)
+        else:
+            sources.append((idx, source))
+
+    stages = get_stage_cache()
+    keys = {idx: source_key(image_bytes) for idx, (image_bytes, _) in sources}
+
+    batch_size = max(1, batch_size or INFERENCE_BATCH_SIZE)
+    pending = {}
+    with _batch_executor(len(sources), max_workers) as executor:
+        for start in range(0, len(sources), batch_size):
+            chunk = sources[start : start + batch_size]
+            processed = process_images(
+                tuple(image_bytes for _, (image_bytes, _) in chunk),
+                stages=stages,
+                sources=[keys[idx] for idx, _ in chunk],
+                full_resolution=render_kwargs.get("full_resolution", False),
+                model_name=render_kwargs.get("model_name", MODEL_NAME),
+            )
+            for (idx, (_, original_filename)), (image, fixed) in zip(chunk, processed):
+                if image is None or fixed is None:
+                    finish(idx, None)
+                    continue
+                future = executor.submit(
+                    render_result, image, fixed, original_filename, stages=stages, source=keys[idx], **render_kwargs
+                )
+                pending[future] = idx
+            collect([future for future in list(pending) if future.done()])
+        collect(as_completed(list(pending)))
+
+    return results
+
+
+def display_rendition(image, stages=None, max_size=DISPLAY_MAX_SIZE):
+    """make_rendition(image, max_size), memoized in the "display" stage.
+
+    Renditions are smaller than Streamlit's 1460px width cap, so st.image sends
+    their bytes to the browser as they are instead of re-encoding the image on
+    every rerun. An original (a LazyOriginal) is keyed by its upload, so its
+    rendition is built, and the upload decoded for it, once per upload and
+    decode size. Other images are the outputs memoized by the earlier stages,
+    so they are keyed by identity; the weak reference stored with the rendition
+    tells a recycled id apart from the image it was made for.
+
+    Returns:
+        tuple: (image_bytes, image_format), or (None, None) if an original could not be decoded
+    """
+    stages = stages if stages is not None else get_stage_cache()
+    if isinstance(image, LazyOriginal):
+        key = (image.source, image.full_resolution, max_size)
+        cached = stages.get("display", key)
+        if cached is not None:
+            return cached[0], cached[1]
+        original = image.get()
+        if original is None:
+            return None, None
+        with timed(None, "display"):
+            rendition = make_rendition(original, max_size)
+        stages.put("display", key, rendition)
+        return rendition
+
+    key = (id(image), max_size)
+    cached = stages.get("display", key)
+    if cached is not None and cached[0]() is image:
+        return cached[1], cached[2]
+    with timed(None, "display"):
+        image_bytes, image_format = make_rendition(image, max_size)
+    stages.put("display", key, (weakref.ref(image), image_bytes, image_format))
+    return image_bytes, image_format
+
+
+def show_image(container, image, max_size=DISPLAY_MAX_SIZE):
+    """Show a PIL image or LazyOriginal in `container` through its display rendition; anything else is passed to st.image as is."""
+    if not isinstance(image, LazyOriginal):
+        size = getattr(image, "size", None)
+        if not (isinstance(size, tuple) and hasattr(image, "getbands")):
+            container.image(image, use_container_width=True)
+            return
+    image_bytes, image_format = display_rendition(image, max_size=max_size)
+    if image_bytes is not None:
+        container.image(image_bytes, output_format=image_format, use_container_width=True)
+
+
+def display_single_result(image, result, output_filename, result_bytes, output_format, is_default=False, key_suffix="", preview=False):
+    """Display the before/after comparison and download button for a single image.
+
+    A preview (from the lightweight model) is shown without a download button.
+    """
     col1, col2 = st.columns(2)
 
     col1.subheader("Original Image :camera:")
-    col1.image(image, use_container_width=True)
+    show_image(col1, image)
 
     col2.subheader("Background Removed :sparkles:")
-    col2.image(result, use_container_width=True)
+    show_image(col2, result)
+
+    if preview:
+        col2.caption("Quick preview. Refining the edges with the full model...")
+        return
 
     if is_default:
         col2.caption(
@@ -356,8 +935,40 @@ def display_single_result(image, result, output_filename, result_bytes, output_f
     )
 
 
+def show_preview_in(placeholder, output_format, on_shown=None):
+    """on_preview callback for fix_image: show the preview in `placeholder` until the result replaces it."""
+
+    def show(preview):
+        image, processed, output_filename, _ = preview
+        with placeholder.container():
+            display_single_result(image, processed, output_filename, None, output_format, preview=True)
+        if on_shown is not None:
+            on_shown()
+
+    return show
+
+
+def show_queue_position_in(placeholder):
+    """on_wait callback for the inference gate: show this session's place in the queue in `placeholder`."""
+
+    def show(position, wait):
+        estimate = f", about {wait} seconds to go" if wait is not None else ""
+        placeholder.info(f"The server is busy. Your images are number {position} in the queue{estimate}.")
+
+    return show
+
+
 def display_batch_results(results, output_format):
-    """Display results for batch processing in a grid layout.
+    """Display results for batch processing as a paginated grid of thumbnails.
+
+    Only the thumbnails of the current page are rendered. An image's
+    before/after comparison and download button are shown once it is opened.
+
+    The ZIP of all results is not streamed: Streamlit 1.42's download_button
+    takes its data as bytes when it is drawn and serves them from its
+    in-memory media store. A session that prepares the ZIP therefore holds
+    the whole archive in memory (in session_state, to reuse it across
+    reruns) until another batch is shown.
 
     Args:
         results: List of (original_image, result_image, output_filename, result_bytes) tuples
@@ -367,38 +978,99 @@ def display_batch_results(results, output_format):
         return
 
     st.subheader(f"Processed {len(results)} image(s)")
+    batch_names = tuple(filename for _, _, filename, _ in results)
+
+    # A new batch starts on its first page with nothing opened
+    if st.session_state.get("batch_shown") != batch_names:
+        st.session_state["batch_shown"] = batch_names
+        st.session_state["batch_page"] = 0
+        st.session_state["batch_open"] = None
+        # Free the previous batch's archive; a new one is only built on request
+        st.session_state.pop("batch_zip", None)
+
+    page_count = -(-len(results) // BATCH_PAGE_SIZE)
+
+    def turn_page(step):
+        # on_click callbacks run before the rerun, so the buttons are drawn for the new page
+        st.session_state["batch_page"] = min(max(st.session_state["batch_page"] + step, 0), page_count - 1)
+
+    page = st.session_state["batch_page"]
+    if page_count > 1:
+        prev_col, label_col, next_col = st.columns(3)
+        prev_col.button("Previous", disabled=page == 0, use_container_width=True, key="batch_prev", on_click=turn_page, args=(-1,))
+        next_col.button("Next", disabled=page == page_count - 1, use_container_width=True, key="batch_next", on_click=turn_page, args=(1,))
+        label_col.markdown(f"Page {page + 1} of {page_count}")
+
+    # Filled in after the grid, once a click on "Open" is known
+    opened_container = st.container()
+
+    start = page * BATCH_PAGE_SIZE
+    shown = list(enumerate(results))[start:start + BATCH_PAGE_SIZE]
+    for row_start in range(0, len(shown), BATCH_GRID_COLUMNS):
+        row = shown[row_start:row_start + BATCH_GRID_COLUMNS]
+        for cell, (idx, (_, result, output_filename, result_bytes)) in zip(st.columns(BATCH_GRID_COLUMNS), row):
+            show_image(cell, result, THUMBNAIL_SIZE)
+            cell.caption(f"{output_filename} ({format_file_size(len(result_bytes))})")
+            if cell.button("Open", use_container_width=True, key=f"open_batch_{idx}"):
+                st.session_state["batch_open"] = idx
+
+    idx = st.session_state["batch_open"]
+    if idx is not None:
+        image, result, output_filename, result_bytes = results[idx]
+        with opened_container.container(border=True):
+            if st.button("Close", key="close_batch"):
+                st.session_state["batch_open"] = None
+            else:
+                st.markdown(f"**Image {idx + 1}: {output_filename}**")
+                col1, col2 = st.columns(2)
+
+                col1.subheader("Original :camera:")
+                show_image(col1, image)
+
+                col2.subheader("Result :sparkles:")
+                show_image(col2, result)
+                size_str = format_file_size(len(result_bytes))
+                col2.download_button(
+                    f"Download {output_filename} ({size_str})",
+                    result_bytes,
+                    output_filename,
+                    get_format_mime(output_format),
+                    use_container_width=True,
+                    key=f"download_batch_{idx}",
+                )
 
-    # Display results in a grid (2 columns: original | result per image)
-    for idx, (image, result, output_filename, result_bytes) in enumerate(results):
-        with st.expander(f"Image {idx + 1}: {output_filename}", expanded=(idx < 3)):
-            col1, col2 = st.columns(2)
-
-            col1.subheader("Original :camera:")
-            col1.image(image, use_container_width=True)
-
-            col2.subheader("Result :sparkles:")
-            col2.image(result, use_container_width=True)
-            size_str = format_file_size(len(result_bytes))
-            col2.download_button(
-                f"Download {output_filename} ({size_str})",
-                result_bytes,
-                output_filename,
-                get_format_mime(output_format),
-                use_container_width=True,
-                key=f"download_batch_{idx}",
-            )
-
-    # Download All as ZIP
+    # Download All as ZIP: the archive is only built once the user asks for it,
+    # then kept for as long as the same batch is shown
     st.markdown("---")
-    zip_data = [(filename, img_bytes) for _, _, filename, img_bytes in results]
-    zip_bytes = create_zip_archive(zip_data)
-    zip_size_str = format_file_size(len(zip_bytes))
+    # Stored entries: the archive is the payloads plus a few dozen bytes per file
+    zip_size_str = format_file_size(sum(len(img_bytes) for *_, img_bytes in results))
+    if st.session_state.get("zip_requested") != batch_names:
+        if not st.button(
+            f"Prepare ZIP of all images ({zip_size_str})",
+            help=f"Bundle {len(results)} images into a ZIP archive for download",
+            use_container_width=True,
+            key="prepare_zip",
+        ):
+            return
+        st.session_state["zip_requested"] = batch_names
+
+    # Reruns (paging, opening an image) reuse the built archive. The entries are
+    # compared item by item, an identity check for results from the render cache,
+    # so a change of settings that alters the results still rebuilds it.
+    zip_entries = tuple((filename, img_bytes) for _, _, filename, img_bytes in results)
+    built = st.session_state.get("batch_zip")
+    if built is None or built[0] != zip_entries:
+        with create_zip_archive(zip_entries) as archive:
+            built = (zip_entries, archive.read())
+        st.session_state["batch_zip"] = built
+    zip_bytes = built[1]
     st.download_button(
         f"Download All as ZIP ({zip_size_str})",
         zip_bytes,
         "background_removed_images.zip",
         "application/zip",
-        help=f"Download {len(results)} images as a ZIP archive\nTotal size: {zip_size_str}",
+        help=f"Download {len(results)} images as a ZIP archive\nTotal size: {zip_size_str}\n"
+        "The archive is kept in memory while this batch is shown.",
         use_container_width=True,
         type="primary",
         key="download_all_zip",
@@ -415,6 +1087,39 @@ output_format = st.sidebar.selectbox(
     help="Choose output format. JPEG will use a white background since it does not support transparency.",
 )
 
+# Output size: the model always runs on the working image; full resolution upsamples its mask
+output_size = st.sidebar.selectbox(
+    "Output size",
+    ["working", "full"],
+    index=1 if FULL_RESOLUTION else 0,
+    format_func=lambda x: {
+        "working": f"Up to {MAX_IMAGE_SIZE}px (faster)",
+        "full": f"Original resolution (up to {MAX_SOURCE_DIMENSION}px)",
+    }[x],
+    help="Original resolution cuts out the uploaded image at its full size with refined mask edges.",
+)
+full_resolution = output_size == "full"
+
+# Encoder preset: encode time against file size, same image
+encoder_preset = st.sidebar.selectbox(
+    "Encoding",
+    list(ENCODER_PRESETS),
+    index=list(ENCODER_PRESETS).index(ENCODER_PRESET),
+    format_func=lambda x: ENCODER_PRESET_LABELS[x],
+    help="Fast encodes quickly into larger files; Smallest takes longer to encode for smaller downloads. The image itself is the same.",
+)
+
+# Segmentation model: lighter models trade edge accuracy for speed
+model_name = MODEL_NAME
+if len(SELECTABLE_MODELS) > 1:
+    model_name = st.sidebar.selectbox(
+        "Model",
+        SELECTABLE_MODELS,
+        index=0,
+        format_func=lambda x: MODELS[x],
+        help="Lighter models are faster but cut out fine edges (hair, fur) less accurately.",
+    )
+
 # Background replacement options
 st.sidebar.markdown("---")
 st.sidebar.subheader("Background Replacement")
@@ -433,6 +1138,7 @@ bg_mode = st.sidebar.radio(
 bg_color = None
 bg_blur_radius = 15
 bg_custom_image = None
+bg_custom_key = None
 
 if output_format == "JPEG" and bg_mode == "transparent":
     st.sidebar.info("ℹ️ JPEG does not support transparency. Result will have a white background.")
@@ -449,6 +1155,7 @@ elif bg_mode == "custom_image":
     )
     if bg_upload is not None:
         bg_custom_image = Image.open(bg_upload)
+        bg_custom_key = source_key(bg_upload.getvalue())
     else:
         st.sidebar.info("👆 Upload an image to use as background")
 
@@ -466,7 +1173,7 @@ with st.sidebar.expander("Image Guidelines"):
     st.write("""
     - Maximum file size: 10MB per image
     - Up to 10 images at once (batch mode)
-    - Large images will be automatically resized
+    - Large images will be automatically resized (choose "Original resolution" to keep their size)
     - Supported formats: PNG, JPG, JPEG
     - Output formats: PNG, WEBP, JPEG
     - Processing time depends on image size
@@ -479,12 +1186,15 @@ if my_uploads:
         st.error(f"Too many files. Maximum {MAX_BATCH_SIZE} images allowed at once.")
         st.stop()
 
-    # Validate all files first
+    new_uploads = meter_uploads(my_uploads)
+
+    # Validate all files first: headers, then uploads that already failed to decode
     valid_uploads = []
-    for upload in my_uploads:
-        is_valid, error_msg = validate_uploaded_file(upload)
-        if not is_valid:
+    for upload, error_msg in zip(my_uploads, upload_errors(my_uploads)):
+        if error_msg is not None:
             st.error(error_msg)
+            if getattr(upload, "file_id", upload.name) in new_uploads:
+                REJECTIONS.inc(frontend="app", reason="invalid")
         else:
             valid_uploads.append(upload)
 
@@ -492,10 +1202,17 @@ if my_uploads:
         st.error("No valid files to process.")
         st.stop()
 
-    # Check rate limit
-    if not check_rate_limit():
+    # Charge the rate limit (reruns of the same request are free)
+    wait = charge_rate_limit(
+        valid_uploads,
+        model_name=model_name,
+        full_resolution=full_resolution,
+        settings_key=(output_format, bg_mode, bg_color, bg_blur_radius, bg_custom_key, encoder_preset),
+    )
+    if wait:
+        REJECTIONS.inc(frontend="app", reason="rate_limited")
         st.error(
-            "Rate limit exceeded. Please wait a minute before processing another image."
+            f"Rate limit exceeded. Please wait {math.ceil(wait)} seconds before processing more images."
         )
         st.stop()
 
@@ -512,24 +1229,38 @@ if my_uploads:
         status_text.text("Processing image...")
         progress_bar.progress(30)
 
-        result = fix_image(
-            upload,
-            output_format=output_format,
-            bg_mode=bg_mode,
-            bg_color=bg_color,
-            bg_blur_radius=bg_blur_radius,
-            bg_custom_image=bg_custom_image,
-        )
+        def preview_shown():
+            progress_bar.progress(50)
+            status_text.text(f"Preview ready in {time.time() - start_time:.2f} seconds, refining...")
+
+        queue_slot = st.empty()
+        result_slot = st.empty()
+        with get_inference_gate().notify_waits(show_queue_position_in(queue_slot)):
+            result = fix_image(
+                upload,
+                output_format=output_format,
+                bg_mode=bg_mode,
+                bg_color=bg_color,
+                bg_blur_radius=bg_blur_radius,
+                bg_custom_image=bg_custom_image,
+                bg_custom_key=bg_custom_key,
+                on_preview=show_preview_in(result_slot, output_format, preview_shown),
+                full_resolution=full_resolution,
+                model_name=model_name,
+                encoder_preset=encoder_preset,
+            )
+        queue_slot.empty()
 
         if result is not None:
             image, processed, output_filename, result_bytes = result
             progress_bar.progress(80)
             status_text.text("Displaying results...")
 
-            display_single_result(
-                image, processed, output_filename, result_bytes,
-                output_format, is_default=False, key_suffix="single"
-            )
+            with result_slot.container():
+                display_single_result(
+                    image, processed, output_filename, result_bytes,
+                    output_format, is_default=False, key_suffix="single"
+                )
 
             progress_bar.progress(100)
             processing_time = time.time() - start_time
@@ -542,22 +1273,30 @@ if my_uploads:
         progress_bar = st.sidebar.progress(0)
         status_text = st.sidebar.empty()
 
-        results = []
-        for idx, upload in enumerate(valid_uploads):
-            progress_pct = int(10 + (80 * idx / len(valid_uploads)))
-            progress_bar.progress(progress_pct)
-            status_text.text(f"Processing image {idx + 1} of {len(valid_uploads)}...")
+        def update_batch_progress(done, total):
+            progress_bar.progress(int(10 + (80 * done / total)))
+            status_text.text(f"Processed {done} of {total} images...")
 
-            result = fix_image(
-                upload,
+        progress_bar.progress(10)
+        status_text.text(f"Processing {len(valid_uploads)} images...")
+
+        queue_slot = st.empty()
+        with get_inference_gate().notify_waits(show_queue_position_in(queue_slot)):
+            batch_results = process_batch(
+                valid_uploads,
+                on_progress=update_batch_progress,
                 output_format=output_format,
                 bg_mode=bg_mode,
                 bg_color=bg_color,
                 bg_blur_radius=bg_blur_radius,
                 bg_custom_image=bg_custom_image,
+                bg_custom_key=bg_custom_key,
+                full_resolution=full_resolution,
+                model_name=model_name,
+                encoder_preset=encoder_preset,
             )
-            if result is not None:
-                results.append(result)
+        queue_slot.empty()
+        results = [result for result in batch_results if result is not None]
 
         progress_bar.progress(90)
         status_text.text("Preparing results...")
@@ -580,6 +1319,10 @@ else:
                 bg_color=bg_color,
                 bg_blur_radius=bg_blur_radius,
                 bg_custom_image=bg_custom_image,
+                bg_custom_key=bg_custom_key,
+                full_resolution=full_resolution,
+                model_name=model_name,
+                encoder_preset=encoder_preset,
             )
             if result is not None:
                 image, processed, output_filename, result_bytes = result
@@ -590,3 +1333,12 @@ else:
             break
     else:
         st.info("Please upload an image to get started!")
+
+# Render stage counters (shared by all sessions of this server process)
+with st.sidebar.expander("Render cache"):
+    st.table(
+        [
+            {"stage": stage, "hits": counts["hits"], "misses": counts["misses"]}
+            for stage, counts in get_stage_cache().stats().items()
+        ]
+    )
@@ -0,0 +1,5 @@
+"""Streamlit-free processing engine used by the background removal app.
+
+Modules in this package must not import Streamlit so they can be reused
+from worker processes, benchmarks and command-line tools.
+"""
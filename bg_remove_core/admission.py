@@ -0,0 +1,201 @@
+"""Admission control for model inference.
+
+Every Streamlit session, API request and batch chunk runs the model in its
+own thread, and each onnxruntime session already uses one thread per core.
+Left alone, a spike of N requests runs N inferences at once: the thread
+pools oversubscribe the cores and every request slows down together.
+
+``InferenceGate`` lets a fixed number of inferences run at once and queues
+the rest, first come first served. The queue is bounded: once it is full,
+further requests fail at once with ``ServerBusy`` instead of piling up.
+Waiting callers can be told their position in the queue and an estimated
+wait, from a moving average of the inference time per image.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Weight of the newest inference in the moving average of seconds per image
+AVERAGE_WEIGHT = 0.2
+
+
+class ServerBusy(Exception):
+    """The inference queue is full; the message is meant for the user.
+
+    Attributes:
+        retry_after: Estimated seconds until the queue has room, or None if
+            no inference has finished yet
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    """A waiting caller (compared by identity)."""
+
+    __slots__ = ("images",)
+
+    def __init__(self, images):
+        self.images = images
+
+
+class InferenceGate:
+    """Runs at most `concurrency` inferences at once, queueing up to `max_queue` more.
+
+    Args:
+        concurrency: Inferences allowed to run at the same time
+        max_queue: Callers allowed to wait for a turn; 0 rejects any caller
+            that cannot run at once
+        poll_interval: Seconds between checks of a waiting caller's position
+            (its turn itself is signalled immediately)
+    """
+
+    def __init__(self, concurrency, max_queue, poll_interval=1.0):
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(0, max_queue)
+        self.poll_interval = poll_interval
+        self.seconds_per_image = None
+        self.rejected = 0
+        self._running = 0
+        self._running_images = 0
+        self._queue = deque()  # _Ticket per waiting caller, in arrival order
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+    @property
+    def running(self):
+        return self._running
+
+    @property
+    def waiting(self):
+        return len(self._queue)
+
+    def collect_metrics(self):
+        """Slots, queue depth and rejections as metric families (see metrics.Registry.register_collector)."""
+        return [
+            (
+                "bg_remove_inference_running",
+                "gauge",
+                "Model calls running.",
+                [({}, self._running)],
+            ),
+            (
+                "bg_remove_inference_queue_depth",
+                "gauge",
+                "Model calls waiting for a slot.",
+                [({}, len(self._queue))],
+            ),
+            (
+                "bg_remove_inference_queue_rejections_total",
+                "counter",
+                "Model calls turned away because the queue was full.",
+                [({}, self.rejected)],
+            ),
+        ]
+
+    def estimated_wait(self, images_ahead):
+        """Seconds until `images_ahead` queued or running images are done, or None if unknown."""
+        if self.seconds_per_image is None:
+            return None
+        return images_ahead * self.seconds_per_image / self.concurrency
+
+    @contextmanager
+    def notify_waits(self, on_wait):
+        """Report this thread's waits to `on_wait(position, estimated_seconds)`.
+
+        Applies to every slot taken by the calling thread inside the block;
+        the callback runs whenever the position or the estimate changes.
+        """
+        previous = getattr(self._local, "on_wait", None)
+        self._local.on_wait = on_wait
+        try:
+            yield
+        finally:
+            self._local.on_wait = previous
+
+    @contextmanager
+    def slot(self, images=1):
+        """Hold one of the inference slots for the block, waiting for a turn if needed.
+
+        Args:
+            images: Images the inference covers (for the wait estimates)
+
+        Raises:
+            ServerBusy: If the queue is full
+        """
+        self._admit(images)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            per_image = (time.perf_counter() - start) / images
+            with self._cond:
+                self._running -= 1
+                self._running_images -= images
+                if self.seconds_per_image is None:
+                    self.seconds_per_image = per_image
+                else:
+                    self.seconds_per_image += AVERAGE_WEIGHT * (
+                        per_image - self.seconds_per_image
+                    )
+                self._cond.notify_all()
+
+    def _start(self, images):
+        self._running += 1
+        self._running_images += images
+
+    def _admit(self, images):
+        with self._cond:
+            if not self._queue and self._running < self.concurrency:
+                self._start(images)
+                return
+            if len(self._queue) >= self.max_queue:
+                self.rejected += 1
+                retry_after = self.estimated_wait(
+                    self._running_images + sum(ticket.images for ticket in self._queue)
+                )
+                raise ServerBusy(
+                    "The server is busy processing other images. Please try again in a moment.",
+                    retry_after,
+                )
+            ticket = _Ticket(images)
+            self._queue.append(ticket)
+
+        on_wait = getattr(self._local, "on_wait", None)
+        reported = None
+        try:
+            while True:
+                with self._cond:
+                    if self._queue[0] is ticket and self._running < self.concurrency:
+                        self._queue.popleft()
+                        self._start(images)
+                        # The next caller may be able to start as well
+                        self._cond.notify_all()
+                        return
+                    status = self._status(ticket)
+                    if on_wait is None or status == reported:
+                        self._cond.wait(self.poll_interval)
+                        continue
+                # Outside the lock: the callback may update a user interface
+                reported = status
+                on_wait(*status)
+        except BaseException:
+            with self._cond:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    self._cond.notify_all()
+            raise
+
+    def _status(self, ticket):
+        """(position in the queue from 1, estimated seconds to wait or None)."""
+        images_ahead = self._running_images
+        for position, queued in enumerate(self._queue, 1):
+            if queued is ticket:
+                wait = self.estimated_wait(images_ahead)
+                return position, None if wait is None else round(wait)
+            images_ahead += queued.images
+        raise ValueError("ticket is not queued")
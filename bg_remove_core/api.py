@@ -0,0 +1,400 @@
+"""Headless HTTP API for the background removal pipeline.
+
+Usage:
+    python -m bg_remove_core.api [--port 8080] [--address 0.0.0.0] [--xheaders]
+        [--metrics-port 8503]
+
+``POST /remove`` takes the image as the raw request body, or as the
+``image`` field of a ``multipart/form-data`` body (with a ``background``
+image for ``background=custom_image``), and returns the encoded result.
+Query parameters (all optional):
+
+- ``format``: PNG (default), WEBP or JPEG
+- ``background``: transparent (default), solid_color, blur or custom_image
+- ``color``: ``#RRGGBB`` for solid_color (default #FFFFFF)
+- ``blur_radius``: 5-50 for blur (default 15)
+- ``model``: one of the deployment's selectable models (BG_REMOVE_MODELS)
+- ``full_resolution``: 1 to cut out the original instead of the 2000px working size
+- ``preset``: encoder preset, fast, balanced or smallest (default
+  BG_REMOVE_ENCODER_PRESET, see bg_remove_core.encoding)
+
+Uploads go through the app's checks, in the same order: size and header
+validation, uploads that already failed to decode, then the cost-based rate
+limit per client address (see bg_remove_core.ratelimit; set
+BG_REMOVE_RATE_LIMIT_DB to share it with the app's processes). Errors are
+JSON objects (``{"error": message}``) with a 4xx/5xx status, and 429s carry
+a Retry-After header. Model calls wait for a turn at the process-wide
+inference gate (see bg_remove_core.admission); when its queue is full the
+request fails at once with a 503, with a Retry-After header once the gate
+has an estimate. ``GET /health`` reports that the server is up, ``GET /ready``
+that the models are warmed up (see bg_remove_core.warmup). The process's
+latency and throughput metrics are not served on the API's address: a
+separate listener on BG_REMOVE_METRICS_HOST (loopback by default) and
+``--metrics-port`` serves them at ``GET /metrics`` in the Prometheus text
+format (see bg_remove_core.metrics).
+
+The front end is asynchronous (tornado): request bodies are received by the
+event loop and refused as soon as they exceed the size limit, so slow
+uploads hold no worker. Only complete, validated uploads reach the thread
+pool that runs the pipeline.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import re
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from tornado import httputil
+from tornado.web import Application, HTTPError, RequestHandler, stream_request_body
+
+from bg_remove_core.admission import ServerBusy
+from bg_remove_core.encoding import ENCODER_PRESETS
+from bg_remove_core.metrics import (
+    BYTES_RECEIVED,
+    ERRORS,
+    IMAGES_RECEIVED,
+    REJECTIONS,
+)
+from bg_remove_core.pipeline import source_key
+from bg_remove_core.processing import (
+    BG_MODES,
+    MAX_FILE_SIZE,
+    OUTPUT_FORMATS,
+    ImageRejected,
+    check_upload,
+    get_format_extension,
+    get_format_mime,
+    image_cost,
+    open_image,
+    remove_background,
+)
+from bg_remove_core.settings import (
+    ENCODER_PRESET,
+    METRICS_HOST,
+    METRICS_PORT,
+    REJECTED_UPLOADS_MAX,
+    SELECTABLE_MODELS,
+    token_buckets,
+    warmup_steps,
+)
+from bg_remove_core.validation import RejectedUploads
+from bg_remove_core.warmup import Warmup, serve_metrics
+
+# Threads running the pipeline; uploads still being received do not use one
+API_WORKERS = max(
+    1, int(os.environ.get("BG_REMOVE_API_WORKERS", min(4, os.cpu_count() or 1)))
+)
+
+# A multipart body holds the image, an optional background image and the form overhead
+MAX_MULTIPART_SIZE = 2 * MAX_FILE_SIZE + 64 * 1024
+
+HEX_COLOR = re.compile(r"#?[0-9a-fA-F]{6}")
+
+PROCESSING_ERROR = "An error occurred while processing the image. Please try again."
+
+# Rejection reason counted in the metrics for each client error of POST /remove
+REJECTION_REASONS = {
+    400: "bad_request",
+    413: "too_large",
+    422: "invalid",
+    429: "rate_limited",
+    503: "busy",
+}
+
+
+def api_error(status, message):
+    """HTTPError whose message is returned to the client (never %-formatted)."""
+    return HTTPError(status, "%s", message)
+
+
+def parse_options(get_argument):
+    """Pipeline options from the query parameters.
+
+    Args:
+        get_argument: Callable(name, default) returning a query parameter
+
+    Returns:
+        dict: Keyword arguments for remove_background (without images)
+
+    Raises:
+        HTTPError: 400 for an invalid parameter
+    """
+    output_format = get_argument("format", "PNG").upper()
+    output_format = {"JPG": "JPEG"}.get(output_format, output_format)
+    if output_format not in OUTPUT_FORMATS:
+        raise api_error(400, f"format must be one of {', '.join(OUTPUT_FORMATS)}")
+
+    bg_mode = get_argument("background", "transparent")
+    if bg_mode not in BG_MODES:
+        raise api_error(400, f"background must be one of {', '.join(BG_MODES)}")
+
+    bg_color = get_argument("color", "#FFFFFF")
+    if not HEX_COLOR.fullmatch(bg_color):
+        raise api_error(400, "color must be a hex color like #FF0000")
+
+    try:
+        bg_blur_radius = int(get_argument("blur_radius", "15"))
+    except ValueError:
+        bg_blur_radius = None
+    if bg_blur_radius is None or not 5 <= bg_blur_radius <= 50:
+        raise api_error(400, "blur_radius must be an integer from 5 to 50")
+
+    model_name = get_argument("model", SELECTABLE_MODELS[0])
+    if model_name not in SELECTABLE_MODELS:
+        raise api_error(400, f"model must be one of {', '.join(SELECTABLE_MODELS)}")
+
+    full_resolution = get_argument("full_resolution", "0").lower()
+    if full_resolution not in ("0", "1", "false", "true"):
+        raise api_error(400, "full_resolution must be 0 or 1")
+
+    encoder_preset = get_argument("preset", ENCODER_PRESET)
+    if encoder_preset not in ENCODER_PRESETS:
+        raise api_error(400, f"preset must be one of {', '.join(ENCODER_PRESETS)}")
+
+    return dict(
+        output_format=output_format,
+        bg_mode=bg_mode,
+        bg_color=bg_color,
+        bg_blur_radius=bg_blur_radius,
+        full_resolution=full_resolution in ("1", "true"),
+        model_name=model_name,
+        encoder_preset=encoder_preset,
+    )
+
+
+class JsonErrorHandler(RequestHandler):
+    """Errors are returned as {"error": message}."""
+
+    def write_error(self, status_code, **kwargs):
+        message = self._reason
+        exc_info = kwargs.get("exc_info")
+        if exc_info is not None and isinstance(exc_info[1], HTTPError):
+            error = exc_info[1]
+            if error.log_message:
+                message = error.log_message % error.args
+        retry_after = getattr(self, "retry_after", None)
+        if status_code in (429, 503) and retry_after:
+            self.set_header("Retry-After", str(math.ceil(retry_after)))
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps({"error": message}))
+
+
+class HealthHandler(JsonErrorHandler):
+    def get(self):
+        self.write("ok\n")
+
+
+class ReadyHandler(JsonErrorHandler):
+    def initialize(self, warmup):
+        self.warmup = warmup
+
+    def get(self):
+        if self.warmup is not None and not self.warmup.ready:
+            error = f": {self.warmup.error}" if self.warmup.error else ""
+            raise api_error(503, f"{self.warmup.state}{error}")
+        self.write("ready\n")
+
+
+@stream_request_body
+class RemoveHandler(JsonErrorHandler):
+    """POST /remove: see the module docstring."""
+
+    def initialize(self, executor, rate_limiter, rejected):
+        self.executor = executor
+        self.rate_limiter = rate_limiter
+        self.rejected = rejected
+
+    def prepare(self):
+        # Everything that can be checked before the body arrives is checked here
+        self.options = parse_options(self.get_query_argument)
+        content_type = self.request.headers.get("Content-Type", "")
+        self.multipart = content_type.startswith("multipart/form-data")
+        self.max_body = MAX_MULTIPART_SIZE if self.multipart else MAX_FILE_SIZE
+        length = self.request.headers.get("Content-Length")
+        if length is not None and length.isdigit() and int(length) > self.max_body:
+            raise api_error(413, self.too_large())
+        # Bodies without a Content-Length (chunked) are cut off by tornado itself: it
+        # answers 400 and closes the connection once they exceed this, before data_received
+        self.request.connection.set_max_body_size(self.max_body)
+        self.chunks = []
+        self.received = 0
+
+    def write_error(self, status_code, **kwargs):
+        if status_code in REJECTION_REASONS:
+            REJECTIONS.inc(frontend="api", reason=REJECTION_REASONS[status_code])
+        elif status_code >= 500:
+            ERRORS.inc(frontend="api")
+        super().write_error(status_code, **kwargs)
+
+    def data_received(self, chunk):
+        self.received += len(chunk)
+        self.chunks.append(chunk)
+
+    def too_large(self):
+        return f"Request body too large. Maximum: {MAX_FILE_SIZE / 1024 / 1024:.1f}MB per image."
+
+    def uploads(self):
+        """(image, filename, background image or None) from the request body."""
+        body = b"".join(self.chunks)
+        self.chunks = []
+        if not self.multipart:
+            return body, "image", None
+
+        arguments, files = {}, {}
+        httputil.parse_body_arguments(
+            self.request.headers["Content-Type"], body, arguments, files
+        )
+        if "image" not in files:
+            raise api_error(400, "The multipart body needs an 'image' file field")
+        image = files["image"][0]
+        background = files.get("background", [None])[0]
+        # The name only ends up in messages and the Content-Disposition header
+        filename = re.sub(r"[^\w.\- ]", "_", os.path.basename(image.filename or ""))
+        return (
+            image.body,
+            filename or "image",
+            background.body if background is not None else None,
+        )
+
+    async def post(self):
+        IMAGES_RECEIVED.inc(frontend="api")
+        BYTES_RECEIVED.inc(self.received, frontend="api")
+        image_bytes, filename, background_bytes = self.uploads()
+        if not image_bytes:
+            raise api_error(400, "No image in the request body")
+        if self.options["bg_mode"] == "custom_image" and background_bytes is None:
+            raise api_error(
+                400, "background=custom_image needs a 'background' file field"
+            )
+
+        # Same order as the app: headers, known-bad uploads, then the rate limit
+        for name, data in (("image", image_bytes), ("background", background_bytes)):
+            if data is None:
+                continue
+            error = check_upload(filename if name == "image" else name, len(data), data)
+            if error is not None:
+                raise api_error(413 if len(data) > MAX_FILE_SIZE else 422, error)
+        key = source_key(image_bytes)
+        error = self.rejected.get(key)
+        if error is not None:
+            raise api_error(422, error)
+        cost = image_cost(
+            image_bytes, self.options["model_name"], self.options["full_resolution"]
+        )
+        self.retry_after = self.rate_limiter.take(self.request.remote_ip, cost)
+        if self.retry_after:
+            raise api_error(
+                429,
+                f"Rate limit exceeded. Please wait {math.ceil(self.retry_after)} seconds before processing another image.",
+            )
+
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(
+                self.executor, self.process, image_bytes, background_bytes, key
+            )
+        except ImageRejected as e:
+            raise api_error(422, str(e)) from e
+        except ServerBusy as e:
+            self.retry_after = e.retry_after
+            raise api_error(503, str(e)) from e
+        except Exception as e:
+            print(
+                f"Error in API request: {traceback.format_exc()}"
+            )  # Log for debugging
+            raise api_error(500, PROCESSING_ERROR) from e
+
+        output_format = self.options["output_format"]
+        output_filename = f"{os.path.splitext(filename)[0]}_rmbg.{get_format_extension(output_format)}"
+        self.set_header("Content-Type", get_format_mime(output_format))
+        self.set_header("Content-Disposition", f'inline; filename="{output_filename}"')
+        self.finish(result)
+
+    def process(self, image_bytes, background_bytes, key):
+        """Run the pipeline (on a worker thread)."""
+        bg_custom_image = None
+        if background_bytes is not None:
+            try:
+                bg_custom_image = open_image(background_bytes)
+            except ImageRejected as e:
+                raise ImageRejected(f"Background image: {e}") from e
+        try:
+            return remove_background(
+                image_bytes, bg_custom_image=bg_custom_image, **self.options
+            )
+        except ImageRejected as e:
+            # Re-submissions of this upload are refused without decoding it
+            self.rejected.add(key, str(e))
+            raise
+
+
+def make_app(executor=None, rate_limiter=None, rejected=None, warmup=None):
+    """The tornado Application serving the API.
+
+    Args:
+        executor: Pool running the pipeline (default: API_WORKERS threads)
+        rate_limiter: Per-client TokenBuckets; defaults to the process-wide ones
+        rejected: RejectedUploads remembering uploads that failed to decode
+        warmup: Warmup reported by GET /ready (None: always ready)
+    """
+    executor = executor or ThreadPoolExecutor(
+        max_workers=API_WORKERS, thread_name_prefix="bg_remove_api"
+    )
+    handler_args = dict(
+        executor=executor,
+        rate_limiter=token_buckets() if rate_limiter is None else rate_limiter,
+        rejected=rejected or RejectedUploads(REJECTED_UPLOADS_MAX),
+    )
+    return Application(
+        [
+            (r"/remove", RemoveHandler, handler_args),
+            (r"/health", HealthHandler),
+            (r"/ready", ReadyHandler, dict(warmup=warmup)),
+        ]
+    )
+
+
+async def serve(port, address, xheaders=False, warmup=True, metrics_port=METRICS_PORT):
+    steps = warmup_steps() if warmup else []
+    state = Warmup(steps)
+    app = make_app(warmup=state)
+    app.listen(port, address, xheaders=xheaders)
+    serve_metrics(metrics_port, METRICS_HOST)
+    print(f"Background removal API listening on http://{address}:{port}")
+    print(f"Metrics on http://{METRICS_HOST}:{metrics_port}/metrics")
+    state.start()
+    await asyncio.Event().wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--address", default="0.0.0.0")
+    parser.add_argument(
+        "--xheaders",
+        action="store_true",
+        help="Trust X-Real-Ip/X-Forwarded-For for client addresses (behind a proxy)",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=METRICS_PORT,
+        help="Port of GET /metrics, served on BG_REMOVE_METRICS_HOST (default loopback)",
+    )
+    args = parser.parse_args(argv)
+    warmup = os.environ.get("BG_REMOVE_WARMUP", "1") != "0"
+    try:
+        asyncio.run(
+            serve(args.port, args.address, args.xheaders, warmup, args.metrics_port)
+        )
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
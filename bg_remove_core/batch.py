@@ -0,0 +1,437 @@
+"""Command-line batch processor for whole directories of images.
+
+Usage:
+    python -m bg_remove_core.batch INPUT_DIR OUTPUT_DIR [--format PNG]
+        [--background transparent] [--color #FFFFFF] [--blur-radius 15]
+        [--background-image FILE] [--model u2net] [--full-resolution]
+        [--preset balanced] [--workers N]
+
+Every PNG/JPEG under INPUT_DIR goes through the app's pipeline
+(processing.remove_background) with the app's limits, and the result is
+written to the same relative path under OUTPUT_DIR as
+``<name>_rmbg.<ext>``. The files are spread over a pool of worker processes
+(BG_REMOVE_PROCESS_WORKERS by default), each with its share of the cores
+for onnxruntime.
+
+Each finished file is appended to ``OUTPUT_DIR/manifest.jsonl``. A new run
+into the same OUTPUT_DIR skips files the manifest records as done with the
+same options, or as rejected (invalid images fail the same way again),
+unless the source file changed. An interrupted run therefore picks up where
+it stopped. Throughput and the time spent in each stage are printed at the
+end.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import replace
+from multiprocessing import get_context
+
+from bg_remove_core import settings
+from bg_remove_core.encoding import ENCODER_PRESETS
+from bg_remove_core.processing import (
+    BG_MODES,
+    OUTPUT_FORMATS,
+    ImageRejected,
+    check_upload,
+    get_format_extension,
+    open_image,
+    remove_background,
+    timed,
+)
+from bg_remove_core.session_options import create_session
+
+MANIFEST_NAME = "manifest.jsonl"
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+# --color values, as accepted by the HTTP API
+HEX_COLOR = re.compile(r"#?[0-9a-fA-F]{6}")
+
+# Report stages, in pipeline order; read and write are the file I/O around remove_background
+STAGES = ("read", "decode", "resize", "segment", "composite", "encode", "write")
+
+# Session and custom background loaded once per worker process by _init_worker
+_session = None
+_background = None
+
+
+def find_images(input_dir):
+    """Paths of the images under `input_dir`, relative to it, in a stable order."""
+    found = []
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                found.append(os.path.relpath(os.path.join(root, name), input_dir))
+    return found
+
+
+def output_path(relpath, output_format):
+    """Output path, relative to the output directory, of the input at `relpath`."""
+    base = os.path.splitext(relpath)[0]
+    return f"{base}_rmbg.{get_format_extension(output_format)}"
+
+
+def options_key(options, background_path=None):
+    """Stable text form of the options, recorded with every manifest entry."""
+    return json.dumps(dict(options, background_image=background_path), sort_keys=True)
+
+
+def read_manifest(path):
+    """Latest manifest entry per source path; a line cut short by a crash is ignored."""
+    entries = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                entries[entry["source"]] = entry
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def is_finished(entry, stat, key, output_dir):
+    """Whether a manifest entry covers the current source file.
+
+    Args:
+        entry: The file's latest manifest entry, or None
+        stat: os.stat() of the source file
+        key: options_key() of this run
+        output_dir: Root of the output tree
+
+    Returns:
+        bool: True if the file was rejected as it is now, or its output
+        for these options exists
+    """
+    if entry is None:
+        return False
+    if (entry.get("size"), entry.get("mtime_ns")) != (stat.st_size, stat.st_mtime_ns):
+        return False
+    if entry["status"] == "rejected":
+        return True
+    return (
+        entry["status"] == "done"
+        and entry.get("options") == key
+        and os.path.exists(os.path.join(output_dir, entry["output"]))
+    )
+
+
+def _init_worker(model_name, ort_threads, background_path):
+    """Pool initializer: load the model to run in this process with its share of the cores.
+
+    The session is handed to remove_background explicitly: the batch pool is
+    the process pool, so workers must not start pools of their own, and the
+    configured backend and sessions are left alone (InlineExecutor runs this
+    in the calling process).
+    """
+    global _session, _background
+    config = settings.ORT_SESSION_CONFIG
+    if ort_threads:
+        config = replace(config, intra_op_threads=ort_threads)
+    _session = create_session(model_name, config)
+    if background_path is not None:
+        with open(background_path, "rb") as f:
+            _background = open_image(f.read())
+
+
+def process_file(source, target, options):
+    """Worker task: run the pipeline on one file and write the result.
+
+    The result is written to a temporary file and renamed, so an interrupted
+    run never leaves a truncated output behind.
+
+    Returns:
+        tuple: (status, error message or None, {stage: seconds}), status
+        being "done", "rejected" (invalid image) or "failed"
+    """
+    timings = {}
+    try:
+        with timed(timings, "read"):
+            with open(source, "rb") as f:
+                data = f.read()
+        error = check_upload(os.path.basename(source), len(data), data)
+        if error is not None:
+            return "rejected", error, timings
+        result = remove_background(
+            data,
+            bg_custom_image=_background,
+            session=_session,
+            timings=timings,
+            **options,
+        )
+        with timed(timings, "write"):
+            os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+            tmp_path = f"{target}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(result)
+            os.replace(tmp_path, target)
+    except ImageRejected as e:
+        return "rejected", str(e), timings
+    except Exception as e:  # noqa: BLE001 - one bad file must not stop the batch
+        return "failed", f"{type(e).__name__}: {e}", timings
+    return "done", None, timings
+
+
+class InlineExecutor:
+    """Executor running tasks in the calling process (single worker runs, tests)."""
+
+    def __init__(self, initializer=None, initargs=()):
+        if initializer is not None:
+            initializer(*initargs)
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:  # noqa: BLE001 - delivered through the future
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+class BatchReport:
+    """Counts and per-stage times of a batch run."""
+
+    def __init__(self):
+        self.counts = {"done": 0, "rejected": 0, "failed": 0, "skipped": 0}
+        self.stage_seconds = dict.fromkeys(STAGES, 0.0)
+        self.elapsed = 0.0
+
+    def add(self, status, timings):
+        self.counts[status] += 1
+        for stage, seconds in timings.items():
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    @property
+    def throughput(self):
+        """Images processed per second of wall time (skipped files excluded)."""
+        processed = (
+            self.counts["done"] + self.counts["rejected"] + self.counts["failed"]
+        )
+        return processed / self.elapsed if self.elapsed > 0 else 0.0
+
+    def format(self):
+        counts = ", ".join(f"{count} {status}" for status, count in self.counts.items())
+        lines = [
+            f"{counts} in {self.elapsed:.1f}s ({self.throughput:.2f} images/s)",
+        ]
+        done = self.counts["done"]
+        total = sum(self.stage_seconds.values())
+        if done and total > 0:
+            lines.append("Stage       total s  ms/image  share")
+            for stage, seconds in self.stage_seconds.items():
+                lines.append(
+                    f"{stage:<10} {seconds:>8.2f} {1000 * seconds / done:>9.1f}"
+                    f" {100 * seconds / total:>5.1f}%"
+                )
+            lines.append("(stage times are summed over all workers)")
+        return "\n".join(lines)
+
+
+def run_batch(
+    input_dir,
+    output_dir,
+    options,
+    workers=1,
+    background_path=None,
+    ort_threads=None,
+    progress=None,
+):
+    """Process every image under `input_dir` not already finished in the manifest.
+
+    Args:
+        input_dir: Directory searched recursively for PNG/JPEG files
+        output_dir: Root of the output tree, holding the manifest
+        options: Keyword arguments for remove_background (output_format,
+            bg_mode, bg_color, bg_blur_radius, full_resolution, model_name,
+            encoder_preset)
+        workers: Worker processes; 1 processes the files in this process
+        background_path: Background image for bg_mode "custom_image"
+        ort_threads: onnxruntime intra-op threads per worker (None keeps
+            the configured ones)
+        progress: Optional callable(relpath, status, error) called as files finish
+
+    Returns:
+        BatchReport
+    """
+    report = BatchReport()
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    finished = read_manifest(manifest_path)
+    key = options_key(options, background_path)
+
+    pending = []
+    for relpath in find_images(input_dir):
+        stat = os.stat(os.path.join(input_dir, relpath))
+        if is_finished(finished.get(relpath), stat, key, output_dir):
+            report.counts["skipped"] += 1
+        else:
+            pending.append((relpath, stat))
+
+    initargs = (options["model_name"], ort_threads, background_path)
+    if workers > 1 and len(pending) > 1:
+        # spawn: onnxruntime's threads make forking unsafe
+        executor = ProcessPoolExecutor(
+            max_workers=min(workers, len(pending)),
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=initargs,
+        )
+    else:
+        executor = InlineExecutor(_init_worker, initargs)
+
+    # Keep a couple of files queued per worker rather than submitting the whole
+    # tree, so an interrupt does not leave thousands of cancelled tasks behind
+    max_in_flight = 2 * workers
+    queue = iter(pending)
+    in_flight = {}
+    try:
+        with open(manifest_path, "a", encoding="utf-8") as manifest:
+            while True:
+                for relpath, stat in queue:
+                    target = os.path.join(
+                        output_dir, output_path(relpath, options["output_format"])
+                    )
+                    future = executor.submit(
+                        process_file,
+                        os.path.join(input_dir, relpath),
+                        target,
+                        options,
+                    )
+                    in_flight[future] = (relpath, stat)
+                    if len(in_flight) >= max_in_flight:
+                        break
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                # Record finished files in submission order, not set order
+                for future in [future for future in in_flight if future in done]:
+                    relpath, stat = in_flight.pop(future)
+                    status, error, timings = future.result()
+                    report.add(status, timings)
+                    entry = {
+                        "source": relpath,
+                        "status": status,
+                        "size": stat.st_size,
+                        "mtime_ns": stat.st_mtime_ns,
+                        "options": key,
+                    }
+                    if status == "done":
+                        entry["output"] = output_path(relpath, options["output_format"])
+                    else:
+                        entry["error"] = error
+                    manifest.write(json.dumps(entry) + "\n")
+                    manifest.flush()
+                    if progress is not None:
+                        progress(relpath, status, error)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        report.elapsed = time.perf_counter() - start
+    return report
+
+
+def hex_color(value):
+    """argparse type: a '#RRGGBB' colour (the '#' is optional), normalized to
+    '#RRGGBB' in upper case so equal colours give equal manifest options."""
+    if not HEX_COLOR.fullmatch(value):
+        raise argparse.ArgumentTypeError(f"invalid hex colour: {value!r}")
+    return "#" + value.lstrip("#").upper()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument(
+        "--format",
+        default="PNG",
+        type=lambda value: {"JPG": "JPEG"}.get(value.upper(), value.upper()),
+        choices=OUTPUT_FORMATS,
+    )
+    parser.add_argument("--background", default="transparent", choices=BG_MODES)
+    parser.add_argument(
+        "--color", default="#FFFFFF", type=hex_color, help="Color for solid_color"
+    )
+    parser.add_argument(
+        "--blur-radius", type=int, default=15, help="Blur radius for blur (5-50)"
+    )
+    parser.add_argument("--background-image", help="Background for custom_image")
+    parser.add_argument(
+        "--model", default=settings.MODEL_NAME, choices=settings.SELECTABLE_MODELS
+    )
+    parser.add_argument(
+        "--full-resolution",
+        action="store_true",
+        help="Cut out the original instead of the 2000px working size",
+    )
+    parser.add_argument(
+        "--preset",
+        default=settings.ENCODER_PRESET,
+        choices=ENCODER_PRESETS,
+        help="Encoder preset: encode time against file size (default: BG_REMOVE_ENCODER_PRESET)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.PROCESS_WORKERS,
+        help="Worker processes (default: BG_REMOVE_PROCESS_WORKERS)",
+    )
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.input_dir):
+        parser.error(f"{args.input_dir} is not a directory")
+    if not 5 <= args.blur_radius <= 50:
+        parser.error("--blur-radius must be between 5 and 50")
+    if (args.background == "custom_image") != (args.background_image is not None):
+        parser.error("--background-image goes with --background custom_image")
+
+    workers = max(1, args.workers)
+    options = {
+        "output_format": args.format,
+        "bg_mode": args.background,
+        "bg_color": args.color,
+        "bg_blur_radius": args.blur_radius,
+        "full_resolution": args.full_resolution,
+        "model_name": args.model,
+        "encoder_preset": args.preset,
+    }
+
+    def progress(relpath, status, error):
+        if status != "done":
+            print(f"{relpath}: {status}: {error}", file=sys.stderr)
+
+    print(f"Processing {args.input_dir} -> {args.output_dir} with {workers} worker(s)")
+    try:
+        report = run_batch(
+            args.input_dir,
+            args.output_dir,
+            options,
+            workers=workers,
+            background_path=args.background_image,
+            # A single worker keeps the configured onnxruntime threads
+            ort_threads=None
+            if workers == 1
+            else max(1, (os.cpu_count() or 1) // workers),
+            progress=progress,
+        )
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to resume.", file=sys.stderr)
+        return 130
+    print(report.format())
+    return 1 if report.counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
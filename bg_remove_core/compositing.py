@@ -0,0 +1,120 @@
+"""Vectorized alpha compositing of cutouts over opaque backgrounds.
+
+Pixels are handled as 32-bit RGBA/RGBX words. The output buffer is allocated
+once, filled from the background, then overwritten with the foreground where
+it is fully opaque. Only the soft edge of the mask (0 < alpha < 255), usually
+a small fraction of the image, goes through the blend arithmetic, which uses
+Pillow's rounding so the colour channels match ``paste`` exactly. The result
+is opaque: RGBA with alpha 255, or RGB built straight from the word buffer for
+formats without an alpha channel (JPEG).
+
+A background image with transparency (a PNG or WebP custom background) keeps
+it: the cutout goes over it with Pillow's ``alpha_composite`` instead.
+"""
+
+import numpy as np
+from PIL import Image
+
+WHITE = (255, 255, 255)
+
+# Word with only the alpha byte set, independent of the platform byte order
+OPAQUE = np.frombuffer(bytes((0, 0, 0, 255)), dtype=np.uint32)[0]
+
+
+def parse_hex_color(value):
+    """'#RRGGBB' -> (r, g, b)."""
+    hex_color = value.lstrip("#")
+    return int(hex_color[0:2], 16), int(hex_color[2:4], 16), int(hex_color[4:6], 16)
+
+
+def has_alpha(image):
+    """Whether a PIL image can hold transparent pixels."""
+    return image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+
+
+def _pixels(image, rawmode):
+    """(H, W, 4) uint8 view of an image packed as RGBA or RGBX."""
+    width, height = image.size
+    data = image.tobytes("raw", rawmode)
+    return np.frombuffer(data, dtype=np.uint8).reshape(height, width, 4)
+
+
+def blend_into(out, foreground, background):
+    """Blend an RGBA foreground over an opaque background into a preallocated buffer.
+
+    Args:
+        out: (H, W) uint32 array receiving RGBA words
+        foreground: (H, W, 4) uint8 RGBA array
+        background: (H, W, 4) uint8 RGBX array, or a (4,) uint8 colour
+    """
+    fg_words = foreground.view(np.uint32).reshape(out.shape)
+    alpha = fg_words & OPAQUE
+    opaque = alpha == OPAQUE
+
+    if background.ndim == 1:
+        np.copyto(out, background.view(np.uint32)[0])
+    else:
+        np.copyto(out, background.view(np.uint32).reshape(out.shape))
+    np.copyto(out, fg_words, where=opaque)
+
+    # Only the soft edge needs arithmetic: out = (fg * a + bg * (255 - a)) / 255
+    opaque |= alpha == 0
+    edge = np.flatnonzero(~opaque)
+    out_flat = out.reshape(-1)
+    fg = fg_words.reshape(-1)[edge].view(np.uint8).reshape(-1, 4)
+    if background.ndim == 1:
+        bg = background[:3]
+    else:
+        bg = (
+            background.view(np.uint32)
+            .reshape(-1)[edge]
+            .view(np.uint8)
+            .reshape(-1, 4)[:, :3]
+        )
+    a = fg[:, 3:4].astype(np.uint16)
+    blended = fg[:, :3] * a + bg * (255 - a) + 128
+    # Divide by 255 with Pillow's rounding
+    blended += blended >> 8
+    blended >>= 8
+    edge_pixels = np.empty((edge.size, 4), dtype=np.uint8)
+    edge_pixels[:, :3] = blended
+    out_flat[edge] = edge_pixels.view(np.uint32).reshape(-1)
+
+    # Edge pixels and RGBX padding get alpha 255
+    np.bitwise_or(out, OPAQUE, out=out)
+
+
+def composite(foreground, background=None, color=WHITE, rgb=False):
+    """Alpha-blend an RGBA cutout over a background image or a solid colour.
+
+    Args:
+        foreground: PIL image with the cutout (converted to RGBA if needed)
+        background: PIL image of the same size, or None to use `color`
+        color: (r, g, b) background colour used when `background` is None
+        rgb: Return an RGB image instead of an opaque RGBA one
+
+    Returns:
+        PIL Image in RGB or RGBA mode; RGBA keeps the transparency of a
+        background that has some
+    """
+    if foreground.mode != "RGBA":
+        foreground = foreground.convert("RGBA")
+    if background is not None and has_alpha(background):
+        over = Image.alpha_composite(background.convert("RGBA"), foreground)
+        # JPEG: flatten onto white, like any transparent result
+        return composite(over, rgb=True) if rgb else over
+    fg = _pixels(foreground, "RGBA")
+
+    if background is None:
+        bg = np.frombuffer(bytes((*color, 255)), dtype=np.uint8)
+    else:
+        if background.mode != "RGB":
+            background = background.convert("RGB")
+        bg = _pixels(background, "RGBX")
+
+    width, height = foreground.size
+    out = np.empty((height, width), dtype=np.uint32)
+    blend_into(out, fg, bg)
+    if rgb:
+        return Image.frombytes("RGB", (width, height), out, "raw", "RGBX")
+    return Image.fromarray(out.view(np.uint8).reshape(height, width, 4))
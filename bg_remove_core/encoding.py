@@ -0,0 +1,69 @@
+"""Encoder presets for the output formats.
+
+Encoding is a large share of a request: zlib at its default level takes
+about as long on a 2000px PNG cutout as the rest of the rendering. A preset
+picks Pillow save options for every output format, trading encode time
+against file size without changing the image itself:
+
+- ``fast``: PNG compress_level 1, WEBP method 0
+- ``balanced``: the previous fixed settings (PNG level 6, WEBP method 4)
+- ``smallest``: PNG level 9 with optimize, WEBP method 6, optimized
+  progressive JPEG
+
+JPEG and WEBP quality (95 and 90) are the same in every preset. JPEG
+chroma subsampling stays 4:2:0: it is already the fastest and smallest.
+``benchmarks/bench_encoding.py`` measures encode time and output size per
+preset.
+"""
+
+# Preset name -> output format -> Pillow save options
+ENCODER_PRESETS = {
+    "fast": {
+        "PNG": {"compress_level": 1},
+        "WEBP": {"quality": 90, "lossless": False, "method": 0},
+        "JPEG": {"quality": 95, "subsampling": "4:2:0"},
+    },
+    "balanced": {
+        "PNG": {"compress_level": 6},
+        "WEBP": {"quality": 90, "lossless": False, "method": 4},
+        "JPEG": {"quality": 95, "subsampling": "4:2:0"},
+    },
+    "smallest": {
+        "PNG": {"compress_level": 9, "optimize": True},
+        "WEBP": {"quality": 90, "lossless": False, "method": 6},
+        "JPEG": {
+            "quality": 95,
+            "subsampling": "4:2:0",
+            "optimize": True,
+            "progressive": True,
+        },
+    },
+}
+
+# Preset name -> label shown to users
+ENCODER_PRESET_LABELS = {
+    "fast": "Fast (larger files)",
+    "balanced": "Balanced",
+    "smallest": "Smallest (slower)",
+}
+
+DEFAULT_ENCODER_PRESET = "balanced"
+
+
+def encoder_preset(name):
+    """Validate a preset name (e.g. from configuration).
+
+    Raises:
+        ValueError: If `name` is not in ENCODER_PRESETS
+    """
+    if name not in ENCODER_PRESETS:
+        raise ValueError(
+            f"Unknown encoder preset: {name}. "
+            f"Known presets: {', '.join(ENCODER_PRESETS)}"
+        )
+    return name
+
+
+def save_options(output_format, preset=DEFAULT_ENCODER_PRESET):
+    """Pillow save options for `output_format` under `preset` (a new dict)."""
+    return dict(ENCODER_PRESETS[encoder_preset(preset)].get(output_format, {}))
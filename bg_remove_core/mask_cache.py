@@ -0,0 +1,184 @@
+"""Persistent, content-addressed cache of segmentation masks.
+
+Masks are stored as PNG files named after a SHA-256 key derived from the
+upload bytes and every parameter that affects the mask (model name, model
+version, working resolution). Writes go to a temporary file that is renamed
+into place, so readers in other threads or processes never see a partial
+file. The directory is kept under a byte budget by evicting the least
+recently used files; a cache hit refreshes the file's modification time.
+
+``CompactMask`` is the in-memory form of a mask: the single-channel bytes
+(PNG-compressed by default) plus the key of the upload they were computed
+from, which is all the app keeps in its Streamlit cache.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+from io import BytesIO
+
+from PIL import Image
+
+
+def make_key(image_bytes, *params):
+    """Content-addressed cache key for an image and the parameters that shape its mask."""
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    material = "|".join([digest, *(str(p) for p in params)])
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+@dataclass(frozen=True)
+class CompactMask:
+    """A segmentation mask stored as compact bytes instead of a PIL image.
+
+    Attributes:
+        key: Cache key of the upload (and settings) the mask was computed from
+        size: (width, height) of the mask
+        data: PNG bytes when ``compressed``, otherwise raw L-mode pixels
+        compressed: Whether ``data`` is PNG-compressed
+    """
+
+    key: str
+    size: tuple
+    data: bytes
+    compressed: bool = True
+
+    @classmethod
+    def from_image(cls, mask, key, compress=True):
+        """Pack an L-mode mask; compression trades a few ms for a much smaller entry."""
+        if compress:
+            buf = BytesIO()
+            mask.save(buf, format="PNG", compress_level=1)
+            data = buf.getvalue()
+        else:
+            data = mask.tobytes()
+        return cls(key=key, size=mask.size, data=data, compressed=compress)
+
+    def to_image(self):
+        """Unpack the mask into an L-mode PIL image."""
+        if not self.compressed:
+            return Image.frombytes("L", self.size, self.data)
+        mask = Image.open(BytesIO(self.data))
+        mask.load()
+        return mask
+
+    @property
+    def nbytes(self):
+        return len(self.data)
+
+
+class DiskMaskCache:
+    """Size-bounded LRU cache of L-mode masks on disk.
+
+    Args:
+        directory: Cache directory (created on first write)
+        max_bytes: Total size budget for cached files
+    """
+
+    # After an eviction pass the cache is trimmed to this share of max_bytes,
+    # so a full cache is not rescanned on every write
+    EVICT_TO = 0.9
+
+    def __init__(self, directory, max_bytes):
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.max_bytes = max_bytes
+        self._total_bytes = None
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.png")
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key):
+        """Return the cached mask for `key`, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            mask = Image.open(BytesIO(data))
+            mask.load()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # Corrupted on disk or written by an incompatible Pillow version
+            print(f"Discarding unreadable mask cache entry {path}: {e}")
+            self._discard(path)
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # Evicted concurrently; the mask we read is still valid
+        return mask
+
+    def put(self, key, mask):
+        """Store a mask atomically and evict old entries if over budget."""
+        buf = BytesIO()
+        # Masks compress well even at the fastest level
+        mask.save(buf, format="PNG", compress_level=1)
+        data = buf.getvalue()
+
+        path = self._path(key)
+        try:
+            # Overwriting an entry only adds the difference to the total
+            replaced = os.stat(path).st_size
+        except FileNotFoundError:
+            replaced = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            self._discard(tmp_path)
+            raise
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_total()
+            else:
+                self._total_bytes += len(data) - replaced
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        """List (mtime, size, path) for every cached file."""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".png"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _scan_total(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        # Rescan: other processes may share the directory
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * self.EVICT_TO
+        for _, size, path in entries:
+            if total <= target:
+                break
+            self._discard(path)
+            total -= size
+        self._total_bytes = total
+
+    @staticmethod
+    def _discard(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
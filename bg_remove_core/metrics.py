@@ -0,0 +1,274 @@
+"""Process-wide latency and throughput metrics in the Prometheus text format.
+
+The pipeline records into the metrics defined at the bottom of this module:
+the time spent in each stage, the images and bytes received, the bytes
+produced, rejections and errors. Values that already live elsewhere (the
+inference gate's queue, the render cache's hit and miss counters) are read
+when the metrics are scraped, by collectors registered with
+``REGISTRY.register_collector`` when those objects are created.
+
+``REGISTRY.exposition()`` renders everything in the text exposition format
+(version 0.0.4); serve.py and the HTTP API serve it as ``GET /metrics`` on a
+local-only listener (bg_remove_core.warmup.serve_metrics). The format is simple enough
+that the prometheus_client package is not needed.
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds (seconds) of the latency histogram buckets: from a cached
+# lookup to a full-resolution model run on a slow CPU
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\""),
+        )
+        for name, value in labels.items()
+    )
+    return "{" + pairs + "}"
+
+
+class Metric:
+    """Base of the recorded metrics: a name, a help text and label names.
+
+    Args:
+        name: Metric name (counters end in _total)
+        documentation: HELP text
+        labelnames: Names of the labels every sample is recorded with
+    """
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # label values -> value
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} takes the labels {', '.join(self.labelnames) or 'none'}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key, **extra):
+        return {**dict(zip(self.labelnames, key)), **extra}
+
+    def samples(self):
+        """[(sample name, labels, value)] for the exposition."""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """A value that only goes up, per label set."""
+
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only go up")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [
+                (self.name, self._labels(key), value)
+                for key, value in sorted(self._values.items())
+            ]
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, per label set.
+
+    Args:
+        buckets: Increasing upper bounds; +Inf is added
+    """
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[idx] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the seconds spent in the block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        with self._lock:
+            counts, _ = self._values.get(self._key(labels), ([0], 0.0))
+            return sum(counts)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    samples.append(
+                        (
+                            f"{self.name}_bucket",
+                            self._labels(key, le=_format_value(bound)),
+                            cumulative,
+                        )
+                    )
+                samples.append((f"{self.name}_sum", self._labels(key), total))
+                samples.append((f"{self.name}_count", self._labels(key), cumulative))
+        return samples
+
+
+class Registry:
+    """The metrics of a process, plus collectors for values read at scrape time."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, name, collect):
+        """Add (or replace) the collector `name`.
+
+        Args:
+            collect: Callable returning [(metric name, type, help, [(labels, value)])]
+        """
+        with self._lock:
+            self._collectors[name] = collect
+
+    def exposition(self):
+        """All metrics in the Prometheus text format."""
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors.values())
+
+        lines = []
+
+        def family(name, metric_type, documentation, samples):
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for sample_name, labels, value in samples:
+                lines.append(
+                    f"{sample_name}{_format_labels(labels)} {_format_value(value)}"
+                )
+
+        for metric in metrics:
+            family(metric.name, metric.type, metric.documentation, metric.samples())
+        for collect in collectors:
+            for name, metric_type, documentation, samples in collect():
+                family(
+                    name,
+                    metric_type,
+                    documentation,
+                    [(name, labels, value) for labels, value in samples],
+                )
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Seconds spent computing each pipeline stage: decode, resize, segment (mask
+# cache lookups plus inference), inference (model calls only), background,
+# composite, encode, display (screen renditions) and zip. Memoized stages are
+# only timed when they are computed.
+STAGE_SECONDS = REGISTRY.register(
+    Histogram(
+        "bg_remove_stage_seconds",
+        "Time spent computing a pipeline stage.",
+        ["stage"],
+    )
+)
+IMAGES_RECEIVED = REGISTRY.register(
+    Counter(
+        "bg_remove_images_received_total",
+        "Images uploaded for processing.",
+        ["frontend"],
+    )
+)
+BYTES_RECEIVED = REGISTRY.register(
+    Counter(
+        "bg_remove_received_bytes_total",
+        "Bytes of uploaded images.",
+        ["frontend"],
+    )
+)
+BYTES_ENCODED = REGISTRY.register(
+    Counter(
+        "bg_remove_encoded_bytes_total",
+        "Bytes of encoded results and ZIP archives produced.",
+        ["format"],
+    )
+)
+INFERENCE_IMAGES = REGISTRY.register(
+    Counter(
+        "bg_remove_inference_images_total",
+        "Images segmented by a model.",
+        ["model"],
+    )
+)
+MASK_CACHE_LOOKUPS = REGISTRY.register(
+    Counter(
+        "bg_remove_mask_cache_lookups_total",
+        "Persistent mask cache lookups.",
+        ["result"],
+    )
+)
+REJECTIONS = REGISTRY.register(
+    Counter(
+        "bg_remove_rejections_total",
+        "Requests turned away before processing.",
+        ["frontend", "reason"],
+    )
+)
+ERRORS = REGISTRY.register(
+    Counter(
+        "bg_remove_errors_total",
+        "Unexpected processing errors.",
+        ["frontend"],
+    )
+)
@@ -0,0 +1,133 @@
+"""Registry of the segmentation models a deployment can serve.
+
+``MODELS`` lists the rembg models suited to background removal, from the
+lightweight ``u2netp`` to the 1024px IS-Net models. Sessions are loaded
+lazily on first use and kept in a ``SessionRegistry``, an LRU of at most
+``max_sessions`` sessions: each one holds its weights and onnxruntime
+buffers (hundreds of MB for the larger models), so a server offering
+several models only pays for the ones that are actually requested.
+
+rembg downloads the regular models on first use; quantized models such as
+``u2net-int8`` have to be built offline (see bg_remove_core.quantize) and are
+only offered once their file exists.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from bg_remove_core.quantize import base_model, quantized_model_path
+
+# Model name -> label shown to users
+MODELS = {
+    "u2net": "U2-Net (general purpose)",
+    "u2netp": "U2-Net-P (lightweight, fastest)",
+    "silueta": "Silueta (compact U2-Net)",
+    "isnet-general-use": "IS-Net (most detailed, slowest)",
+    "isnet-anime": "IS-Net anime (illustrations)",
+    "u2net_human_seg": "U2-Net human (people)",
+    "u2net-int8": "U2-Net INT8 (quantized for CPU)",
+}
+
+# Model name -> rate limit cost of one run, relative to u2net (see processing.image_cost).
+# Rough estimates from the input size (320px, 1024px for IS-Net) and network
+# width; measure the deployment's models with benchmarks/bench_models.py
+MODEL_COSTS = {
+    "u2net": 1.0,
+    "u2netp": 0.3,
+    "silueta": 1.0,
+    "isnet-general-use": 3.0,
+    "isnet-anime": 3.0,
+    "u2net_human_seg": 1.0,
+    "u2net-int8": 0.5,
+}
+
+
+def model_available(model_name):
+    """Whether a model can be loaded: quantized models need their locally built file."""
+    return base_model(model_name) is None or os.path.exists(
+        quantized_model_path(model_name)
+    )
+
+
+def selectable_models(default, names=""):
+    """Models offered to users: `default` first, then the comma-separated `names`.
+
+    An empty `names` offers every available model in MODELS.
+
+    Raises:
+        ValueError: If a name is not in MODELS, or names a quantized model
+            that has not been built
+    """
+    requested = [name.strip() for name in names.split(",") if name.strip()]
+    configured = [default, *requested]
+    requested = requested or [name for name in MODELS if model_available(name)]
+    unknown = [name for name in configured if name not in MODELS]
+    if unknown:
+        raise ValueError(
+            f"Unknown segmentation model(s): {', '.join(unknown)}. "
+            f"Known models: {', '.join(MODELS)}"
+        )
+    missing = [name for name in configured if not model_available(name)]
+    if missing:
+        raise ValueError(
+            f"Quantized model(s) not built: {', '.join(missing)}. "
+            "Build them with: python -m bg_remove_core.quantize"
+        )
+    return [default] + [name for name in dict.fromkeys(requested) if name != default]
+
+
+class SessionRegistry:
+    """Thread-safe LRU of lazily loaded model sessions.
+
+    Args:
+        max_sessions: Sessions kept loaded; the least recently used is
+            dropped when another model is loaded
+        factory: Callable(model_name) -> session, e.g. rembg.new_session
+    """
+
+    def __init__(self, max_sessions=2, factory=None):
+        if factory is None:
+            from rembg import new_session as factory
+        self.max_sessions = max(1, max_sessions)
+        self._factory = factory
+        self._sessions = OrderedDict()
+        self._loading = {}  # model name -> lock held while it loads
+        self._lock = threading.Lock()
+
+    def get(self, model_name):
+        """Session for `model_name`, loading it (once, even under concurrency) if needed.
+
+        Raises:
+            ValueError: If the model is not in MODELS
+        """
+        if model_name not in MODELS:
+            raise ValueError(f"Unknown segmentation model: {model_name}")
+        with self._lock:
+            session = self._sessions.get(model_name)
+            if session is not None:
+                self._sessions.move_to_end(model_name)
+                return session
+            loading = self._loading.setdefault(model_name, threading.Lock())
+
+        # Other models stay usable while this one loads
+        with loading:
+            with self._lock:
+                session = self._sessions.get(model_name)
+            if session is None:
+                session = self._factory(model_name)
+                with self._lock:
+                    self._sessions[model_name] = session
+                    # Evicted sessions stay alive until in-flight calls release them
+                    while len(self._sessions) > self.max_sessions:
+                        self._sessions.popitem(last=False)
+                    self._loading.pop(model_name, None)
+            return session
+
+    def loaded(self):
+        """Names of the loaded models, least recently used first."""
+        with self._lock:
+            return list(self._sessions)
+
+    def __len__(self):
+        return len(self._sessions)
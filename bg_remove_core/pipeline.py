@@ -0,0 +1,206 @@
+"""Memoized stages of the render pipeline.
+
+An upload is rendered in stages: decode -> resize -> segment ->
+(background) -> composite -> encode; the background stage only runs for
+blurred backgrounds. The output of each stage after decode is memoized under
+a key built from exactly the inputs it depends on: the key of the stage it
+consumes plus its own settings. A Streamlit rerun caused by a sidebar change
+therefore only recomputes the stages downstream of that setting: a new
+output format re-encodes, a new background colour re-composites and
+re-encodes. The display stage holds the screen-sized renditions the app
+shows. The decoded source itself is not memoized: full-size originals would
+crowd the smaller derived outputs out of the budget. It is wrapped in a
+LazyOriginal instead and only decoded when a stage that needs its pixels
+misses, so a rerun served from memoized stages never decodes the upload.
+
+All stages share one LRU byte budget. A value stored under several keys
+(a transparent composite is the cutout itself) is counted once. Hit and miss
+counters are kept per stage, and the time spent computing each stage on a
+miss is recorded in the stage latency metric (see bg_remove_core.metrics).
+"""
+
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+from bg_remove_core.metrics import STAGE_SECONDS
+
+STAGES = ("resize", "segment", "background", "composite", "encode", "display")
+
+
+def source_key(image_bytes):
+    """Content key of an upload; the root of every stage key derived from it."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def value_nbytes(value):
+    """Approximate memory held by a stage output (PIL images, bytes, or tuples of them)."""
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(value_nbytes(item) for item in value)
+    size = getattr(value, "size", None)
+    if isinstance(size, tuple) and len(size) == 2 and hasattr(value, "getbands"):
+        return size[0] * size[1] * len(value.getbands())
+    return sys.getsizeof(value)
+
+
+class LazyOriginal:
+    """The decoded original of an upload, decoded on first use.
+
+    Args:
+        decode: Callable returning the decoded PIL image, or None if the
+            upload was rejected; called at most once
+        source: source_key of the upload
+        full_resolution: Whether the original is decoded at full size (a
+            reduced-scale JPEG decode is a different image)
+    """
+
+    def __init__(self, decode, source=None, full_resolution=False):
+        self.source = source
+        self.full_resolution = full_resolution
+        self._decode = decode
+        self._image = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """The decoded image, or None if it was rejected."""
+        with self._lock:
+            if self._decode is not None:
+                self._image = self._decode()
+                self._decode = None
+            return self._image
+
+
+def decoded(image):
+    """The pixels of `image`: decodes a LazyOriginal, returns anything else as is."""
+    return image.get() if isinstance(image, LazyOriginal) else image
+
+
+class StageCache:
+    """Thread-safe LRU memo of stage outputs with per-stage hit/miss counters.
+
+    Args:
+        max_bytes: Memory budget shared by all stages; 0 disables memoization
+            while still counting misses
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (stage, key) -> (value, nbytes)
+        self._refs = {}  # id(value) -> entries holding it
+        self._total_bytes = 0
+        self._counts = {stage: [0, 0] for stage in STAGES}  # stage -> [hits, misses]
+        self._lock = threading.Lock()
+
+    def get(self, stage, key):
+        """Return the memoized output for `key`, or None on a miss (counted either way)."""
+        with self._lock:
+            counts = self._counts.setdefault(stage, [0, 0])
+            entry = self._entries.get((stage, key)) if key is not None else None
+            if entry is None:
+                counts[1] += 1
+                return None
+            self._entries.move_to_end((stage, key))
+            counts[0] += 1
+            return entry[0]
+
+    def __contains__(self, stage_key):
+        """`(stage, key) in cache` checks for an entry without counting a hit or miss."""
+        with self._lock:
+            return stage_key in self._entries
+
+    def put(self, stage, key, value):
+        """Memoize a stage output, evicting least recently used entries if over budget.
+
+        None keys and values are ignored, so outputs whose inputs cannot be
+        identified and rejected uploads (which must re-show their error) are
+        never stored.
+        """
+        if key is None or value is None:
+            return
+        nbytes = value_nbytes(value)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop((stage, key), None)
+            if old is not None:
+                self._release(old)
+            self._entries[(stage, key)] = (value, nbytes)
+            self._hold(value, nbytes)
+            while self._total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._release(evicted)
+
+    def _hold(self, value, nbytes):
+        """Count a stored value, unless another entry already holds the same object."""
+        held = self._refs.get(id(value), 0)
+        if not held:
+            self._total_bytes += nbytes
+        self._refs[id(value)] = held + 1
+
+    def _release(self, entry):
+        """Uncount a removed entry's value once no entry holds it any more."""
+        value, nbytes = entry
+        held = self._refs.pop(id(value)) - 1
+        if held:
+            self._refs[id(value)] = held
+        else:
+            self._total_bytes -= nbytes
+
+    def run(self, stage, key, compute):
+        """Return the output of `stage` for `key`, calling `compute()` on a miss."""
+        value = self.get(stage, key)
+        if value is None:
+            with STAGE_SECONDS.time(stage=stage):
+                value = compute()
+            self.put(stage, key, value)
+        return value
+
+    def stats(self):
+        """Per-stage counters: {stage: {"hits": int, "misses": int}}."""
+        with self._lock:
+            return {
+                stage: {"hits": hits, "misses": misses}
+                for stage, (hits, misses) in self._counts.items()
+            }
+
+    @property
+    def nbytes(self):
+        return self._total_bytes
+
+    def collect_metrics(self):
+        """The counters and memory use as metric families (see metrics.Registry.register_collector)."""
+        stats = self.stats()
+        return [
+            (
+                "bg_remove_render_cache_hits_total",
+                "counter",
+                "Stage outputs reused from the render cache.",
+                [({"stage": stage}, counts["hits"]) for stage, counts in stats.items()],
+            ),
+            (
+                "bg_remove_render_cache_misses_total",
+                "counter",
+                "Stage outputs missing from the render cache.",
+                [
+                    ({"stage": stage}, counts["misses"])
+                    for stage, counts in stats.items()
+                ],
+            ),
+            (
+                "bg_remove_render_cache_bytes",
+                "gauge",
+                "Memory held by the render cache.",
+                [({}, self.nbytes)],
+            ),
+        ]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._refs.clear()
+            self._total_bytes = 0
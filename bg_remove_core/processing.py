@@ -0,0 +1,469 @@
+"""The background removal pipeline, without any user interface.
+
+Shared by the Streamlit app (bg_remove.py) and the HTTP API
+(bg_remove_core.api): upload limits and validation, decoding, segmentation
+with the persistent mask cache, background replacement and encoding.
+Rejected images raise ImageRejected with a message meant for the user;
+each front end decides how to show it.
+"""
+
+import time
+from contextlib import contextmanager
+from io import BytesIO
+
+from PIL import Image, ImageOps
+from rembg import remove
+
+from bg_remove_core.blur import pyramid_blur
+from bg_remove_core.compositing import WHITE, composite, parse_hex_color
+from bg_remove_core.encoding import save_options
+from bg_remove_core.mask_cache import make_key
+from bg_remove_core.metrics import (
+    BYTES_ENCODED,
+    INFERENCE_IMAGES,
+    MASK_CACHE_LOOKUPS,
+    STAGE_SECONDS,
+)
+from bg_remove_core.models import MODEL_COSTS
+from bg_remove_core.refine import upsample_mask
+from bg_remove_core.segmentation import cutout, predict_masks
+from bg_remove_core.settings import (
+    ENCODER_PRESET,
+    INFERENCE_BACKEND,
+    INFERENCE_BATCH_SIZE,
+    MODEL_NAME,
+    MODEL_VERSION,
+    inference_gate,
+    inference_pool,
+    mask_cache,
+    model_registry,
+)
+from bg_remove_core.validation import sniff_image
+
+# Increased file size limit
+MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+
+# Maximum allowed source dimensions to prevent DoS via resizing
+MAX_SOURCE_DIMENSION = 6000
+
+# Max dimensions for processing
+MAX_IMAGE_SIZE = 2000  # pixels
+
+# Supported output formats
+OUTPUT_FORMATS = ["PNG", "WEBP", "JPEG"]
+
+# Results are shown from renditions at most this size: opaque ones as JPEG at this
+# quality, transparent ones as 256-color PNG
+DISPLAY_MAX_SIZE = 1000  # pixels
+DISPLAY_JPEG_QUALITY = 85
+
+# Background replacement modes (see apply_background_replacement)
+BG_MODES = ["transparent", "solid_color", "blur", "custom_image"]
+
+
+@contextmanager
+def timed(timings, stage):
+    """Record the time spent in the block in the stage latency metric, and add
+    it to ``timings[stage]`` if `timings` is given."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+class ImageRejected(ValueError):
+    """An image failed validation or decoding; the message is meant for the user."""
+
+
+def check_upload(name, size, data):
+    """Validate an upload's size, format and dimensions from its header only.
+
+    Args:
+        name: File name used in the messages
+        size: Upload size in bytes
+        data: The upload bytes (only the header is parsed, see sniff_image)
+
+    Returns:
+        str or None: The error message, or None if the upload is acceptable
+    """
+    if size > MAX_FILE_SIZE:
+        return f"File '{name}' is too large ({size / 1024 / 1024:.1f}MB). Maximum: {MAX_FILE_SIZE / 1024 / 1024:.1f}MB."
+
+    image_format, dimensions = sniff_image(data)
+    if image_format is None:
+        print(f"Security Warning: Upload '{name}' is not a PNG or JPEG file")
+        return f"File '{name}' has an unsupported format. Please upload a PNG or JPEG image."
+    if dimensions is not None and (
+        dimensions[0] > MAX_SOURCE_DIMENSION or dimensions[1] > MAX_SOURCE_DIMENSION
+    ):
+        print(f"Security Warning: Upload '{name}' dimensions too large: {dimensions}")
+        return f"File '{name}' is too large in dimensions ({dimensions[0]}x{dimensions[1]}). Max allowed: {MAX_SOURCE_DIMENSION}x{MAX_SOURCE_DIMENSION}."
+    return None
+
+
+def open_image(image_bytes, max_size=None):
+    """Open, validate and decode image bytes.
+
+    Args:
+        image_bytes: Raw upload bytes
+        max_size: Working size the image will be resized to, if it is only
+            needed at that size. JPEGs are then decoded with libjpeg's DCT
+            scaling (1/2, 1/4 or 1/8) to the smallest size still covering it,
+            so the full-resolution pixels are never materialized.
+
+    Returns:
+        The decoded PIL image
+
+    Raises:
+        ImageRejected: If the image is not an acceptable PNG or JPEG, or can
+            never be decoded
+    """
+    rejection = None
+    try:
+        image = Image.open(BytesIO(image_bytes))
+
+        # Security: Enforce strict format validation
+        # PIL detects the format based on the file header, not extension
+        if image.format not in ["JPEG", "PNG"]:
+            print(
+                f"Security Warning: Unsupported image format detected: {image.format}"
+            )
+            rejection = "Unsupported image format. Please upload a PNG or JPEG image."
+
+        # Security: Check dimensions to prevent DoS via resizing
+        elif image.width > MAX_SOURCE_DIMENSION or image.height > MAX_SOURCE_DIMENSION:
+            print(f"Security Warning: Image dimensions too large: {image.size}")
+            rejection = f"Image is too large in dimensions. Max allowed: {MAX_SOURCE_DIMENSION}x{MAX_SOURCE_DIMENSION}"
+
+        else:
+            if max_size is not None and image.format == "JPEG":
+                image.draft(image.mode, working_size(image.size, max_size))
+
+            # Decode now so the image is not lazily loaded by several threads
+            image.load()
+    except Image.DecompressionBombError as e:
+        print(f"Decompression Bomb Error: {e}")  # Log for security audit
+        raise ImageRejected("Image is too large to process.") from e
+    except OSError as e:
+        # Unidentified, truncated or corrupt image data; decoding it again will not help
+        print(f"Error decoding image: {str(e)}")  # Log for debugging
+        raise ImageRejected(
+            "The image could not be decoded. It may be corrupt or truncated."
+        ) from e
+
+    if rejection is not None:
+        raise ImageRejected(rejection)
+    return image
+
+
+def working_size(size, max_size):
+    """Size of an image of `size` scaled down to fit `max_size`, keeping its aspect ratio."""
+    width, height = size
+    if width <= max_size and height <= max_size:
+        return width, height
+
+    if width > height:
+        return max_size, int(height * (max_size / width))
+    return int(width * (max_size / height)), max_size
+
+
+def image_cost(
+    image_bytes, model_name=MODEL_NAME, full_resolution=False, segmented=False
+):
+    """Rate limit cost of processing an image (see bg_remove_core.ratelimit).
+
+    One model run (MODEL_COSTS, relative to u2net) plus one unit per megapixel
+    composited and encoded: the working size, or the source size at full
+    resolution. The size comes from the header; an image whose header does
+    not give it is charged as MAX_IMAGE_SIZE square.
+
+    Args:
+        segmented: The image's mask is already cached (new background or
+            output settings only), so the model run is not charged
+    """
+    _, size = sniff_image(image_bytes)
+    if size is None:
+        size = (MAX_IMAGE_SIZE, MAX_IMAGE_SIZE)
+    elif not full_resolution:
+        size = working_size(size, MAX_IMAGE_SIZE)
+    model_cost = 0.0 if segmented else MODEL_COSTS.get(model_name, 1.0)
+    return model_cost + size[0] * size[1] / 1_000_000
+
+
+# Resize image while maintaining aspect ratio
+def resize_image(image, max_size):
+    new_size = working_size(image.size, max_size)
+    if new_size == image.size:
+        return image
+
+    return image.resize(new_size, Image.BICUBIC)
+
+
+def get_session(model_name=MODEL_NAME):
+    return model_registry().get(model_name)
+
+
+def mask_cache_key(image_bytes, model_name=MODEL_NAME):
+    """Disk cache key covering the upload and every setting that changes its mask."""
+    return make_key(image_bytes, model_name, MODEL_VERSION, MAX_IMAGE_SIZE)
+
+
+def predict_masks_for(images, model_name=MODEL_NAME, session=None):
+    """Predict masks for EXIF-corrected working images with the configured backend.
+
+    Only the default model runs on the process pool; other models (including
+    the preview model) run in-process. Either way the call waits for a slot
+    of the inference gate.
+
+    Args:
+        session: rembg session for `model_name` to run in-process instead of
+            the configured backend (the batch CLI's worker processes)
+
+    Raises:
+        ServerBusy: If the inference queue is full
+    """
+    with inference_gate().slot(len(images)), timed(None, "inference"):
+        INFERENCE_IMAGES.inc(len(images), model=model_name)
+        if session is None:
+            if INFERENCE_BACKEND == "process" and model_name == MODEL_NAME:
+                return inference_pool().predict_masks(images)
+            session = get_session(model_name)
+        if len(images) == 1:
+            return [remove(images[0], session=session, only_mask=True)]
+        return predict_masks(images, session, batch_size=INFERENCE_BATCH_SIZE)
+
+
+def segment_masks(keys, images, model_name=MODEL_NAME, session=None):
+    """Predict masks for EXIF-corrected working images, reusing masks from the disk cache.
+
+    Args:
+        keys: Mask cache key for each image (see mask_cache_key)
+        images: The matching images at working resolution
+        model_name: Model used for the images missing from the cache
+        session: Optional rembg session for `model_name` (see predict_masks_for)
+
+    Returns:
+        list: One L-mode mask per image
+    """
+    cache = mask_cache()
+    masks = [cache.get(key) if cache is not None else None for key in keys]
+
+    missing = [idx for idx, mask in enumerate(masks) if mask is None]
+    if cache is not None:
+        MASK_CACHE_LOOKUPS.inc(len(keys) - len(missing), result="hit")
+        MASK_CACHE_LOOKUPS.inc(len(missing), result="miss")
+    if missing:
+        for idx, mask in zip(
+            missing,
+            predict_masks_for(
+                [images[idx] for idx in missing], model_name, session=session
+            ),
+        ):
+            masks[idx] = mask
+            if cache is not None:
+                try:
+                    cache.put(keys[idx], mask)
+                except OSError as e:
+                    # A full or read-only cache must not fail the request
+                    print(f"Could not write mask cache entry: {e}")
+    return masks
+
+
+def cutout_with_mask(image, mask, source_image=None):
+    """RGBA cutout of a working image from its L-mode mask.
+
+    With `source_image` (the same image at full resolution, EXIF-corrected),
+    the mask is upsampled with edge-aware refinement and the source is cut
+    out instead.
+    """
+    if source_image is None:
+        return cutout(image, mask)
+    return cutout(source_image, upsample_mask(mask, image, source_image))
+
+
+def apply_background_replacement(
+    fixed_img,
+    bg_mode,
+    bg_color=None,
+    bg_blur_radius=15,
+    bg_custom_image=None,
+    original_img=None,
+    rgb=False,
+    blurred_background=None,
+):
+    """Apply background replacement to a processed (transparent) image.
+
+    Args:
+        fixed_img: PIL Image with transparent background (RGBA)
+        bg_mode: One of 'transparent', 'solid_color', 'blur', 'custom_image'
+        bg_color: Hex color string for solid_color mode
+        bg_blur_radius: Blur radius for blur mode
+        bg_custom_image: PIL Image for custom_image mode
+        original_img: Original PIL Image for blur mode
+        rgb: Produce an RGB image for JPEG output; transparent results are
+            flattened onto white
+        blurred_background: Precomputed blur of original_img at the target
+            size (see pyramid_blur); computed here when omitted
+
+    Returns:
+        PIL Image with the replacement background applied
+    """
+    target_size = fixed_img.size
+    background = None
+    color = WHITE
+
+    if bg_mode == "solid_color" and bg_color is not None:
+        color = parse_hex_color(bg_color)
+    elif bg_mode == "blur" and original_img is not None:
+        background = blurred_background
+        if background is None:
+            background = pyramid_blur(original_img, target_size, bg_blur_radius)
+    elif bg_mode == "custom_image" and bg_custom_image is not None:
+        background = bg_custom_image.resize(target_size, Image.BICUBIC)
+    elif not rgb:
+        # Transparent, or the selected background is missing: keep the cutout as-is
+        return fixed_img
+
+    return composite(fixed_img, background, color, rgb=rgb)
+
+
+def convert_image_to_format(img, output_format="PNG", preset=ENCODER_PRESET):
+    """Convert a PIL image to the specified format and return bytes.
+
+    Args:
+        img: PIL Image object
+        output_format: One of 'PNG', 'WEBP', 'JPEG'
+        preset: Encoder preset (see bg_remove_core.encoding.ENCODER_PRESETS)
+
+    Returns:
+        bytes: The image encoded in the specified format
+    """
+    buf = BytesIO()
+    save_kwargs = save_options(output_format, preset)
+
+    if output_format == "JPEG":
+        # JPEG does not support transparency; composite onto white background
+        if img.mode in ("RGBA", "LA") or (
+            img.mode == "P" and "transparency" in img.info
+        ):
+            img = composite(img, rgb=True)
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+
+    img.save(buf, format=output_format, **save_kwargs)
+    BYTES_ENCODED.inc(buf.tell(), format=output_format)
+    return buf.getvalue()
+
+
+def make_rendition(image, max_size=DISPLAY_MAX_SIZE):
+    """Encode a copy of `image` scaled down to fit `max_size`, for display.
+
+    The image is first shrunk by the largest whole factor that keeps it above
+    `max_size` (a box filter, several times faster than resampling the full
+    image), then resized to fit.
+
+    Returns:
+        (image_bytes, format) with format "PNG" (256-color palette, for images with
+        transparent pixels) or "JPEG"
+    """
+    factor = max(image.size) // max_size
+    if factor >= 2:
+        image = image.reduce(factor)
+    small = resize_image(image, max_size)
+    buf = BytesIO()
+    has_alpha = small.mode in ("RGBA", "LA", "PA") or (
+        small.mode == "P" and "transparency" in small.info
+    )
+    if has_alpha:
+        small = small.convert("RGBA")
+        has_alpha = small.getchannel("A").getextrema()[0] < 255
+    if has_alpha:
+        small.quantize(256, method=Image.Quantize.FASTOCTREE).save(
+            buf, format="PNG", compress_level=1
+        )
+        return buf.getvalue(), "PNG"
+    small.convert("RGB").save(buf, format="JPEG", quality=DISPLAY_JPEG_QUALITY)
+    return buf.getvalue(), "JPEG"
+
+
+def get_format_extension(output_format):
+    """Get the file extension for a given output format."""
+    extensions = {"PNG": "png", "WEBP": "webp", "JPEG": "jpg"}
+    return extensions.get(output_format, "png")
+
+
+def get_format_mime(output_format):
+    """Get the MIME type for a given output format."""
+    mimes = {"PNG": "image/png", "WEBP": "image/webp", "JPEG": "image/jpeg"}
+    return mimes.get(output_format, "image/png")
+
+
+def remove_background(
+    image_bytes,
+    output_format="PNG",
+    bg_mode="transparent",
+    bg_color=None,
+    bg_blur_radius=15,
+    bg_custom_image=None,
+    full_resolution=False,
+    model_name=MODEL_NAME,
+    timings=None,
+    encoder_preset=ENCODER_PRESET,
+    session=None,
+):
+    """Run the whole pipeline on one image: decode, segment, replace the background, encode.
+
+    The same stages as the app's process_image and render_result, without
+    their per-session memoization (masks still come from the disk cache).
+
+    Args:
+        image_bytes: Raw upload bytes (check_upload them first)
+        output_format: One of OUTPUT_FORMATS
+        bg_mode: One of BG_MODES (see apply_background_replacement)
+        bg_color: Hex color for solid_color mode
+        bg_blur_radius: Blur radius for blur mode
+        bg_custom_image: PIL Image for custom_image mode
+        full_resolution: Cut out the source at full size (mask upsampled from the working image)
+        model_name: Segmentation model
+        encoder_preset: Encoder preset (see bg_remove_core.encoding)
+        session: Optional rembg session for `model_name` to run in-process
+            (see predict_masks_for)
+        timings: Optional dict; the seconds spent in each stage (decode,
+            resize, segment, composite, encode) are added to it
+
+    Returns:
+        bytes: The encoded result
+
+    Raises:
+        ImageRejected: If the image cannot be decoded (see open_image)
+        ServerBusy: If the inference queue is full (see predict_masks_for)
+    """
+    with timed(timings, "decode"):
+        image = open_image(image_bytes, None if full_resolution else MAX_IMAGE_SIZE)
+    with timed(timings, "resize"):
+        working = ImageOps.exif_transpose(resize_image(image, MAX_IMAGE_SIZE))
+    with timed(timings, "segment"):
+        (mask,) = segment_masks(
+            [mask_cache_key(image_bytes, model_name)],
+            [working],
+            model_name,
+            session=session,
+        )
+    with timed(timings, "composite"):
+        source_image = ImageOps.exif_transpose(image) if full_resolution else None
+        fixed = cutout_with_mask(working, mask, source_image)
+        result = apply_background_replacement(
+            fixed,
+            bg_mode,
+            bg_color=bg_color,
+            bg_blur_radius=bg_blur_radius,
+            bg_custom_image=bg_custom_image,
+            original_img=image,
+            rgb=output_format == "JPEG",
+        )
+    with timed(timings, "encode"):
+        return convert_image_to_format(result, output_format, encoder_preset)
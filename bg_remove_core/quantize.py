@@ -0,0 +1,211 @@
+"""Offline INT8 quantization of the U2-Net family of models.
+
+Usage:
+    python -m bg_remove_core.quantize [--model u2net] [--calibration IMAGE_OR_DIR ...]
+
+The FP32 model rembg downloads (``<U2NET_HOME>/<model>.onnx``) is statically
+quantized with onnxruntime: weights per channel to INT8, activations to UINT8
+with ranges calibrated on real images, stored in QDQ format so onnxruntime
+fuses the pairs into integer convolutions. The result is written next to the
+source as ``<model>-int8.onnx`` with a ``.json`` record of everything that
+went into it (source and calibration image hashes, settings, onnxruntime
+version), so a quantized file can be traced and rebuilt. The app serves it as
+the model ``<model>-int8`` (see create_session).
+
+Calibration images should look like production uploads; the bundled samples
+are only a fallback. ``benchmarks/bench_quantization.py`` compares the masks
+of the quantized model with FP32 ones.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+
+from PIL import Image
+
+from bg_remove_core.segmentation import MODEL_PARAMS, preprocess
+
+QUANTIZED_SUFFIX = "-int8"
+
+# Models sharing U2-Net's pre- and post-processing, so the quantized file can be
+# served through rembg's u2net_custom session
+QUANTIZABLE_MODELS = ("u2net", "u2netp", "silueta", "u2net_human_seg")
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+SAMPLE_IMAGES = [
+    os.path.join(os.path.dirname(__file__), "..", name)
+    for name in ("zebra.jpg", "wallaby.png")
+]
+
+
+def model_dir():
+    """Directory rembg keeps its models in (U2NET_HOME, as resolved by rembg)."""
+    return os.path.expanduser(
+        os.getenv("U2NET_HOME", os.path.join(os.getenv("XDG_DATA_HOME", "~"), ".u2net"))
+    )
+
+
+def base_model(model_name):
+    """FP32 model a quantized model name was built from, or None for other names."""
+    if not model_name.endswith(QUANTIZED_SUFFIX):
+        return None
+    base = model_name[: -len(QUANTIZED_SUFFIX)]
+    return base if base in QUANTIZABLE_MODELS else None
+
+
+def quantized_model_path(model_name):
+    """Path of the quantized file served as `model_name` (e.g. "u2net-int8")."""
+    return os.path.join(model_dir(), f"{model_name}.onnx")
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def calibration_files(paths):
+    """Image files in `paths` (files or directories), sorted for a reproducible order."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name)
+                for name in os.listdir(path)
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+        else:
+            files.append(path)
+    return sorted(set(files))
+
+
+class CalibrationReader:
+    """Feeds preprocessed calibration images to the quantizer (a CalibrationDataReader)."""
+
+    def __init__(self, files, input_name, model_name):
+        self.files = files
+        self.input_name = input_name
+        self.mean, self.std, self.size = MODEL_PARAMS[model_name]
+        self._next = 0
+
+    def get_next(self):
+        if self._next >= len(self.files):
+            return None
+        image = Image.open(self.files[self._next])
+        self._next += 1
+        tensor = preprocess(image, self.mean, self.std, self.size)
+        return {self.input_name: tensor[None]}
+
+    def rewind(self):
+        self._next = 0
+
+
+def quantize_model(source, target, calibration, model_name="u2net"):
+    """Statically quantize `source` into `target` and write `target`.json.
+
+    Args:
+        source: FP32 ONNX model path
+        target: Output path of the quantized model
+        calibration: Calibration image files
+        model_name: FP32 model name, selecting the preprocessing
+
+    Returns:
+        dict: The metadata written next to `target`
+    """
+    import onnxruntime
+    from onnxruntime.quantization import (
+        CalibrationMethod,
+        QuantFormat,
+        QuantType,
+        quant_pre_process,
+        quantize_static,
+    )
+
+    if not calibration:
+        raise ValueError("At least one calibration image is required")
+    settings = {
+        "quant_format": "QDQ",
+        "per_channel": True,
+        "activation_type": "QUInt8",
+        "weight_type": "QInt8",
+        "calibrate_method": "MinMax",
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        # Shape inference and graph cleanup let the quantizer cover every Conv.
+        # The input size is fixed, so ONNX shape inference is enough (symbolic
+        # inference would need sympy).
+        prepared = os.path.join(tmp, "prepared.onnx")
+        quant_pre_process(source, prepared, skip_symbolic_shape=True)
+        input_name = (
+            onnxruntime.InferenceSession(prepared, providers=["CPUExecutionProvider"])
+            .get_inputs()[0]
+            .name
+        )
+        quantize_static(
+            prepared,
+            target,
+            CalibrationReader(calibration, input_name, model_name),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            calibrate_method=CalibrationMethod.MinMax,
+        )
+
+    metadata = {
+        "model": model_name,
+        "source": os.path.basename(source),
+        "source_sha256": file_digest(source),
+        "calibration": [
+            {"file": os.path.basename(path), "sha256": file_digest(path)}
+            for path in calibration
+        ],
+        "settings": settings,
+        "onnxruntime": onnxruntime.__version__,
+        "sha256": file_digest(target),
+    }
+    with open(target + ".json", "w") as f:
+        json.dump(metadata, f, indent=2)
+    return metadata
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="u2net", choices=QUANTIZABLE_MODELS)
+    parser.add_argument(
+        "--calibration",
+        nargs="+",
+        default=SAMPLE_IMAGES,
+        help="Calibration images or directories (default: the bundled samples)",
+    )
+    parser.add_argument("--source", help="FP32 model (default: rembg's copy)")
+    parser.add_argument("--output", help="Quantized model (default: next to rembg's)")
+    args = parser.parse_args(argv)
+
+    source = args.source
+    if source is None:
+        source = os.path.join(model_dir(), f"{args.model}.onnx")
+        if not os.path.exists(source):
+            # Let rembg download the FP32 weights it would use anyway
+            from rembg import new_session
+
+            new_session(args.model)
+    target = args.output or quantized_model_path(args.model + QUANTIZED_SUFFIX)
+    files = calibration_files(args.calibration)
+
+    print(f"Quantizing {source} with {len(files)} calibration image(s)...")
+    metadata = quantize_model(source, target, files, args.model)
+    print(
+        f"Wrote {target} ({os.path.getsize(target) / 2**20:.1f} MB, "
+        f"sha256 {metadata['sha256'][:12]})"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""Cost-based rate limiting shared by every session and front end.
+
+Each client (an IP address) has a token bucket holding up to ``capacity``
+cost units, refilled at ``capacity / window`` units per second. A request is
+charged what it costs to process (see processing.image_cost), so a batch of
+ten photos uses up ten times what one does, and a thumbnail far less. A
+request costing more than the whole bucket runs once the bucket is full and
+leaves it in debt, so the client waits for it to refill.
+
+The buckets live in a store shared by everything that checks the limit:
+``TokenBuckets`` keeps them in memory, for every Streamlit session and API
+thread of one process; ``SQLiteTokenBuckets`` keeps them in an SQLite file,
+for deployments running several processes on one host.
+"""
+
+import sqlite3
+import threading
+import time
+
+
+class TokenBuckets:
+    """In-memory token buckets, one per client.
+
+    Args:
+        capacity: Cost units a client can spend at once
+        window: Seconds an empty bucket takes to refill
+        max_clients: Buckets kept before full (idle) ones are forgotten
+    """
+
+    def __init__(self, capacity, window, max_clients=10_000):
+        self.capacity = capacity
+        self.window = window
+        self.rate = capacity / window
+        self.max_clients = max_clients
+        self._buckets = {}  # client -> (tokens, time they were counted)
+        self._lock = threading.Lock()
+
+    def _charge(self, bucket, cost, now):
+        """(tokens left, seconds to wait) after charging `cost` to a stored (tokens, updated) bucket, or None for a full one."""
+        tokens = self.capacity
+        if bucket is not None:
+            tokens, updated = bucket
+            tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+        needed = min(cost, self.capacity)
+        if tokens < needed:
+            return tokens, (needed - tokens) / self.rate
+        return tokens - cost, 0.0
+
+    def _is_full(self, bucket, now):
+        tokens, updated = bucket
+        return tokens + (now - updated) * self.rate >= self.capacity
+
+    def take(self, client, cost, now=None):
+        """Charge `cost` units to `client`.
+
+        Returns:
+            0.0 if they were charged, else the seconds until the bucket holds
+            enough (nothing is charged then)
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, wait = self._charge(self._buckets.get(client), cost, now)
+            self._buckets[client] = (tokens, now)
+            # Forget full buckets so the table does not grow without bound
+            if len(self._buckets) > self.max_clients:
+                for key in [
+                    key
+                    for key, bucket in self._buckets.items()
+                    if self._is_full(bucket, now)
+                ]:
+                    del self._buckets[key]
+            return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteTokenBuckets(TokenBuckets):
+    """Token buckets in an SQLite file, shared by every process that opens it.
+
+    Each charge is one write transaction, so concurrent processes never
+    spend the same tokens twice.
+
+    Args:
+        path: Database file; created if missing
+        capacity: Cost units a client can spend at once
+        window: Seconds an empty bucket takes to refill
+        prune_every: Charges between deletions of full buckets
+    """
+
+    def __init__(self, path, capacity, window, prune_every=1000):
+        super().__init__(capacity, window)
+        self.path = path
+        self.prune_every = prune_every
+        self._charges = 0
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS buckets"
+            " (client TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _connect(self):
+        """This thread's connection (sqlite3 connections cannot be shared between threads)."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def take(self, client, cost, now=None):
+        now = time.time() if now is None else now
+        db = self._connect()
+        # Take the write lock up front: the bucket is read, then updated
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            bucket = db.execute(
+                "SELECT tokens, updated FROM buckets WHERE client = ?", (client,)
+            ).fetchone()
+            tokens, wait = self._charge(bucket, cost, now)
+            db.execute(
+                "INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (client, tokens, now)
+            )
+            with self._lock:
+                self._charges += 1
+                prune = self._charges % self.prune_every == 0
+            if prune:
+                db.execute(
+                    "DELETE FROM buckets WHERE tokens + (? - updated) * ? >= ?",
+                    (now, self.rate, self.capacity),
+                )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return wait
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
@@ -0,0 +1,97 @@
+"""Batched segmentation on top of rembg sessions.
+
+``rembg.remove`` runs the model once per image. For a batch we preprocess
+every image, stack the inputs into a single NCHW tensor and run the
+onnxruntime session once per chunk, then split the predictions back into
+one mask per image. The pre/post-processing mirrors rembg's session
+classes so masks match the per-image path.
+"""
+
+import numpy as np
+from PIL import Image, ImageOps
+
+# Default number of images stacked into one inference call
+DEFAULT_BATCH_SIZE = 4
+
+# (mean, std, input size) used by rembg for each model it can batch
+MODEL_PARAMS = {
+    "u2net": ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)),
+    "u2netp": ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)),
+    "u2net_human_seg": ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)),
+    "u2net_custom": ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)),
+    "silueta": ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)),
+    "isnet-general-use": ((0.485, 0.456, 0.406), (1.0, 1.0, 1.0), (1024, 1024)),
+    "isnet-anime": ((0.485, 0.456, 0.406), (1.0, 1.0, 1.0), (1024, 1024)),
+}
+
+
+def preprocess(img, mean, std, size):
+    """Normalize one image into a float32 CHW tensor (matches BaseSession.normalize)."""
+    arr = np.asarray(img.convert("RGB").resize(size, Image.LANCZOS), dtype=np.float64)
+    peak = float(arr.max()) or 1.0
+    arr = (arr / peak - np.asarray(mean)) / np.asarray(std)
+    return arr.transpose((2, 0, 1)).astype(np.float32)
+
+
+def postprocess(pred, size):
+    """Turn one raw model prediction (H, W) into an L-mode mask of the given size."""
+    lo, hi = float(pred.min()), float(pred.max())
+    pred = (pred - lo) / ((hi - lo) or 1.0)
+    mask = Image.fromarray((pred * 255).astype(np.uint8), mode="L")
+    return mask.resize(size, Image.LANCZOS)
+
+
+def max_batch_size(session):
+    """Largest batch the model accepts: 1 if its batch dimension is fixed, else unbounded."""
+    batch_dim = session.inner_session.get_inputs()[0].shape[0]
+    if isinstance(batch_dim, int) and batch_dim > 0:
+        return batch_dim
+    return None
+
+
+def run_batched(session, tensors, batch_size=DEFAULT_BATCH_SIZE):
+    """Run preprocessed CHW tensors through the session in chunks.
+
+    Returns:
+        list: One (H, W) prediction array per input tensor, in input order
+    """
+    input_name = session.inner_session.get_inputs()[0].name
+    limit = max_batch_size(session)
+    if limit is not None:
+        batch_size = min(batch_size, limit)
+    batch_size = max(1, batch_size)
+
+    preds = []
+    for start in range(0, len(tensors), batch_size):
+        chunk = np.stack(tensors[start : start + batch_size])
+        outputs = session.inner_session.run(None, {input_name: chunk})
+        preds.extend(outputs[0][:, 0, :, :])
+    return preds
+
+
+def predict_masks(images, session, batch_size=DEFAULT_BATCH_SIZE):
+    """Predict one L-mode mask per image, batching inference where possible.
+
+    Models without known preprocessing fall back to ``session.predict`` per image.
+    """
+    params = MODEL_PARAMS.get(getattr(session, "model_name", None))
+    if params is None:
+        return [session.predict(img)[0] for img in images]
+
+    mean, std, size = params
+    tensors = [preprocess(img, mean, std, size) for img in images]
+    preds = run_batched(session, tensors, batch_size)
+    return [postprocess(pred, img.size) for pred, img in zip(preds, images)]
+
+
+def cutout(img, mask):
+    """Apply a mask to an image the way rembg's naive cutout does."""
+    empty = Image.new("RGBA", img.size, 0)
+    return Image.composite(img, empty, mask)
+
+
+def remove_batch(images, session, batch_size=DEFAULT_BATCH_SIZE):
+    """Batched equivalent of ``[rembg.remove(img, session=session) for img in images]``."""
+    images = [ImageOps.exif_transpose(img) for img in images]
+    masks = predict_masks(images, session, batch_size)
+    return [cutout(img, mask) for img, mask in zip(images, masks)]
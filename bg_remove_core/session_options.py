@@ -0,0 +1,139 @@
+"""onnxruntime session options tuned for CPU deployments.
+
+``rembg.new_session`` builds its own ``SessionOptions`` and only honours
+``OMP_NUM_THREADS``, so every session gets one intra-op thread per physical
+core, spin-waiting thread pools and full graph optimization. That is right
+for one request on a dedicated machine, but with several concurrent requests
+(or several worker processes) in one container the thread pools oversubscribe
+the CPU quota, and spinning threads burn idle CPU between requests.
+
+``SessionConfig`` holds the options worth tuning, reads them from
+``BG_REMOVE_ORT_*`` environment variables, and ``create_session`` builds a
+rembg session with them.
+"""
+
+import os
+from dataclasses import dataclass
+
+from bg_remove_core.quantize import base_model, quantized_model_path
+
+# Config value -> onnxruntime enum member
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+EXECUTION_MODES = {"sequential": "ORT_SEQUENTIAL", "parallel": "ORT_PARALLEL"}
+
+
+@dataclass(frozen=True)
+class SessionConfig:
+    """onnxruntime options applied to every segmentation session.
+
+    Attributes:
+        intra_op_threads: Threads used inside one operator; 0 lets onnxruntime
+            pick (one per physical core)
+        inter_op_threads: Threads running independent operators in parallel
+            execution mode; 0 lets onnxruntime pick
+        execution_mode: "sequential" or "parallel"
+        graph_optimization: "disable", "basic", "extended" or "all"
+        memory_arena: Keep freed tensor memory in onnxruntime's arena for
+            reuse instead of returning it to the allocator
+        spin_wait: Let idle pool threads spin for more work instead of
+            sleeping (lower latency, but burns CPU between requests)
+    """
+
+    intra_op_threads: int = 0
+    inter_op_threads: int = 0
+    execution_mode: str = "sequential"
+    graph_optimization: str = "all"
+    memory_arena: bool = True
+    spin_wait: bool = False
+
+    def __post_init__(self):
+        if self.execution_mode not in EXECUTION_MODES:
+            raise ValueError(
+                f"Unknown execution mode: {self.execution_mode}. "
+                f"Choose one of: {', '.join(EXECUTION_MODES)}"
+            )
+        if self.graph_optimization not in GRAPH_OPTIMIZATION_LEVELS:
+            raise ValueError(
+                f"Unknown graph optimization level: {self.graph_optimization}. "
+                f"Choose one of: {', '.join(GRAPH_OPTIMIZATION_LEVELS)}"
+            )
+        if self.intra_op_threads < 0 or self.inter_op_threads < 0:
+            raise ValueError("Thread counts must be 0 (automatic) or positive")
+
+    @classmethod
+    def from_env(cls, environ=None, prefix="BG_REMOVE_ORT_"):
+        """Build a config from environment variables; unset variables keep the defaults."""
+        environ = os.environ if environ is None else environ
+        default = cls()
+
+        def get(name, fallback):
+            return environ.get(prefix + name, fallback)
+
+        return cls(
+            intra_op_threads=int(get("INTRA_OP_THREADS", default.intra_op_threads)),
+            inter_op_threads=int(get("INTER_OP_THREADS", default.inter_op_threads)),
+            execution_mode=get("EXECUTION_MODE", default.execution_mode).lower(),
+            graph_optimization=get(
+                "GRAPH_OPTIMIZATION", default.graph_optimization
+            ).lower(),
+            memory_arena=get("MEMORY_ARENA", "1" if default.memory_arena else "0")
+            != "0",
+            spin_wait=get("SPIN_WAIT", "1" if default.spin_wait else "0") != "0",
+        )
+
+    def session_options(self):
+        """The matching ``onnxruntime.SessionOptions``."""
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        options.execution_mode = getattr(
+            ort.ExecutionMode, EXECUTION_MODES[self.execution_mode]
+        )
+        options.graph_optimization_level = getattr(
+            ort.GraphOptimizationLevel,
+            GRAPH_OPTIMIZATION_LEVELS[self.graph_optimization],
+        )
+        options.enable_cpu_mem_arena = self.memory_arena
+        spinning = "1" if self.spin_wait else "0"
+        options.add_session_config_entry("session.intra_op.allow_spinning", spinning)
+        options.add_session_config_entry("session.inter_op.allow_spinning", spinning)
+        return options
+
+
+def create_session(model_name, config=None, providers=None):
+    """Equivalent of ``rembg.new_session(model_name)`` using `config` for onnxruntime.
+
+    The session class is looked up the same way new_session does it, so every
+    model rembg knows is supported (unknown names fall back to u2net's class).
+    Quantized models ("u2net-int8", see bg_remove_core.quantize) are loaded
+    from their local file through rembg's u2net_custom session.
+
+    Raises:
+        FileNotFoundError: If a quantized model has not been built
+    """
+    import rembg  # Importing rembg loads its sessions package
+
+    config = config if config is not None else SessionConfig()
+    if base_model(model_name) is not None:
+        path = quantized_model_path(model_name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                f"Quantized model {path} not found. Build it with: "
+                f"python -m bg_remove_core.quantize --model {base_model(model_name)}"
+            )
+        return rembg.sessions.u2net_custom.U2netCustomSession(
+            "u2net_custom", config.session_options(), providers, model_path=path
+        )
+
+    session_class = next(
+        (cls for cls in rembg.sessions.sessions_class if cls.name() == model_name),
+        rembg.sessions.u2net.U2netSession,
+    )
+    return session_class(model_name, config.session_options(), providers)
@@ -0,0 +1,223 @@
+"""Inference settings and process-wide model sessions.
+
+The settings are read from the environment once, at import. The session
+registry, the inference process pool, the inference gate, the mask cache and
+the rate limit buckets are created on first use and shared by everything in the process: the Streamlit script runs of every
+user session, and the warm-up started by the launcher (serve.py), so the
+sessions it warms are the ones requests use.
+"""
+
+import os
+import threading
+from importlib import metadata
+
+from PIL import Image
+
+from bg_remove_core.admission import InferenceGate
+from bg_remove_core.encoding import DEFAULT_ENCODER_PRESET, encoder_preset
+from bg_remove_core.mask_cache import DiskMaskCache
+from bg_remove_core.metrics import REGISTRY
+from bg_remove_core.models import SessionRegistry, selectable_models
+from bg_remove_core.ratelimit import SQLiteTokenBuckets, TokenBuckets
+from bg_remove_core.segmentation import DEFAULT_BATCH_SIZE, MODEL_PARAMS, predict_masks
+from bg_remove_core.session_options import SessionConfig, create_session
+from bg_remove_core.workers import InferencePool
+
+# onnxruntime options for every model session (BG_REMOVE_ORT_* variables, see SessionConfig);
+# in-process sessions are shared by all concurrent requests
+ORT_SESSION_CONFIG = SessionConfig.from_env()
+
+# Images stacked into a single model call when segmenting a batch
+INFERENCE_BATCH_SIZE = max(
+    1, int(os.environ.get("BG_REMOVE_INFERENCE_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+)
+
+# Inference backend: "thread" runs the model inside the app's process,
+# "process" hands images to a pool of worker processes via shared memory
+INFERENCE_BACKEND = os.environ.get("BG_REMOVE_INFERENCE_BACKEND", "thread")
+PROCESS_WORKERS = max(
+    1,
+    int(
+        os.environ.get("BG_REMOVE_PROCESS_WORKERS", max(1, (os.cpu_count() or 1) // 2))
+    ),
+)
+# onnxruntime threads per worker process; defaults to an even share of the cores
+WORKER_ORT_THREADS = max(
+    1,
+    int(
+        os.environ.get(
+            "BG_REMOVE_WORKER_ORT_THREADS", (os.cpu_count() or 1) // PROCESS_WORKERS
+        )
+    ),
+)
+
+# Admission control (see bg_remove_core.admission): model calls allowed to run at once,
+# and callers allowed to wait for a turn before further ones are turned away. By
+# default one call per worker process, or per share of the cores the onnxruntime
+# sessions use (a single call when they use all of them)
+if INFERENCE_BACKEND == "process":
+    _concurrent_inferences = PROCESS_WORKERS
+elif ORT_SESSION_CONFIG.intra_op_threads:
+    _concurrent_inferences = (
+        os.cpu_count() or 1
+    ) // ORT_SESSION_CONFIG.intra_op_threads
+else:
+    _concurrent_inferences = 1
+MAX_CONCURRENT_INFERENCES = max(
+    1,
+    int(os.environ.get("BG_REMOVE_MAX_CONCURRENT_INFERENCES", _concurrent_inferences)),
+)
+INFERENCE_QUEUE_SIZE = max(0, int(os.environ.get("BG_REMOVE_INFERENCE_QUEUE_SIZE", 16)))
+
+# Default segmentation model; the name and library version are part of every mask cache key
+MODEL_NAME = os.environ.get("BG_REMOVE_MODEL", "u2net")
+try:
+    MODEL_VERSION = f"rembg-{metadata.version('rembg')}"
+except metadata.PackageNotFoundError:
+    MODEL_VERSION = "rembg-unknown"
+# Models users can choose per request (comma-separated, empty offers all of MODELS)
+SELECTABLE_MODELS = selectable_models(
+    MODEL_NAME, os.environ.get("BG_REMOVE_MODELS", "")
+)
+# Model sessions kept loaded at once (the preview model counts too)
+MAX_MODEL_SESSIONS = max(1, int(os.environ.get("BG_REMOVE_MAX_MODEL_SESSIONS", 2)))
+
+# Lightweight model whose cutout is shown for a single image while the full model runs
+# (set to an empty string to disable the preview)
+PREVIEW_MODEL_NAME = os.environ.get("BG_REMOVE_PREVIEW_MODEL", "u2netp")
+
+# Default encoder preset for results (see bg_remove_core.encoding)
+ENCODER_PRESET = encoder_preset(
+    os.environ.get("BG_REMOVE_ENCODER_PRESET", DEFAULT_ENCODER_PRESET)
+)
+
+# Persistent mask cache shared by all sessions and restarts (set the size to 0 to disable)
+MASK_CACHE_DIR = os.environ.get(
+    "BG_REMOVE_MASK_CACHE_DIR", os.path.join("~", ".cache", "bg_remove", "masks")
+)
+MASK_CACHE_MAX_BYTES = (
+    int(os.environ.get("BG_REMOVE_MASK_CACHE_MAX_MB", 512)) * 1024 * 1024
+)
+
+# Content hashes of uploads that failed to decode, remembered so re-submissions are
+# rejected without decoding or charging the rate limit
+REJECTED_UPLOADS_MAX = int(os.environ.get("BG_REMOVE_REJECTED_UPLOADS_MAX", 1024))
+
+# Cost-based rate limit per client (see bg_remove_core.ratelimit): buckets of
+# RATE_LIMIT_BUDGET cost units refilled over RATE_LIMIT_WINDOW seconds, kept in memory,
+# or in the SQLite file RATE_LIMIT_DB to share them between processes
+RATE_LIMIT_BUDGET = float(os.environ.get("BG_REMOVE_RATE_LIMIT_BUDGET", 40))
+RATE_LIMIT_WINDOW = int(os.environ.get("BG_REMOVE_RATE_LIMIT_WINDOW", 60))
+RATE_LIMIT_DB = os.environ.get("BG_REMOVE_RATE_LIMIT_DB", "")
+
+# Listener of the GET /metrics endpoint (see bg_remove_core.warmup.serve_metrics);
+# loopback only by default, so the metrics are not public next to the app
+METRICS_HOST = os.environ.get("BG_REMOVE_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("BG_REMOVE_METRICS_PORT", 8503))
+
+_lock = threading.Lock()
+_registry = None
+_pool = None
+_gate = None
+_mask_cache = None
+_token_buckets = None
+
+
+def model_registry():
+    """The process-wide SessionRegistry."""
+    global _registry
+    with _lock:
+        if _registry is None:
+            _registry = SessionRegistry(
+                MAX_MODEL_SESSIONS,
+                lambda model_name: create_session(model_name, ORT_SESSION_CONFIG),
+            )
+        return _registry
+
+
+def inference_pool():
+    """The process-wide InferencePool running MODEL_NAME (process backend only)."""
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = InferencePool(
+                model_name=MODEL_NAME,
+                workers=PROCESS_WORKERS,
+                ort_threads=WORKER_ORT_THREADS,
+                session_config=ORT_SESSION_CONFIG,
+            )
+        return _pool
+
+
+def inference_gate():
+    """The process-wide InferenceGate every model call goes through."""
+    global _gate
+    with _lock:
+        if _gate is None:
+            _gate = InferenceGate(MAX_CONCURRENT_INFERENCES, INFERENCE_QUEUE_SIZE)
+            REGISTRY.register_collector("inference_gate", _gate.collect_metrics)
+        return _gate
+
+
+def mask_cache():
+    """The process-wide DiskMaskCache, or None if it is disabled."""
+    global _mask_cache
+    if MASK_CACHE_MAX_BYTES <= 0:
+        return None
+    with _lock:
+        if _mask_cache is None:
+            _mask_cache = DiskMaskCache(MASK_CACHE_DIR, MASK_CACHE_MAX_BYTES)
+        return _mask_cache
+
+
+def token_buckets():
+    """The process-wide rate limit buckets, in RATE_LIMIT_DB if it is set."""
+    global _token_buckets
+    with _lock:
+        if _token_buckets is None:
+            if RATE_LIMIT_DB:
+                _token_buckets = SQLiteTokenBuckets(
+                    os.path.expanduser(RATE_LIMIT_DB),
+                    RATE_LIMIT_BUDGET,
+                    RATE_LIMIT_WINDOW,
+                )
+            else:
+                _token_buckets = TokenBuckets(RATE_LIMIT_BUDGET, RATE_LIMIT_WINDOW)
+        return _token_buckets
+
+
+def warmup_models():
+    """Models loaded in-process at startup: the default model unless it runs on
+    the process pool, then the preview model, within MAX_MODEL_SESSIONS."""
+    names = [] if INFERENCE_BACKEND == "process" else [MODEL_NAME]
+    if PREVIEW_MODEL_NAME and PREVIEW_MODEL_NAME not in names:
+        names.append(PREVIEW_MODEL_NAME)
+    return names[:MAX_MODEL_SESSIONS]
+
+
+def warmup_steps():
+    """(name, callable) steps that load the models requests will use and run
+    one dummy inference each, so onnxruntime's first-run costs are paid up front."""
+
+    def dummy(model_name):
+        _, _, size = MODEL_PARAMS.get(model_name, MODEL_PARAMS["u2net"])
+        return Image.new("RGB", size)
+
+    steps = [
+        (
+            f"load {name}",
+            lambda name=name: predict_masks([dummy(name)], model_registry().get(name)),
+        )
+        for name in warmup_models()
+    ]
+    if INFERENCE_BACKEND == "process":
+        # One image per worker, so every worker process starts and loads the model
+        steps.append(
+            (
+                f"start {PROCESS_WORKERS} worker process(es)",
+                lambda: inference_pool().predict_masks(
+                    [dummy(MODEL_NAME)] * PROCESS_WORKERS
+                ),
+            )
+        )
+    return steps
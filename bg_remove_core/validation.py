@@ -0,0 +1,108 @@
+"""Upload validation from the image header alone, plus a negative cache.
+
+``sniff_image`` identifies PNG and JPEG files from their magic bytes and
+reads the pixel dimensions from the PNG IHDR chunk or the JPEG SOFn segment,
+walking the JPEG marker segments by their lengths instead of decoding
+anything. Only a few hundred bytes are touched for typical files, so an
+upload can be rejected before it is copied, hashed or charged to the rate
+limit.
+
+Files that pass the header check but fail the full decode (truncated or
+corrupt data, decompression bombs) are remembered by content hash in a
+``RejectedUploads`` cache, so re-submitting them is answered without decoding.
+"""
+
+import struct
+import threading
+from collections import OrderedDict
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+JPEG_SIGNATURE = b"\xff\xd8\xff"
+
+# Start-of-frame markers carrying the image size (all SOFn except DHT, JPG and DAC)
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Markers without a length field
+JPEG_STANDALONE_MARKERS = frozenset(range(0xD0, 0xD8)) | {0x01}
+# Give up on pathological files with endless metadata segments
+MAX_JPEG_SEGMENTS = 256
+
+
+def _jpeg_size(data):
+    """(width, height) from the first SOFn segment, or None if it cannot be found."""
+    pos = 2
+    for _ in range(MAX_JPEG_SEGMENTS):
+        # Markers are 0xFF followed by the marker code; extra 0xFF bytes are fill
+        while pos < len(data) and data[pos] == 0xFF:
+            pos += 1
+        if pos >= len(data) or data[pos - 1] != 0xFF:
+            return None
+        marker = data[pos]
+        pos += 1
+        if marker in JPEG_STANDALONE_MARKERS:
+            continue
+        if marker in (0xD9, 0xDA):
+            return None  # End of image or start of scan before any frame header
+        if pos + 2 > len(data):
+            return None
+        (length,) = struct.unpack(">H", data[pos : pos + 2])
+        if length < 2:
+            return None
+        if marker in JPEG_SOF_MARKERS:
+            if pos + 7 > len(data):
+                return None
+            height, width = struct.unpack(">HH", data[pos + 3 : pos + 7])
+            return width, height
+        pos += length
+    return None
+
+
+def sniff_image(data):
+    """Identify an image from its header bytes.
+
+    Args:
+        data: The file contents (bytes or a memoryview; only the header is read)
+
+    Returns:
+        tuple: (format, size). format is "PNG", "JPEG" or None for anything
+        else; size is (width, height), or None if the header does not give it
+    """
+    if bytes(data[:8]) == PNG_SIGNATURE:
+        if len(data) >= 24 and bytes(data[12:16]) == b"IHDR":
+            return "PNG", struct.unpack(">II", data[16:24])
+        return "PNG", None
+    if bytes(data[:3]) == JPEG_SIGNATURE:
+        return "JPEG", _jpeg_size(data)
+    return None, None
+
+
+class RejectedUploads:
+    """Bounded, thread-safe map of content hash -> error message for rejected uploads.
+
+    Args:
+        max_entries: Entries kept; the least recently seen are dropped first
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Error message the upload was rejected with, or None if it was not rejected."""
+        with self._lock:
+            message = self._entries.get(key)
+            if message is not None:
+                self._entries.move_to_end(key)
+            return message
+
+    def add(self, key, message):
+        if key is None or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = message
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,128 @@
+"""Startup warm-up and the readiness endpoint that reports it.
+
+A cold replica pays for loading the model (reading hundreds of MB of
+weights) and for onnxruntime's graph optimization and buffer allocation on
+the first inference, several seconds the first user would otherwise wait
+for. ``Warmup`` runs those steps on a background thread at boot, and
+``serve_readiness`` answers ``GET /ready`` with 503 until they are done, so
+health checks and load balancers only send traffic to warm replicas.
+``serve_metrics`` answers ``GET /metrics`` with the process's metrics (see
+bg_remove_core.metrics) on a separate listener, bound to the loopback
+interface by default so they are not published next to ``/ready``.
+"""
+
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bg_remove_core.metrics import CONTENT_TYPE, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+STARTING, WARMING, READY, FAILED = "starting", "warming", "ready", "failed"
+
+
+class Warmup:
+    """Runs warm-up steps once, in order, and tracks the outcome.
+
+    Args:
+        steps: (name, callable) pairs, e.g. bg_remove_core.settings.warmup_steps()
+    """
+
+    def __init__(self, steps):
+        self.steps = list(steps)
+        self.state = STARTING
+        self.error = None
+        self.elapsed = None
+        self._done = threading.Event()
+
+    @property
+    def ready(self):
+        return self.state == READY
+
+    def start(self):
+        """Run the steps on a daemon thread; returns the thread."""
+        thread = threading.Thread(target=self.run, name="bg_remove_warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def run(self):
+        """Run the steps in the calling thread. A failing step stops the warm-up
+        and leaves the replica unready, since requests would fail the same way."""
+        self.state = WARMING
+        start = time.perf_counter()
+        try:
+            for name, step in self.steps:
+                step_start = time.perf_counter()
+                step()
+                logger.info(
+                    "Warm-up: %s took %.2fs", name, time.perf_counter() - step_start
+                )
+        except Exception as e:
+            self.error = f"{name}: {e}"
+            self.state = FAILED
+            logger.exception("Warm-up failed at %s", name)
+        else:
+            self.state = READY
+        finally:
+            self.elapsed = time.perf_counter() - start
+            self._done.set()
+        if self.ready:
+            logger.info("Warm-up finished in %.2fs", self.elapsed)
+
+    def wait(self, timeout=None):
+        """Block until the warm-up has finished (or failed); returns `ready`."""
+        self._done.wait(timeout)
+        return self.ready
+
+
+def serve_readiness(warmup, port, host="0.0.0.0"):
+    """Serve ``GET /ready`` (200 once `warmup` is ready, 503 before or on failure)
+    on a daemon thread; returns the server (``server_address`` has the bound port)."""
+
+    def ready():
+        if warmup.ready:
+            return 200, "text/plain; charset=utf-8", b"ready\n"
+        body = warmup.state + (f": {warmup.error}" if warmup.error else "")
+        return 503, "text/plain; charset=utf-8", body.encode() + b"\n"
+
+    return _serve({"/ready": ready}, port, host, "bg_remove_readiness")
+
+
+def serve_metrics(port, host="127.0.0.1", registry=REGISTRY):
+    """Serve ``GET /metrics`` (the metrics of `registry`) on a daemon thread;
+    returns the server (``server_address`` has the bound port)."""
+
+    def metrics():
+        return 200, CONTENT_TYPE, registry.exposition().encode()
+
+    return _serve({"/metrics": metrics}, port, host, "bg_remove_metrics")
+
+
+def _serve(routes, port, host, name):
+    """Serve GET requests for `routes` ({path: callable returning (status,
+    content type, body bytes)}) on a daemon thread named `name`."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            route = routes.get(self.path.split("?")[0])
+            if route is None:
+                self.send_error(404)
+                return
+            status, content_type, payload = route()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            # Probes and scrapers hit this every few seconds; keep them out of the app's logs
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=name, daemon=True).start()
+    return server
@@ -0,0 +1,144 @@
+"""Process-pool inference backend with shared-memory image handoff.
+
+Each worker process loads its own rembg session once. The parent copies the
+decoded RGB pixels of an image into a ``multiprocessing.shared_memory``
+block, the worker writes the predicted mask into a second block, and only
+the block names and image size travel through the pool's pipe.
+"""
+
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import replace
+from multiprocessing import get_context, shared_memory
+
+from PIL import Image, ImageOps
+
+from bg_remove_core.segmentation import cutout, predict_masks
+from bg_remove_core.session_options import SessionConfig, create_session
+
+# Session loaded once per worker process by _init_worker
+_session = None
+
+
+def _init_worker(model_name, ort_threads, session_config=None):
+    """Pool initializer: load the model with this worker's share of the cores."""
+    global _session
+    config = session_config if session_config is not None else SessionConfig()
+    if ort_threads:
+        config = replace(config, intra_op_threads=ort_threads)
+    _session = create_session(model_name, config)
+
+
+def _attach(name):
+    """Attach to a shared memory block created (and later unlinked) by the parent."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Spawned workers share the parent's resource tracker, so registering the
+    # block again here is harmless and the parent's unlink() stays authoritative.
+    return shared_memory.SharedMemory(name=name)
+
+
+def _segment_shared(pixels_name, mask_name, size):
+    """Worker task: read RGB pixels from shared memory, write the mask back."""
+    width, height = size
+    pixels_block = _attach(pixels_name)
+    mask_block = _attach(mask_name)
+    try:
+        with pixels_block.buf[: width * height * 3] as pixels:
+            img = Image.frombytes("RGB", size, pixels)
+        mask = predict_masks([img], _session)[0]
+        mask_block.buf[: width * height] = mask.tobytes()
+    finally:
+        pixels_block.close()
+        mask_block.close()
+
+
+class InferencePool:
+    """Run segmentation on a pool of worker processes.
+
+    Args:
+        model_name: rembg model loaded by every worker
+        workers: Number of worker processes
+        ort_threads: onnxruntime intra-op threads per worker (None keeps the
+            session config's setting)
+        session_config: SessionConfig for the workers' sessions (defaults to
+            SessionConfig())
+    """
+
+    def __init__(
+        self, model_name="u2net", workers=1, ort_threads=None, session_config=None
+    ):
+        self.model_name = model_name
+        self.workers = max(1, workers)
+        self.ort_threads = ort_threads
+        self.session_config = session_config
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a threaded server process (Streamlit, onnxruntime) is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.model_name, self.ort_threads, self.session_config),
+                )
+            return self._executor
+
+    def _reset(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def predict_masks(self, images):
+        """Predict one L-mode mask per image on the worker processes."""
+        executor = self._get_executor()
+        blocks = []
+        jobs = []
+        try:
+            for img in images:
+                rgb = img.convert("RGB")
+                width, height = rgb.size
+                pixels = shared_memory.SharedMemory(
+                    create=True, size=width * height * 3
+                )
+                blocks.append(pixels)
+                mask = shared_memory.SharedMemory(create=True, size=width * height)
+                blocks.append(mask)
+                pixels.buf[: width * height * 3] = rgb.tobytes()
+                future = executor.submit(
+                    _segment_shared, pixels.name, mask.name, rgb.size
+                )
+                jobs.append((mask, rgb.size, future))
+
+            masks = []
+            for mask, (width, height), future in jobs:
+                future.result()
+                with mask.buf[: width * height] as data:
+                    masks.append(Image.frombytes("L", (width, height), data))
+            return masks
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); start a fresh pool for the next call
+            self._reset(executor)
+            raise
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    def remove(self, images):
+        """Process-pool equivalent of ``[rembg.remove(img, session=...) for img in images]``."""
+        images = [ImageOps.exif_transpose(img) for img in images]
+        masks = self.predict_masks(images)
+        return [cutout(img, mask) for img, mask in zip(images, masks)]
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
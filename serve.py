@@ -0,0 +1,51 @@
+"""Launch the app with model warm-up and a readiness endpoint.
+
+Usage:
+    python serve.py [streamlit options, e.g. --server.port=8501]
+
+Streamlit only runs bg_remove.py once a browser connects, so nothing would
+load the model before the first user. This launcher starts the warm-up (see
+bg_remove_core.warmup) on a background thread and serves ``GET /ready`` on
+BG_REMOVE_READINESS_PORT and ``GET /metrics`` on BG_REMOVE_METRICS_HOST and
+BG_REMOVE_METRICS_PORT (loopback by default), then runs Streamlit in the same
+process: the sessions it warms are the ones the app uses, and the metrics
+are the app's.
+"""
+
+import logging
+import os
+import sys
+
+from bg_remove_core.settings import METRICS_HOST, METRICS_PORT, warmup_steps
+from bg_remove_core.warmup import Warmup, serve_metrics, serve_readiness
+
+# Set to 0 to skip the warm-up (the replica reports ready immediately)
+WARMUP = os.environ.get("BG_REMOVE_WARMUP", "1") != "0"
+
+# Port of the readiness endpoint (GET /ready), on all interfaces
+READINESS_PORT = int(os.environ.get("BG_REMOVE_READINESS_PORT", 8502))
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bg_remove.py")
+
+
+def main(argv=None):
+    # rembg pulls in numba (via pymatting), which hangs interpreter shutdown when
+    # first imported from another thread, as the warm-up and Streamlit's script
+    # runner would do
+    import rembg  # noqa: F401
+    from streamlit.web import cli as stcli
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s"
+    )
+    warmup = Warmup(warmup_steps() if WARMUP else [])
+    serve_readiness(warmup, READINESS_PORT)
+    serve_metrics(METRICS_PORT, METRICS_HOST)
+    warmup.start()
+
+    sys.argv = ["streamlit", "run", APP, *(sys.argv[1:] if argv is None else argv)]
+    return stcli.main()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,9 +6,26 @@ before importing bg_remove, avoiding import-time side effects.
 
 import sys
 import os
+import tempfile
 import pytest
 from unittest.mock import MagicMock
 
+# Keep the persistent mask cache out of the user's home directory during tests
+os.environ.setdefault(
+    "BG_REMOVE_MASK_CACHE_DIR", tempfile.mkdtemp(prefix="bg_remove_masks_")
+)
+
+
+MOCKED_MODULES = (
+    "streamlit",
+    "rembg",
+    "onnxruntime",
+    "numpy",
+    "PIL",
+    "PIL.Image",
+    "PIL.ImageFilter",
+)
+
 
 def _clean_modules():
     """Remove any cached bg_remove-related modules from sys.modules."""
@@ -66,6 +83,8 @@ def mock_env():
 
     Returns a dict with all mock objects and the imported bg_remove module.
     """
+    # Module-level mocks installed by other test files, put back on teardown
+    replaced = {name: sys.modules.get(name) for name in MOCKED_MODULES}
     _clean_modules()
 
     mock_st, mock_col1, mock_col2 = _create_mock_streamlit()
@@ -73,6 +92,7 @@ def mock_env():
 
     sys.modules["streamlit"] = mock_st
     sys.modules["rembg"] = MagicMock()
+    sys.modules["onnxruntime"] = MagicMock()
     sys.modules["numpy"] = MagicMock()
     sys.modules["PIL"] = mock_pil
     sys.modules["PIL.Image"] = mock_image_module
@@ -96,3 +116,8 @@ def mock_env():
 
     # Cleanup
     _clean_modules()
+    for name, module in replaced.items():
+        if module is None:
+            sys.modules.pop(name, None)
+        else:
+            sys.modules[name] = module
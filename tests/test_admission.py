@@ -0,0 +1,219 @@
+"""Tests for admission control of model inference."""
+
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from bg_remove_core.admission import InferenceGate, ServerBusy
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def start(target):
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
+
+
+class TestInferenceGate:
+    """Tests for the concurrency limit and the bounded queue."""
+
+    def test_at_most_concurrency_slots_are_held(self):
+        gate = InferenceGate(concurrency=2, max_queue=10)
+        release = threading.Event()
+        peak = []
+
+        def infer():
+            with gate.slot():
+                peak.append(gate.running)
+                release.wait()
+
+        threads = [start(infer) for _ in range(5)]
+        wait_until(lambda: gate.waiting == 3)
+        assert gate.running == 2
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert max(peak) == 2
+        assert (gate.running, gate.waiting) == (0, 0)
+
+    def test_waiting_callers_run_in_arrival_order(self):
+        gate = InferenceGate(concurrency=1, max_queue=10)
+        order = []
+
+        def infer(name):
+            with gate.slot():
+                order.append(name)
+
+        with gate.slot():
+            threads = []
+            for idx, name in enumerate("abc"):
+                threads.append(start(lambda name=name: infer(name)))
+                wait_until(lambda idx=idx: gate.waiting == idx + 1)
+        for thread in threads:
+            thread.join()
+
+        assert order == ["a", "b", "c"]
+
+    def test_full_queue_is_rejected_at_once(self):
+        gate = InferenceGate(concurrency=1, max_queue=1)
+        gate.seconds_per_image = 2.0
+
+        with gate.slot(images=2):
+            waiter = start(lambda: gate.slot().__enter__())
+            wait_until(lambda: gate.waiting == 1)
+            with pytest.raises(ServerBusy) as excinfo:
+                with gate.slot():
+                    pass
+
+        waiter.join()
+        # 2 running images and 1 queued, at 2 seconds each
+        assert excinfo.value.retry_after == 6.0
+        assert gate.rejected == 1
+
+    def test_no_queue_rejects_when_all_slots_are_busy(self):
+        gate = InferenceGate(concurrency=1, max_queue=0)
+
+        with gate.slot():
+            with pytest.raises(ServerBusy) as excinfo:
+                gate.slot().__enter__()
+
+        assert excinfo.value.retry_after is None  # nothing measured yet
+        with gate.slot():
+            pass
+
+    def test_waiters_are_told_their_position_and_wait(self):
+        gate = InferenceGate(concurrency=1, max_queue=10, poll_interval=0.01)
+        gate.seconds_per_image = 2.0
+        reports = {"first": [], "second": []}
+
+        def infer(name, images):
+            with gate.notify_waits(lambda *status: reports[name].append(status)):
+                with gate.slot(images):
+                    pass
+
+        with gate.slot():
+            first = start(lambda: infer("first", 3))
+            wait_until(lambda: reports["first"])
+            second = start(lambda: infer("second", 1))
+            wait_until(lambda: reports["second"])
+        first.join()
+        second.join()
+
+        assert reports["first"] == [(1, 2)]
+        # Behind the running image and the first caller's three
+        assert reports["second"][0] == (2, 8)
+
+    def test_callers_that_give_up_leave_the_queue(self):
+        gate = InferenceGate(concurrency=1, max_queue=10)
+        errors = []
+
+        def stop(position, wait):
+            raise RuntimeError("session stopped")
+
+        def infer():
+            with gate.notify_waits(stop):
+                try:
+                    with gate.slot():
+                        pass
+                except RuntimeError as e:
+                    errors.append(e)
+
+        with gate.slot():
+            start(infer).join()
+            assert gate.waiting == 0
+
+        assert len(errors) == 1
+
+    def test_inference_time_is_averaged_per_image(self):
+        gate = InferenceGate(concurrency=1, max_queue=10)
+
+        with patch("bg_remove_core.admission.time.perf_counter") as clock:
+            clock.side_effect = [0.0, 4.0]
+            with gate.slot(images=2):
+                pass
+            assert gate.seconds_per_image == 2.0
+            clock.side_effect = [0.0, 12.0]
+            with gate.slot(images=2):
+                pass
+
+        assert abs(gate.seconds_per_image - 2.8) < 1e-9
+
+    def test_failed_inference_frees_its_slot(self):
+        gate = InferenceGate(concurrency=1, max_queue=0)
+
+        with pytest.raises(ValueError):
+            with gate.slot():
+                raise ValueError("model error")
+
+        assert gate.running == 0
+
+
+class TestGatedInference:
+    """Tests for model calls going through the gate."""
+
+    def test_model_runs_inside_a_slot(self, mock_env):
+        from bg_remove_core import processing
+
+        gate = InferenceGate(concurrency=1, max_queue=0)
+        with (
+            patch.object(processing, "inference_gate", return_value=gate),
+            patch.object(processing, "get_session"),
+            patch.object(
+                processing, "remove", side_effect=lambda image, **k: gate.running
+            ),
+        ):
+            assert processing.predict_masks_for([MagicMock()]) == [1]
+
+        assert gate.running == 0
+
+    def test_busy_gate_skips_the_model(self, mock_env):
+        from bg_remove_core import processing
+
+        gate = InferenceGate(concurrency=1, max_queue=0)
+        with (
+            patch.object(processing, "inference_gate", return_value=gate),
+            patch.object(processing, "remove") as mock_remove,
+            gate.slot(),
+        ):
+            with pytest.raises(ServerBusy):
+                processing.predict_masks_for([MagicMock()])
+
+        mock_remove.assert_not_called()
+
+    def test_app_reports_a_full_queue(self, mock_env):
+        bg_remove = mock_env["module"]
+        from bg_remove_core.admission import ServerBusy
+
+        mock_env["st"].error.reset_mock()
+        with (
+            patch.object(
+                bg_remove, "load_image", return_value=(MagicMock(), MagicMock())
+            ),
+            patch.object(bg_remove, "segment_image", side_effect=ServerBusy("busy")),
+        ):
+            assert bg_remove.process_image(b"img") == (None, None)
+            image, preview = bg_remove.preview_image(b"img")
+
+        mock_env["st"].error.assert_called_once_with("busy")
+        assert image is not None and preview is None
+
+    def test_queue_position_is_shown(self, mock_env):
+        bg_remove = mock_env["module"]
+        placeholder = MagicMock()
+
+        show = bg_remove.show_queue_position_in(placeholder)
+        show(3, 12)
+        show(1, None)
+
+        messages = [c.args[0] for c in placeholder.info.call_args_list]
+        assert "number 3 in the queue, about 12 seconds" in messages[0]
+        assert messages[1].endswith("number 1 in the queue.")
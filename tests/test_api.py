@@ -0,0 +1,292 @@
+"""Tests for the headless HTTP API."""
+
+import asyncio
+import json
+import struct
+import subprocess
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+pytest.importorskip("tornado")
+
+from tornado.httpclient import AsyncHTTPClient  # noqa: E402
+from tornado.httpserver import HTTPServer  # noqa: E402
+from tornado.testing import bind_unused_port  # noqa: E402
+
+
+def _png(width=100, height=100):
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + struct.pack(">I4sII", 13, b"IHDR", width, height)
+        + b"\x08\x06\x00\x00\x00"
+    )
+
+
+def fetch(app, path, body=b"", method="POST", headers=None):
+    async def run():
+        sock, port = bind_unused_port()
+        server = HTTPServer(app)
+        server.add_sockets([sock])
+        try:
+            return await AsyncHTTPClient().fetch(
+                f"http://127.0.0.1:{port}{path}",
+                method=method,
+                body=body if method == "POST" else None,
+                headers=headers,
+                raise_error=False,
+            )
+        finally:
+            server.stop()
+
+    return asyncio.run(run())
+
+
+def error_of(response):
+    return json.loads(response.body)["error"]
+
+
+@pytest.fixture
+def api(mock_env):
+    from bg_remove_core import api
+
+    with patch.object(api, "remove_background", return_value=b"result") as mock_remove:
+        yield api, mock_remove
+
+
+class TestRemoveEndpoint:
+    """Tests for POST /remove."""
+
+    def test_returns_encoded_result(self, api):
+        api, mock_remove = api
+
+        response = fetch(
+            api.make_app(),
+            "/remove?format=jpg&background=blur&blur_radius=20&preset=fast",
+            _png(),
+        )
+
+        assert response.code == 200
+        assert response.body == b"result"
+        assert response.headers["Content-Type"] == "image/jpeg"
+        assert 'filename="image_rmbg.jpg"' in response.headers["Content-Disposition"]
+        mock_remove.assert_called_once_with(
+            _png(),
+            bg_custom_image=None,
+            output_format="JPEG",
+            bg_mode="blur",
+            bg_color="#FFFFFF",
+            bg_blur_radius=20,
+            full_resolution=False,
+            model_name=api.SELECTABLE_MODELS[0],
+            encoder_preset="fast",
+        )
+
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "format=gif",
+            "background=stripes",
+            "color=red",
+            "blur_radius=100",
+            "blur_radius=abc",
+            "model=unknown",
+            "full_resolution=maybe",
+            "preset=ultra",
+        ],
+    )
+    def test_invalid_parameters_are_rejected(self, api, query):
+        api, mock_remove = api
+
+        response = fetch(api.make_app(), f"/remove?{query}", _png())
+
+        assert response.code == 400
+        assert error_of(response)
+        mock_remove.assert_not_called()
+
+    def test_oversized_body_is_refused_before_reading_it(self, api):
+        api, mock_remove = api
+
+        response = fetch(api.make_app(), "/remove", b"\x00" * (api.MAX_FILE_SIZE + 1))
+
+        assert response.code == 413
+        mock_remove.assert_not_called()
+
+    def test_oversized_chunked_body_is_cut_off(self, api):
+        api, mock_remove = api
+
+        async def produce(write):
+            # No Content-Length: the body is sent chunked
+            for _ in range(api.MAX_FILE_SIZE // 65536 + 2):
+                await write(b"\x00" * 65536)
+
+        async def run():
+            sock, port = bind_unused_port()
+            server = HTTPServer(api.make_app())
+            server.add_sockets([sock])
+            try:
+                return await AsyncHTTPClient().fetch(
+                    f"http://127.0.0.1:{port}/remove",
+                    method="POST",
+                    body_producer=produce,
+                    raise_error=False,
+                )
+            finally:
+                server.stop()
+
+        response = asyncio.run(run())
+
+        assert response.code == 400
+        mock_remove.assert_not_called()
+
+    def test_header_validation(self, api):
+        api, mock_remove = api
+        from bg_remove_core.processing import MAX_SOURCE_DIMENSION
+
+        app = api.make_app()
+
+        assert fetch(app, "/remove", b"GIF89a" + b"\x00" * 20).code == 422
+        too_big = fetch(app, "/remove", _png(MAX_SOURCE_DIMENSION + 1, 10))
+        assert too_big.code == 422
+        assert "too large in dimensions" in error_of(too_big)
+        mock_remove.assert_not_called()
+
+    def test_empty_body(self, api):
+        api, _ = api
+        assert fetch(api.make_app(), "/remove", b"").code == 400
+
+    def test_rate_limit_per_client(self, api):
+        api, mock_remove = api
+        from bg_remove_core.ratelimit import TokenBuckets
+
+        # A 100x100 image costs 1.01 units with u2net
+        app = api.make_app(rate_limiter=TokenBuckets(capacity=2.5, window=60))
+
+        codes = [fetch(app, "/remove", _png()).code for _ in range(3)]
+        limited = fetch(app, "/remove", _png())
+
+        assert codes == [200, 200, 429]
+        assert 1 <= int(limited.headers["Retry-After"]) <= 60
+        assert mock_remove.call_count == 2
+
+    def test_rate_limit_charges_image_cost(self, api):
+        api, mock_remove = api
+        from bg_remove_core.ratelimit import TokenBuckets
+
+        app = api.make_app(rate_limiter=TokenBuckets(capacity=5, window=60))
+
+        # 2000x2000 costs 5 units: the whole budget
+        assert fetch(app, "/remove", _png(2000, 2000)).code == 200
+        assert fetch(app, "/remove", _png()).code == 429
+
+    def test_full_inference_queue(self, api):
+        api, mock_remove = api
+        from bg_remove_core.admission import ServerBusy
+
+        mock_remove.side_effect = ServerBusy("The server is busy.", retry_after=7.2)
+
+        response = fetch(api.make_app(), "/remove", _png())
+
+        assert response.code == 503
+        assert response.headers["Retry-After"] == "8"
+        assert error_of(response) == "The server is busy."
+
+    def test_metrics(self, api):
+        api, _ = api
+        from bg_remove_core.metrics import BYTES_RECEIVED, REGISTRY, REJECTIONS
+
+        app = api.make_app()
+        fetch(app, "/remove", _png())
+        fetch(app, "/remove", b"GIF89a" + b"\x00" * 20)
+
+        body = REGISTRY.exposition()
+        assert 'bg_remove_images_received_total{frontend="api"} 2' in body
+        assert BYTES_RECEIVED.value(frontend="api") == len(_png()) + 26
+        assert REJECTIONS.value(frontend="api", reason="invalid") == 1
+
+    def test_metrics_are_not_served_publicly(self, api):
+        api, _ = api
+
+        assert fetch(api.make_app(), "/metrics", method="GET").code == 404
+
+    def test_undecodable_uploads_are_remembered(self, api):
+        api, mock_remove = api
+        from bg_remove_core.processing import ImageRejected
+
+        mock_remove.side_effect = ImageRejected("The image could not be decoded.")
+        app = api.make_app()
+
+        first = fetch(app, "/remove", _png())
+        second = fetch(app, "/remove", _png())
+
+        assert (first.code, second.code) == (422, 422)
+        assert error_of(second) == "The image could not be decoded."
+        mock_remove.assert_called_once()
+
+    def test_pipeline_errors_are_not_leaked(self, api):
+        api, mock_remove = api
+        mock_remove.side_effect = RuntimeError("onnxruntime internals")
+
+        response = fetch(api.make_app(), "/remove", _png())
+
+        assert response.code == 500
+        assert error_of(response) == api.PROCESSING_ERROR
+
+    def test_multipart_with_custom_background(self, api):
+        api, mock_remove = api
+        boundary = "xyz"
+        body = (
+            (
+                f"--{boundary}\r\n"
+                'Content-Disposition: form-data; name="image"; filename="../cat 1.png"\r\n'
+                "Content-Type: image/png\r\n\r\n"
+            ).encode()
+            + _png()
+            + (
+                f"\r\n--{boundary}\r\n"
+                'Content-Disposition: form-data; name="background"; filename="bg.png"\r\n'
+                "Content-Type: image/png\r\n\r\n"
+            ).encode()
+            + _png(50, 50)
+            + f"\r\n--{boundary}--\r\n".encode()
+        )
+        headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+        with patch.object(api, "open_image", return_value="bg_image") as mock_open:
+            response = fetch(
+                api.make_app(), "/remove?background=custom_image", body, headers=headers
+            )
+
+        assert response.code == 200
+        assert 'filename="cat 1_rmbg.png"' in response.headers["Content-Disposition"]
+        mock_open.assert_called_once_with(_png(50, 50))
+        assert mock_remove.call_args.kwargs["bg_custom_image"] == "bg_image"
+
+    def test_custom_background_needs_a_file(self, api):
+        api, _ = api
+        assert (
+            fetch(api.make_app(), "/remove?background=custom_image", _png()).code == 400
+        )
+
+
+class TestHealth:
+    """Tests for the health and readiness endpoints."""
+
+    def test_health(self, api):
+        api, _ = api
+        assert fetch(api.make_app(), "/health", method="GET").code == 200
+
+    def test_ready_follows_warmup(self, api):
+        api, _ = api
+        warmup = MagicMock(ready=False, state="warming", error=None)
+        app = api.make_app(warmup=warmup)
+
+        assert fetch(app, "/ready", method="GET").code == 503
+        warmup.ready = True
+        assert fetch(app, "/ready", method="GET").code == 200
+
+
+def test_api_does_not_import_streamlit():
+    code = "import sys, bg_remove_core.api; sys.exit('streamlit' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code], timeout=120).returncode == 0
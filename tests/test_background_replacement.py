@@ -1,6 +1,6 @@
 """Tests for background replacement logic."""
 
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 
 class TestApplyBackgroundReplacement:
@@ -20,98 +20,101 @@ class TestApplyBackgroundReplacement:
         assert result is fixed_img
 
     def test_solid_color_creates_colored_background(self, mock_env):
+        from bg_remove_core import processing
+
         bg_remove = mock_env["module"]
-        mock_image_module = mock_env["image_module"]
 
         fixed_img = MagicMock()
         fixed_img.mode = "RGBA"
         fixed_img.size = (100, 100)
 
-        mock_background = MagicMock()
-        mock_image_module.new.return_value = mock_background
+        with patch.object(processing, "composite") as mock_composite:
+            result = bg_remove.apply_background_replacement(
+                fixed_img=fixed_img,
+                bg_mode="solid_color",
+                bg_color="#FF0000",
+            )
 
-        result = bg_remove.apply_background_replacement(
-            fixed_img=fixed_img,
-            bg_mode="solid_color",
-            bg_color="#FF0000",
-        )
-
-        # Should create a new RGBA image with the specified color
-        mock_image_module.new.assert_called_with("RGBA", (100, 100), (255, 0, 0, 255))
-        # Should paste the foreground onto the background
-        mock_background.paste.assert_called_once_with(fixed_img, (0, 0), fixed_img)
-        assert result is mock_background
+        # Should blend the foreground over the colour in one pass
+        mock_composite.assert_called_once_with(fixed_img, None, (255, 0, 0), rgb=False)
+        assert result is mock_composite.return_value
 
     def test_solid_color_parses_hex_correctly(self, mock_env):
+        from bg_remove_core import processing
+
         bg_remove = mock_env["module"]
-        mock_image_module = mock_env["image_module"]
 
         fixed_img = MagicMock()
-        fixed_img.mode = "RGBA"
         fixed_img.size = (50, 50)
-        mock_image_module.new.return_value = MagicMock()
 
-        bg_remove.apply_background_replacement(
-            fixed_img=fixed_img,
-            bg_mode="solid_color",
-            bg_color="#00FF80",
-        )
+        with patch.object(processing, "composite") as mock_composite:
+            bg_remove.apply_background_replacement(
+                fixed_img=fixed_img,
+                bg_mode="solid_color",
+                bg_color="#00FF80",
+            )
 
-        mock_image_module.new.assert_called_with("RGBA", (50, 50), (0, 255, 128, 255))
+        assert mock_composite.call_args.args[2] == (0, 255, 128)
 
     def test_solid_color_handles_hash_prefix(self, mock_env):
+        from bg_remove_core.compositing import parse_hex_color
+
+        assert parse_hex_color("#AABBCC") == (170, 187, 204)
+        assert parse_hex_color("AABBCC") == (170, 187, 204)
+
+    def test_blur_mode_uses_original_image(self, mock_env):
+        from bg_remove_core import processing
+
         bg_remove = mock_env["module"]
-        mock_image_module = mock_env["image_module"]
 
         fixed_img = MagicMock()
         fixed_img.mode = "RGBA"
-        fixed_img.size = (10, 10)
-        mock_image_module.new.return_value = MagicMock()
+        fixed_img.size = (200, 200)
+        original_img = MagicMock()
 
-        # With # prefix
-        bg_remove.apply_background_replacement(
-            fixed_img=fixed_img,
-            bg_mode="solid_color",
-            bg_color="#AABBCC",
+        with (
+            patch.object(processing, "pyramid_blur") as mock_blur,
+            patch.object(processing, "composite") as mock_composite,
+        ):
+            bg_remove.apply_background_replacement(
+                fixed_img=fixed_img,
+                bg_mode="blur",
+                bg_blur_radius=20,
+                original_img=original_img,
+            )
+
+        mock_blur.assert_called_once_with(original_img, (200, 200), 20)
+        # Should blend the foreground over the blurred background
+        mock_composite.assert_called_once_with(
+            fixed_img, mock_blur.return_value, (255, 255, 255), rgb=False
         )
 
-        mock_image_module.new.assert_called_with("RGBA", (10, 10), (170, 187, 204, 255))
+    def test_blur_mode_reuses_precomputed_background(self, mock_env):
+        from bg_remove_core import processing
 
-    def test_blur_mode_uses_original_image(self, mock_env):
         bg_remove = mock_env["module"]
 
         fixed_img = MagicMock()
-        fixed_img.mode = "RGBA"
         fixed_img.size = (200, 200)
-
-        original_img = MagicMock()
-        blurred_copy = MagicMock()
-        blurred_copy.mode = "RGB"
-        blurred_resized = MagicMock()
-        blurred_resized.mode = "RGB"
-        blurred_filtered = MagicMock()
-        blurred_filtered.mode = "RGB"
-        blurred_converted = MagicMock()
-
-        original_img.copy.return_value = blurred_copy
-        blurred_copy.resize.return_value = blurred_resized
-        blurred_resized.filter.return_value = blurred_filtered
-        blurred_filtered.convert.return_value = blurred_converted
-
-        bg_remove.apply_background_replacement(
-            fixed_img=fixed_img,
-            bg_mode="blur",
-            bg_blur_radius=20,
-            original_img=original_img,
-        )
-
-        original_img.copy.assert_called_once()
-        blurred_copy.resize.assert_called_once()
-        blurred_resized.filter.assert_called_once()
-        # Should paste foreground onto blurred background
-        blurred_converted.paste.assert_called_once_with(fixed_img, (0, 0), fixed_img)
+        blurred = MagicMock()
+
+        with (
+            patch.object(processing, "pyramid_blur") as mock_blur,
+            patch.object(processing, "composite") as mock_composite,
+        ):
+            bg_remove.apply_background_replacement(
+                fixed_img=fixed_img,
+                bg_mode="blur",
+                original_img=MagicMock(),
+                blurred_background=blurred,
+            )
+
+        mock_blur.assert_not_called()
+        assert mock_composite.call_args.args[1] is blurred
 
     def test_custom_image_mode_uses_uploaded_background(self, mock_env):
+        from bg_remove_core import processing
+
         bg_remove = mock_env["module"]
 
         fixed_img = MagicMock()
@@ -119,47 +122,40 @@ class TestApplyBackgroundReplacement:
         fixed_img.size = (300, 300)
 
         custom_bg = MagicMock()
-        custom_bg_copy = MagicMock()
         custom_bg_resized = MagicMock()
-        custom_bg_resized.mode = "RGB"
-        custom_bg_converted = MagicMock()
-
-        custom_bg.copy.return_value = custom_bg_copy
-        custom_bg_copy.resize.return_value = custom_bg_resized
-        custom_bg_resized.convert.return_value = custom_bg_converted
-
-        bg_remove.apply_background_replacement(
-            fixed_img=fixed_img,
-            bg_mode="custom_image",
-            bg_custom_image=custom_bg,
+        custom_bg.resize.return_value = custom_bg_resized
+
+        with patch.object(processing, "composite") as mock_composite:
+            bg_remove.apply_background_replacement(
+                fixed_img=fixed_img,
+                bg_mode="custom_image",
+                bg_custom_image=custom_bg,
+            )
+
+        custom_bg.resize.assert_called_once_with((300, 300), bg_remove.Image.BICUBIC)
+        mock_composite.assert_called_once_with(
+            fixed_img, custom_bg_resized, (255, 255, 255), rgb=False
         )
 
-        custom_bg.copy.assert_called_once()
-        custom_bg_copy.resize.assert_called_once()
-        custom_bg_converted.paste.assert_called_once_with(fixed_img, (0, 0), fixed_img)
+    def test_rgb_output_flattens_transparent_onto_white(self, mock_env):
+        from bg_remove_core import processing
 
-    def test_converts_non_rgba_fixed_image(self, mock_env):
         bg_remove = mock_env["module"]
-        mock_image_module = mock_env["image_module"]
 
         fixed_img = MagicMock()
-        fixed_img.mode = "RGB"  # Not RGBA
-        fixed_img.size = (100, 100)
-
-        converted_img = MagicMock()
-        converted_img.mode = "RGBA"
-        converted_img.size = (100, 100)
-        fixed_img.convert.return_value = converted_img
+        fixed_img.mode = "RGBA"
 
-        mock_image_module.new.return_value = MagicMock()
+        with patch.object(processing, "composite") as mock_composite:
+            result = bg_remove.apply_background_replacement(
+                fixed_img=fixed_img,
+                bg_mode="transparent",
+                rgb=True,
+            )
 
-        bg_remove.apply_background_replacement(
-            fixed_img=fixed_img,
-            bg_mode="solid_color",
-            bg_color="#FFFFFF",
+        mock_composite.assert_called_once_with(
+            fixed_img, None, (255, 255, 255), rgb=True
         )
-
-        fixed_img.convert.assert_called_with("RGBA")
+        assert result is mock_composite.return_value
 
     def test_fallback_returns_image_for_unknown_mode(self, mock_env):
         bg_remove = mock_env["module"]
@@ -216,3 +212,43 @@ class TestApplyBackgroundReplacement:
         )
 
         assert result is fixed_img
+
+
+class TestComposite:
+    """Tests for compositing over backgrounds with transparency."""
+
+    def test_transparent_background_keeps_its_alpha(self, mock_env):
+        from bg_remove_core import compositing
+
+        foreground = MagicMock(mode="RGBA")
+        background = MagicMock(mode="RGBA", info={})
+
+        result = compositing.composite(foreground, background)
+
+        compositing.Image.alpha_composite.assert_called_once_with(
+            background.convert.return_value, foreground
+        )
+        background.convert.assert_called_once_with("RGBA")
+        assert result is compositing.Image.alpha_composite.return_value
+
+    def test_palette_transparency_counts_as_alpha(self, mock_env):
+        from bg_remove_core.compositing import has_alpha
+
+        assert has_alpha(MagicMock(mode="P", info={"transparency": 0}))
+        assert has_alpha(MagicMock(mode="LA", info={}))
+        assert not has_alpha(MagicMock(mode="RGB", info={}))
+
+    def test_transparent_background_is_flattened_for_jpeg(self, mock_env):
+        from bg_remove_core import compositing
+
+        foreground = MagicMock(mode="RGBA")
+        background = MagicMock(mode="RGBA", info={})
+
+        composite = compositing.composite
+        with patch.object(compositing, "composite") as mock_flatten:
+            result = composite(foreground, background, rgb=True)
+
+        mock_flatten.assert_called_once_with(
+            compositing.Image.alpha_composite.return_value, rgb=True
+        )
+        assert result is mock_flatten.return_value
@@ -0,0 +1,267 @@
+"""Tests for the command-line batch processor."""
+
+import json
+import os
+import struct
+from unittest.mock import patch
+
+import pytest
+
+OPTIONS = {
+    "output_format": "PNG",
+    "bg_mode": "transparent",
+    "bg_color": "#FFFFFF",
+    "bg_blur_radius": 15,
+    "full_resolution": False,
+    "model_name": "u2net",
+}
+
+
+def _png(width=100, height=100):
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + struct.pack(">I4sII", 13, b"IHDR", width, height)
+        + b"\x08\x06\x00\x00\x00"
+    )
+
+
+def fake_remove(data, timings=None, **kwargs):
+    timings["segment"] = timings.get("segment", 0.0) + 0.5
+    return b"cutout:" + kwargs["output_format"].encode()
+
+
+@pytest.fixture
+def batch(mock_env):
+    from bg_remove_core import batch
+
+    with (
+        patch.object(batch, "remove_background", side_effect=fake_remove) as mock,
+        patch.object(batch, "create_session"),
+    ):
+        yield batch, mock
+
+
+@pytest.fixture
+def tree(tmp_path):
+    src = tmp_path / "in"
+    (src / "shoes").mkdir(parents=True)
+    (src / "a.png").write_bytes(_png())
+    (src / "shoes" / "b.jpg").write_bytes(b"\xff\xd8\xff" + b"\x00" * 20)
+    (src / "notes.txt").write_text("not an image")
+    return src, tmp_path / "out"
+
+
+def manifest(out):
+    with open(out / "manifest.jsonl") as f:
+        return [json.loads(line) for line in f]
+
+
+class TestDiscovery:
+    """Tests for finding inputs and naming outputs."""
+
+    def test_finds_images_recursively_in_order(self, mock_env, tree):
+        from bg_remove_core.batch import find_images
+
+        src, _ = tree
+        assert find_images(src) == ["a.png", os.path.join("shoes", "b.jpg")]
+
+    def test_output_path_mirrors_the_tree(self, mock_env):
+        from bg_remove_core.batch import output_path
+
+        assert output_path(os.path.join("x", "cat.jpeg"), "WEBP") == os.path.join(
+            "x", "cat_rmbg.webp"
+        )
+
+
+class TestRunBatch:
+    """Tests for processing a tree and resuming from the manifest."""
+
+    def test_writes_outputs_and_manifest(self, batch, tree):
+        batch, mock_remove = batch
+        src, out = tree
+
+        report = batch.run_batch(src, out, OPTIONS)
+
+        assert (out / "a_rmbg.png").read_bytes() == b"cutout:PNG"
+        assert (out / "shoes" / "b_rmbg.png").read_bytes() == b"cutout:PNG"
+        assert [e["status"] for e in manifest(out)] == ["done", "done"]
+        assert report.counts["done"] == 2
+        assert report.stage_seconds["segment"] == 1.0
+        assert mock_remove.call_count == 2
+        assert not [p for p in out.rglob("*.tmp")]
+
+    def test_second_run_skips_finished_files(self, batch, tree):
+        batch, mock_remove = batch
+        src, out = tree
+
+        batch.run_batch(src, out, OPTIONS)
+        report = batch.run_batch(src, out, OPTIONS)
+
+        assert report.counts["skipped"] == 2
+        assert report.counts["done"] == 0
+        assert mock_remove.call_count == 2
+
+    def test_interrupted_run_resumes_with_the_rest(self, batch, tree):
+        batch, mock_remove = batch
+        src, out = tree
+        batch.run_batch(src, out, OPTIONS)
+        # Keep the first entry and a line cut short by the interruption
+        lines = (out / "manifest.jsonl").read_text().splitlines()
+        (out / "manifest.jsonl").write_text(lines[0] + "\n" + lines[1][:20])
+        mock_remove.reset_mock()
+
+        report = batch.run_batch(src, out, OPTIONS)
+
+        assert report.counts == {"done": 1, "rejected": 0, "failed": 0, "skipped": 1}
+        assert mock_remove.call_count == 1
+
+    @pytest.mark.parametrize(
+        "change",
+        ["options", "source", "output"],
+    )
+    def test_changes_are_reprocessed(self, batch, tree, change):
+        batch, _ = batch
+        src, out = tree
+        batch.run_batch(src, out, OPTIONS)
+        options = OPTIONS
+        if change == "options":
+            options = dict(OPTIONS, bg_mode="blur")
+        elif change == "source":
+            (src / "a.png").write_bytes(_png(200, 200))
+        else:
+            (out / "a_rmbg.png").unlink()
+
+        report = batch.run_batch(src, out, options)
+
+        assert report.counts["done"] == (2 if change == "options" else 1)
+
+    def test_rejected_files_are_not_retried(self, batch, tree):
+        batch, mock_remove = batch
+        src, out = tree
+        (src / "fake.png").write_bytes(b"GIF89a" + b"\x00" * 20)
+
+        first = batch.run_batch(src, out, OPTIONS)
+        second = batch.run_batch(src, out, OPTIONS)
+
+        assert first.counts["rejected"] == 1
+        assert second.counts["skipped"] == 3
+        rejected = [e for e in manifest(out) if e["status"] == "rejected"]
+        assert rejected[0]["source"] == "fake.png"
+        assert "unsupported format" in rejected[0]["error"]
+        assert mock_remove.call_count == 2
+
+    def test_failures_are_recorded_and_retried(self, batch, tree):
+        batch, mock_remove = batch
+        src, out = tree
+        mock_remove.side_effect = RuntimeError("model crashed")
+        progress = []
+
+        first = batch.run_batch(
+            src, out, OPTIONS, progress=lambda *a: progress.append(a)
+        )
+        mock_remove.side_effect = fake_remove
+        second = batch.run_batch(src, out, OPTIONS)
+
+        assert first.counts["failed"] == 2
+        assert progress[0] == ("a.png", "failed", "RuntimeError: model crashed")
+        assert second.counts["done"] == 2
+
+    def test_decode_errors_are_rejections(self, batch, tree):
+        batch, mock_remove = batch
+        src, out = tree
+        mock_remove.side_effect = batch.ImageRejected("The image could not be decoded.")
+
+        report = batch.run_batch(src, out, OPTIONS)
+
+        assert report.counts["rejected"] == 2
+        assert not (out / "a_rmbg.png").exists()
+
+
+class TestWorkerSetup:
+    """Tests for the worker process initializer."""
+
+    def test_workers_load_their_own_session(self, mock_env):
+        from bg_remove_core import batch, processing, settings
+
+        config = settings.ORT_SESSION_CONFIG
+        with (
+            patch.object(processing, "INFERENCE_BACKEND", "process"),
+            patch.object(batch, "create_session") as mock_create,
+        ):
+            batch._init_worker("u2netp", 3, None)
+
+            # The process-wide backend and session options are left alone
+            assert processing.INFERENCE_BACKEND == "process"
+        assert settings.ORT_SESSION_CONFIG is config
+        model_name, worker_config = mock_create.call_args.args
+        assert model_name == "u2netp"
+        assert worker_config.intra_op_threads == 3
+        assert batch._session is mock_create.return_value
+
+    def test_session_is_passed_to_the_pipeline(self, batch, tree):
+        batch, mock_remove = batch
+        src, out = tree
+
+        batch.run_batch(src, out, OPTIONS)
+
+        batch.create_session.assert_called_once()
+        session = batch.create_session.return_value
+        assert mock_remove.call_args.kwargs["session"] is session
+
+
+class TestReport:
+    """Tests for the end-of-run summary."""
+
+    def test_throughput_and_stage_shares(self, mock_env):
+        from bg_remove_core.batch import BatchReport
+
+        report = BatchReport()
+        report.add("done", {"decode": 1.0, "segment": 3.0})
+        report.add("done", {"decode": 1.0, "segment": 3.0})
+        report.elapsed = 4.0
+
+        text = report.format()
+
+        assert report.throughput == 0.5
+        assert "0.50 images/s" in text
+        assert "segment        6.00    3000.0  75.0%" in text
+
+
+class TestMain:
+    """Tests for the command line."""
+
+    def test_runs_and_reports(self, batch, tree, capsys):
+        batch, _ = batch
+        src, out = tree
+
+        assert (
+            batch.main([str(src), str(out), "--format", "jpg", "--workers", "1"]) == 0
+        )
+
+        assert (out / "a_rmbg.jpg").exists()
+        assert "2 done" in capsys.readouterr().out
+
+    @pytest.mark.parametrize("color", ["red", "#FF00001234", "#FF00"])
+    def test_invalid_color_is_a_usage_error(self, batch, tree, capsys, color):
+        batch, mock_remove = batch
+        src, out = tree
+
+        with pytest.raises(SystemExit) as excinfo:
+            batch.main([str(src), str(out), "--color", color])
+
+        assert excinfo.value.code == 2
+        assert "--color" in capsys.readouterr().err
+        mock_remove.assert_not_called()
+
+    @pytest.mark.parametrize("color", ["#ff0000", "FF0000", "#FF0000"])
+    def test_colors_are_normalized(self, batch, color):
+        batch, _ = batch
+
+        assert batch.hex_color(color) == "#FF0000"
+
+    def test_custom_background_needs_an_image(self, batch, tree):
+        batch, _ = batch
+        src, out = tree
+
+        with pytest.raises(SystemExit):
+            batch.main([str(src), str(out), "--background", "custom_image"])
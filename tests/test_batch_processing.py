@@ -2,7 +2,7 @@
 
 import zipfile
 from io import BytesIO
-from unittest.mock import MagicMock, patch
+from unittest.mock import ANY, MagicMock, patch
 
 
 class TestCreateZipArchive:
@@ -14,11 +14,9 @@ class TestCreateZipArchive:
         images_data = [("test.png", b"fake_image_data")]
         result = bg_remove.create_zip_archive(images_data)
 
-        assert isinstance(result, bytes)
-        assert len(result) > 0
-
-        # Verify it is a valid ZIP
-        zf = zipfile.ZipFile(BytesIO(result))
+        # Verify it is a valid ZIP, readable from the start of the file
+        assert result.tell() == 0
+        zf = zipfile.ZipFile(result)
         assert zf.namelist() == ["test.png"]
         assert zf.read("test.png") == b"fake_image_data"
 
@@ -32,7 +30,7 @@ class TestCreateZipArchive:
         ]
         result = bg_remove.create_zip_archive(images_data)
 
-        zf = zipfile.ZipFile(BytesIO(result))
+        zf = zipfile.ZipFile(result)
         assert len(zf.namelist()) == 3
         assert zf.read("image1.png") == b"data1"
         assert zf.read("image2.webp") == b"data2"
@@ -43,19 +41,216 @@ class TestCreateZipArchive:
 
         result = bg_remove.create_zip_archive([])
 
-        zf = zipfile.ZipFile(BytesIO(result))
+        zf = zipfile.ZipFile(result)
         assert zf.namelist() == []
 
-    def test_zip_uses_deflate_compression(self, mock_env):
+    def test_compressed_images_are_stored(self, mock_env):
         bg_remove = mock_env["module"]
 
-        images_data = [("test.png", b"x" * 1000)]
+        images_data = [(f"test.{ext}", b"x" * 1000) for ext in ("png", "webp", "JPG")]
         result = bg_remove.create_zip_archive(images_data)
 
-        zf = zipfile.ZipFile(BytesIO(result))
-        info = zf.getinfo("test.png")
+        zf = zipfile.ZipFile(result)
+        for info in zf.infolist():
+            assert info.compress_type == zipfile.ZIP_STORED
+            assert info.compress_size == 1000
+
+    def test_other_files_are_deflated(self, mock_env):
+        bg_remove = mock_env["module"]
+
+        result = bg_remove.create_zip_archive([("notes.txt", b"x" * 1000)])
+
+        info = zipfile.ZipFile(result).getinfo("notes.txt")
         assert info.compress_type == zipfile.ZIP_DEFLATED
 
+    def test_large_archives_spill_to_disk(self, mock_env):
+        bg_remove = mock_env["module"]
+
+        with patch.object(bg_remove, "ZIP_SPOOL_MAX_SIZE", 100):
+            result = bg_remove.create_zip_archive([("a.png", b"x" * 1000)])
+
+        assert result._rolled
+        assert zipfile.ZipFile(result).read("a.png") == b"x" * 1000
+
+    def test_writes_to_a_given_file(self, mock_env):
+        bg_remove = mock_env["module"]
+        output = BytesIO()
+
+        assert bg_remove.create_zip_archive([("a.png", b"data")], output) is output
+        assert zipfile.ZipFile(BytesIO(output.getvalue())).read("a.png") == b"data"
+
+
+class TestZipDownload:
+    """Tests for building the ZIP download only on request."""
+
+    RESULTS = [
+        ("img1", "res1", "a_rmbg.png", b"aaa"),
+        ("img2", "res2", "b_rmbg.png", b"bbbb"),
+    ]
+
+    def _display(self, bg_remove, prepare_clicked, results=RESULTS):
+        st = bg_remove.st
+        st.button.return_value = prepare_clicked
+        st.download_button.reset_mock()
+        with patch.object(
+            bg_remove, "create_zip_archive", wraps=bg_remove.create_zip_archive
+        ) as mock_zip:
+            bg_remove.display_batch_results(results, "PNG")
+        zip_downloads = [
+            c
+            for c in st.download_button.call_args_list
+            if c.kwargs.get("key") == "download_all_zip"
+        ]
+        return mock_zip, zip_downloads
+
+    def test_archive_is_not_built_until_requested(self, mock_env):
+        bg_remove = mock_env["module"]
+        bg_remove.st.session_state = {}
+
+        mock_zip, zip_downloads = self._display(bg_remove, prepare_clicked=False)
+
+        mock_zip.assert_not_called()
+        assert zip_downloads == []
+
+    def test_requested_archive_is_offered_while_the_batch_is_shown(self, mock_env):
+        bg_remove = mock_env["module"]
+        bg_remove.st.session_state = {}
+
+        _, zip_downloads = self._display(bg_remove, prepare_clicked=True)
+        assert len(zip_downloads) == 1
+        archive = zipfile.ZipFile(BytesIO(zip_downloads[0].args[1]))
+        assert archive.read("b_rmbg.png") == b"bbbb"
+
+        # Later reruns keep offering it without another click or another build
+        mock_zip, later_downloads = self._display(bg_remove, prepare_clicked=False)
+        mock_zip.assert_not_called()
+        assert later_downloads[0].args[1] is zip_downloads[0].args[1]
+
+    def test_changed_results_rebuild_the_archive(self, mock_env):
+        bg_remove = mock_env["module"]
+        bg_remove.st.session_state = {}
+        self._display(bg_remove, prepare_clicked=True)
+
+        # Same files, rendered with other settings
+        results = [(*result[:3], result[3].upper()) for result in self.RESULTS]
+        mock_zip, zip_downloads = self._display(
+            bg_remove, prepare_clicked=False, results=results
+        )
+
+        mock_zip.assert_called_once()
+        archive = zipfile.ZipFile(BytesIO(zip_downloads[0].args[1]))
+        assert archive.read("b_rmbg.png") == b"BBBB"
+
+    def test_new_batch_needs_a_new_request(self, mock_env):
+        bg_remove = mock_env["module"]
+        bg_remove.st.session_state = {
+            "zip_requested": ("old_rmbg.png",),
+            "batch_zip": ((("old_rmbg.png", b"old"),), b"archive"),
+        }
+
+        mock_zip, _ = self._display(bg_remove, prepare_clicked=False)
+
+        mock_zip.assert_not_called()
+        # The previous batch's archive is not kept in memory
+        assert "batch_zip" not in bg_remove.st.session_state
+
+
+class TestBatchGrid:
+    """Tests for the paginated thumbnail grid of batch results."""
+
+    RESULTS = [(f"img{i}", f"res{i}", f"{i}_rmbg.png", b"x" * i) for i in range(15)]
+    callbacks = {}
+
+    def _display(self, bg_remove, clicked=()):
+        """Render the grid with the buttons keyed in `clicked` pressed; returns the shown images and the cells.
+
+        As in Streamlit, the on_click callbacks of the pressed buttons (from the
+        previous render) run before the script does.
+        """
+        st = bg_remove.st
+        cells = []
+        for key in clicked:
+            if key in self.callbacks:
+                callback, args = self.callbacks[key]
+                callback(*args)
+        self.callbacks = {}
+        self.disabled = {}
+
+        def button(label, *args, key=None, **kwargs):
+            if "on_click" in kwargs:
+                self.callbacks[key] = (kwargs["on_click"], kwargs.get("args", ()))
+            self.disabled[key] = kwargs.get("disabled", False)
+            return key in clicked
+
+        def columns(spec):
+            new = [
+                MagicMock() for _ in range(spec if isinstance(spec, int) else len(spec))
+            ]
+            for cell in new:
+                cell.button.side_effect = button
+            cells.extend(new)
+            return new
+
+        st.button.side_effect = button
+        st.columns.side_effect = columns
+        with patch.object(bg_remove, "show_image") as mock_show:
+            bg_remove.display_batch_results(self.RESULTS, "PNG")
+        st.button.side_effect = st.columns.side_effect = None
+        return [c.args[1:] for c in mock_show.call_args_list], cells
+
+    def test_only_the_current_page_is_rendered(self, mock_env):
+        bg_remove = mock_env["module"]
+        bg_remove.st.session_state = {}
+
+        shown, cells = self._display(bg_remove)
+
+        assert shown == [(f"res{i}", bg_remove.THUMBNAIL_SIZE) for i in range(12)]
+        assert not any(c.download_button.called for c in cells)
+
+    def test_next_page(self, mock_env):
+        bg_remove = mock_env["module"]
+        bg_remove.st.session_state = {}
+        self._display(bg_remove)
+
+        shown, _ = self._display(bg_remove, clicked={"batch_next"})
+        assert [image for image, _ in shown] == ["res12", "res13", "res14"]
+        assert bg_remove.st.session_state["batch_page"] == 1
+        # The buttons are drawn for the new page in the same rerun
+        assert (self.disabled["batch_prev"], self.disabled["batch_next"]) == (
+            False,
+            True,
+        )
+
+        # The page is kept on later reruns, until a new batch is shown
+        shown, _ = self._display(bg_remove)
+        assert len(shown) == 3
+        shown, _ = self._display(bg_remove, clicked={"batch_prev"})
+        assert len(shown) == 12
+        assert self.disabled["batch_prev"]
+        self._display(bg_remove, clicked={"batch_next"})
+        bg_remove.st.session_state["batch_shown"] = ("other_rmbg.png",)
+        shown, _ = self._display(bg_remove)
+        assert len(shown) == 12
+
+    def test_opened_image_is_shown_in_full(self, mock_env):
+        bg_remove = mock_env["module"]
+        bg_remove.st.session_state = {}
+
+        shown, cells = self._display(bg_remove, clicked={"open_batch_3"})
+
+        assert shown[-2:] == [("img3",), ("res3",)]
+        downloads = [c for c in cells if c.download_button.called]
+        assert (
+            downloads[0].download_button.call_args.kwargs["key"] == "download_batch_3"
+        )
+
+        # Still open on the next rerun, until closed
+        shown, _ = self._display(bg_remove)
+        assert shown[-1] == ("res3",)
+        shown, _ = self._display(bg_remove, clicked={"close_batch"})
+        assert len(shown) == 12
+        assert bg_remove.st.session_state["batch_open"] is None
+
 
 class TestBatchSizeLimit:
     """Tests for batch processing limits."""
@@ -190,3 +385,160 @@ class TestFixImageBatch:
 
                             assert result is not None
                             mock_open.assert_called_with("./zebra.jpg", "rb")
+
+
+class TestProcessBatch:
+    """Tests for process_batch (batched inference + thread pool)."""
+
+    @staticmethod
+    def _sources(upload):
+        return (upload.encode(), f"{upload}.png")
+
+    @staticmethod
+    def _processed(image_bytes_list, **kwargs):
+        return [(b.decode(), f"fixed_{b.decode()}") for b in image_bytes_list]
+
+    def test_batch_constants_are_positive(self, mock_env):
+        bg_remove = mock_env["module"]
+        assert bg_remove.BATCH_WORKERS >= 1
+        assert bg_remove.INFERENCE_BATCH_SIZE >= 1
+
+    def test_segments_in_chunks_of_batch_size(self, mock_env):
+        bg_remove = mock_env["module"]
+
+        with patch.object(bg_remove, "read_upload", side_effect=self._sources):
+            with patch.object(bg_remove, "process_images", side_effect=self._processed) as mock_process:
+                with patch.object(bg_remove, "render_result", return_value=("r",)):
+                    bg_remove.process_batch(["a", "b", "c", "d", "e"], batch_size=2)
+
+        chunks = [call.args[0] for call in mock_process.call_args_list]
+        assert chunks == [(b"a", b"b"), (b"c", b"d"), (b"e",)]
+
+    def test_results_keep_input_order(self, mock_env):
+        bg_remove = mock_env["module"]
+        import time
+
+        uploads = ["a", "b", "c", "d"]
+
+        def slow_render(image, fixed, original_filename, **kwargs):
+            # Earlier uploads finish last
+            time.sleep(0.01 * (len(uploads) - uploads.index(image)))
+            return (image, fixed, original_filename, b"out")
+
+        with patch.object(bg_remove, "read_upload", side_effect=self._sources):
+            with patch.object(bg_remove, "process_images", side_effect=self._processed):
+                with patch.object(bg_remove, "render_result", side_effect=slow_render):
+                    results = bg_remove.process_batch(uploads, max_workers=4, batch_size=4)
+
+        assert [r[0] for r in results] == uploads
+        assert results[0][1] == "fixed_a"
+
+    def test_failure_is_isolated_per_image(self, mock_env):
+        bg_remove = mock_env["module"]
+
+        def read(upload):
+            return None if upload == "unreadable" else self._sources(upload)
+
+        def process(image_bytes_list, **kwargs):
+            return [(None, None) if b == b"rejected" else (b.decode(), "fixed") for b in image_bytes_list]
+
+        def render(image, fixed, original_filename, **kwargs):
+            if image == "bad":
+                raise RuntimeError("boom")
+            return (image, fixed, original_filename, b"ok")
+
+        with patch.object(bg_remove, "read_upload", side_effect=read):
+            with patch.object(bg_remove, "process_images", side_effect=process):
+                with patch.object(bg_remove, "render_result", side_effect=render):
+                    results = bg_remove.process_batch(
+                        ["good", "bad", "unreadable", "rejected", "fine"], max_workers=2
+                    )
+
+        assert results[0][0] == "good"
+        assert results[1] is None
+        assert results[2] is None
+        assert results[3] is None
+        assert results[4][0] == "fine"
+
+    def test_progress_reports_each_finished_image(self, mock_env):
+        bg_remove = mock_env["module"]
+        progress = []
+
+        with patch.object(bg_remove, "read_upload", side_effect=self._sources):
+            with patch.object(bg_remove, "process_images", side_effect=self._processed):
+                with patch.object(bg_remove, "render_result", return_value=("r",)):
+                    bg_remove.process_batch(
+                        ["a", "b", "c"],
+                        batch_size=2,
+                        on_progress=lambda done, total: progress.append((done, total)),
+                    )
+
+        assert progress == [(1, 3), (2, 3), (3, 3)]
+
+    def test_forwards_output_options(self, mock_env):
+        bg_remove = mock_env["module"]
+        custom_bg = MagicMock()
+
+        with patch.object(bg_remove, "read_upload", side_effect=self._sources):
+            with patch.object(bg_remove, "process_images", side_effect=self._processed):
+                with patch.object(bg_remove, "render_result", return_value=("r",)) as mock_render:
+                    bg_remove.process_batch(
+                        ["a"],
+                        output_format="WEBP",
+                        bg_mode="custom_image",
+                        bg_custom_image=custom_bg,
+                    )
+
+        # The shared background is decoded once before fan-out
+        custom_bg.load.assert_called_once()
+        mock_render.assert_called_once_with(
+            "a",
+            "fixed_a",
+            "a.png",
+            stages=ANY,
+            source=bg_remove.source_key(b"a"),
+            output_format="WEBP",
+            bg_mode="custom_image",
+            bg_custom_image=custom_bg,
+        )
+
+    def test_empty_batch_returns_empty_list(self, mock_env):
+        bg_remove = mock_env["module"]
+        assert bg_remove.process_batch([]) == []
+
+
+class TestProcessImages:
+    """Tests for the batched process_images function."""
+
+    def test_runs_one_segmentation_pass_for_valid_images(self, mock_env):
+        bg_remove = mock_env["module"]
+
+        def load(image_bytes, stages=None, source=None, full_resolution=False):
+            if image_bytes == b"bad":
+                return None, None
+            return f"orig_{image_bytes.decode()}", f"resized_{image_bytes.decode()}"
+
+        with patch.object(bg_remove, "load_image", side_effect=load), \
+             patch.object(bg_remove, "apply_mask", side_effect=lambda img, mask, source_image=None: f"cut_{img}"), \
+             patch.object(
+                 bg_remove, "compute_masks", side_effect=lambda keys, images, model_name: [f"mask_{i}" for i in images]
+             ) as mock_compute:
+            results = bg_remove.process_images((b"a", b"bad", b"c"))
+
+        mock_compute.assert_called_once_with((b"a", b"c"), ["resized_a", "resized_c"], bg_remove.MODEL_NAME)
+        assert results == [
+            ("orig_a", "cut_resized_a"),
+            (None, None),
+            ("orig_c", "cut_resized_c"),
+        ]
+
+    def test_inference_failure_rejects_the_whole_chunk(self, mock_env):
+        bg_remove = mock_env["module"]
+        mock_st = mock_env["st"]
+
+        with patch.object(bg_remove, "load_image", return_value=("orig", "resized")):
+            with patch.object(bg_remove, "compute_masks", side_effect=RuntimeError("onnx")):
+                results = bg_remove.process_images((b"a", b"b"))
+
+        assert results == [(None, None), (None, None)]
+        mock_st.error.assert_called_with("An error occurred while processing the images. Please try again.")
@@ -0,0 +1,83 @@
+"""Tests for the reduced-scale blur engine."""
+
+from unittest.mock import MagicMock, patch
+
+
+class TestPyramidBlur:
+    """Tests for pyramid_blur scale selection."""
+
+    def test_reduction_factor_grows_with_radius(self, mock_env):
+        from bg_remove_core.blur import reduction_factor
+
+        assert reduction_factor(5) == 1
+        assert reduction_factor(6) == 2
+        assert reduction_factor(15) == 5
+        assert reduction_factor(50) == 16
+
+    def test_small_radius_blurs_at_full_size(self, mock_env):
+        from bg_remove_core import blur
+
+        image = MagicMock()
+        resized = image.resize.return_value
+
+        result = blur.pyramid_blur(image, (200, 100), 5)
+
+        image.resize.assert_called_once_with((200, 100), blur.Image.BICUBIC)
+        blur.ImageFilter.GaussianBlur.assert_called_with(radius=5)
+        assert result is resized.filter.return_value
+
+    def test_large_radius_blurs_reduced_image(self, mock_env):
+        from bg_remove_core import blur
+
+        image = MagicMock()
+        reduced = image.resize.return_value
+        blurred = reduced.filter.return_value
+
+        result = blur.pyramid_blur(image, (2000, 1000), 30)
+
+        # Factor 10: reduce to 200x100, blur there, upsample back
+        image.resize.assert_called_once_with(
+            (200, 100), blur.Image.BILINEAR, reducing_gap=2.0
+        )
+        radius = blur.ImageFilter.GaussianBlur.call_args.kwargs["radius"]
+        assert 2.9 < radius < 3.0
+        blurred.resize.assert_called_once_with((2000, 1000), blur.Image.BILINEAR)
+        assert result is blurred.resize.return_value
+
+
+class TestBackgroundStage:
+    """Tests for memoizing blurred backgrounds per (image, radius, size)."""
+
+    def test_revisited_radius_reuses_blur(self, mock_env):
+        bg_remove = mock_env["module"]
+        from bg_remove_core.pipeline import StageCache
+
+        stages = StageCache(max_bytes=1 << 20)
+        fixed = MagicMock()
+        fixed.size = (200, 100)
+
+        with (
+            patch.object(
+                bg_remove,
+                "pyramid_blur",
+                side_effect=lambda img, size, r: f"blur_{r}".encode(),
+            ) as mock_blur,
+            patch.object(
+                bg_remove, "apply_background_replacement", return_value=b"composite"
+            ),
+            patch.object(bg_remove, "convert_image_to_format", return_value=b"bytes"),
+        ):
+            for radius, output_format in ((15, "PNG"), (30, "PNG"), (15, "JPEG")):
+                bg_remove.render_result(
+                    "orig",
+                    fixed,
+                    "photo.png",
+                    output_format=output_format,
+                    bg_mode="blur",
+                    bg_blur_radius=radius,
+                    stages=stages,
+                    source="src",
+                )
+
+        assert [c.args[2] for c in mock_blur.call_args_list] == [15, 30]
+        assert stages.stats()["background"] == {"hits": 1, "misses": 2}
@@ -0,0 +1,202 @@
+"""Tests for the screen-sized display renditions."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+
+class FakeImage:
+    """Stands in for a PIL image: weakly referenceable, with a size and bands."""
+
+    size = (2000, 1500)
+    width, height = size
+
+    def getbands(self):
+        return ("R", "G", "B")
+
+
+@pytest.fixture
+def stages(mock_env):
+    from bg_remove_core.pipeline import StageCache
+
+    return StageCache(max_bytes=1 << 20)
+
+
+class TestMakeRendition:
+    """Tests for the rendition format choice."""
+
+    def make(self, small):
+        from bg_remove_core import processing
+
+        image = MagicMock(size=(800, 600))
+        with patch.object(
+            processing, "resize_image", return_value=small
+        ) as mock_resize:
+            rendition = processing.make_rendition(image)
+        mock_resize.assert_called_once_with(image, processing.DISPLAY_MAX_SIZE)
+        return rendition
+
+    def test_opaque_images_are_jpeg(self, mock_env):
+        small = MagicMock(mode="RGB", info={})
+
+        _, image_format = self.make(small)
+
+        assert image_format == "JPEG"
+        _, kwargs = small.convert.return_value.save.call_args
+        assert kwargs == {"format": "JPEG", "quality": 85}
+
+    def test_transparent_images_are_palette_png(self, mock_env):
+        small = MagicMock(mode="RGBA", info={})
+        rgba = small.convert.return_value
+        rgba.getchannel.return_value.getextrema.return_value = (0, 255)
+
+        _, image_format = self.make(small)
+
+        assert image_format == "PNG"
+        rgba.quantize.assert_called_once()
+        assert rgba.quantize.call_args.args == (256,)
+
+    def test_fully_opaque_alpha_is_jpeg(self, mock_env):
+        small = MagicMock(mode="RGBA", info={})
+        rgba = small.convert.return_value
+        rgba.getchannel.return_value.getextrema.return_value = (255, 255)
+
+        _, image_format = self.make(small)
+
+        assert image_format == "JPEG"
+        rgba.quantize.assert_not_called()
+
+    def test_large_images_are_reduced_before_resizing(self, mock_env):
+        from bg_remove_core import processing
+
+        image = MagicMock(size=(2000, 1330))
+        with patch.object(processing, "resize_image") as mock_resize:
+            processing.make_rendition(image, 240)
+
+        image.reduce.assert_called_once_with(8)
+        mock_resize.assert_called_once_with(image.reduce.return_value, 240)
+
+
+class TestDisplayRendition:
+    """Tests for memoizing renditions across reruns."""
+
+    def test_rendition_is_made_once_per_image(self, mock_env, stages):
+        bg_remove = mock_env["module"]
+        image = FakeImage()
+
+        with patch.object(
+            bg_remove, "make_rendition", return_value=(b"jpeg", "JPEG")
+        ) as mock_make:
+            for _ in range(3):
+                assert bg_remove.display_rendition(image, stages) == (b"jpeg", "JPEG")
+
+        mock_make.assert_called_once_with(image, bg_remove.DISPLAY_MAX_SIZE)
+        assert stages.stats()["display"] == {"hits": 2, "misses": 1}
+
+    def test_each_size_has_its_own_rendition(self, mock_env, stages):
+        bg_remove = mock_env["module"]
+        image = FakeImage()
+
+        with patch.object(
+            bg_remove, "make_rendition", return_value=(b"jpeg", "JPEG")
+        ) as mock_make:
+            bg_remove.display_rendition(image, stages)
+            bg_remove.display_rendition(image, stages, max_size=240)
+
+        assert [c.args[1] for c in mock_make.call_args_list] == [1000, 240]
+
+    def test_recycled_id_is_not_served_another_images_rendition(self, mock_env, stages):
+        bg_remove = mock_env["module"]
+        image = FakeImage()
+        with patch.object(bg_remove, "make_rendition", return_value=(b"old", "JPEG")):
+            bg_remove.display_rendition(image, stages)
+        # Same id, but the image it was made for is gone
+        key = (id(image), bg_remove.DISPLAY_MAX_SIZE)
+        stale = stages.get("display", key)
+        stages.put("display", key, (lambda: None,) + stale[1:])
+
+        with patch.object(
+            bg_remove, "make_rendition", return_value=(b"new", "JPEG")
+        ) as mock_make:
+            assert bg_remove.display_rendition(image, stages) == (b"new", "JPEG")
+
+        mock_make.assert_called_once()
+
+    def test_original_rendition_is_made_once_per_upload(self, mock_env, stages):
+        bg_remove = mock_env["module"]
+        from bg_remove_core.pipeline import LazyOriginal
+
+        decode = MagicMock(return_value=FakeImage())
+
+        with patch.object(
+            bg_remove, "make_rendition", return_value=(b"jpeg", "JPEG")
+        ) as mock_make:
+            # Every script run loads a new LazyOriginal of the same upload
+            for _ in range(3):
+                original = LazyOriginal(decode, "src", full_resolution=True)
+                assert bg_remove.display_rendition(original, stages) == (
+                    b"jpeg",
+                    "JPEG",
+                )
+            bg_remove.display_rendition(LazyOriginal(decode, "src"), stages)
+
+        # Decoded at full size once, then at working size for the other key
+        assert decode.call_count == 2
+        assert mock_make.call_count == 2
+        assert stages.stats()["display"] == {"hits": 2, "misses": 2}
+
+    def test_undecodable_original_has_no_rendition(self, mock_env, stages):
+        bg_remove = mock_env["module"]
+        from bg_remove_core.pipeline import LazyOriginal
+
+        container = MagicMock()
+        with patch.object(bg_remove, "get_stage_cache", return_value=stages):
+            bg_remove.show_image(container, LazyOriginal(lambda: None, "src"))
+
+        container.image.assert_not_called()
+
+
+class TestShowImage:
+    """Tests for showing images through their renditions."""
+
+    def test_images_are_shown_as_rendition_bytes(self, mock_env, stages):
+        bg_remove = mock_env["module"]
+        container = MagicMock()
+
+        with (
+            patch.object(bg_remove, "get_stage_cache", return_value=stages),
+            patch.object(bg_remove, "make_rendition", return_value=(b"png", "PNG")),
+        ):
+            bg_remove.show_image(container, FakeImage())
+
+        container.image.assert_called_once_with(
+            b"png", output_format="PNG", use_container_width=True
+        )
+
+    @pytest.mark.parametrize("image", [b"raw bytes", "./zebra.jpg"])
+    def test_other_inputs_are_passed_through(self, mock_env, image):
+        bg_remove = mock_env["module"]
+        container = MagicMock()
+
+        with patch.object(bg_remove, "make_rendition") as mock_make:
+            bg_remove.show_image(container, image)
+
+        mock_make.assert_not_called()
+        container.image.assert_called_once_with(image, use_container_width=True)
+
+    def test_results_are_displayed_through_renditions(self, mock_env, stages):
+        bg_remove = mock_env["module"]
+        original, result = FakeImage(), FakeImage()
+
+        with (
+            patch.object(bg_remove, "get_stage_cache", return_value=stages),
+            patch.object(
+                bg_remove, "make_rendition", return_value=(b"jpeg", "JPEG")
+            ) as mock_make,
+        ):
+            bg_remove.display_single_result(original, result, "out.png", b"full", "PNG")
+
+        assert [c.args[0] for c in mock_make.call_args_list] == [original, result]
+        mock_env["col2"].image.assert_called_once_with(
+            b"jpeg", output_format="JPEG", use_container_width=True
+        )
@@ -26,6 +26,7 @@ mock_st.session_state = {} # Initialize session state
 
 sys.modules['streamlit'] = mock_st
 sys.modules['rembg'] = MagicMock()
+sys.modules['onnxruntime'] = MagicMock()
 sys.modules['numpy'] = MagicMock()
 
 # Setup Image mock
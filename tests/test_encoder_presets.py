@@ -0,0 +1,126 @@
+"""Tests for the encoder presets."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from bg_remove_core.encoding import (
+    DEFAULT_ENCODER_PRESET,
+    ENCODER_PRESET_LABELS,
+    ENCODER_PRESETS,
+    encoder_preset,
+    save_options,
+)
+
+
+class TestPresets:
+    """Tests for the preset table."""
+
+    def test_every_preset_covers_every_format(self):
+        for preset in ENCODER_PRESETS.values():
+            assert set(preset) == {"PNG", "WEBP", "JPEG"}
+        assert set(ENCODER_PRESET_LABELS) == set(ENCODER_PRESETS)
+
+    def test_presets_do_not_change_quality(self):
+        for output_format in ("WEBP", "JPEG"):
+            qualities = {
+                save_options(output_format, preset)["quality"]
+                for preset in ENCODER_PRESETS
+            }
+            assert len(qualities) == 1
+
+    def test_balanced_keeps_the_previous_settings(self):
+        assert DEFAULT_ENCODER_PRESET == "balanced"
+        assert save_options("PNG")["compress_level"] == 6
+        assert save_options("WEBP") == {"quality": 90, "lossless": False, "method": 4}
+        assert save_options("JPEG")["quality"] == 95
+
+    def test_speed_and_size_settings(self):
+        assert save_options("PNG", "fast")["compress_level"] == 1
+        assert save_options("PNG", "smallest") == {
+            "compress_level": 9,
+            "optimize": True,
+        }
+        assert save_options("WEBP", "fast")["method"] == 0
+        assert save_options("WEBP", "smallest")["method"] == 6
+        smallest_jpeg = save_options("JPEG", "smallest")
+        assert smallest_jpeg["progressive"] and smallest_jpeg["optimize"]
+
+    def test_options_are_copies(self):
+        save_options("PNG", "fast")["compress_level"] = 9
+        assert ENCODER_PRESETS["fast"]["PNG"]["compress_level"] == 1
+
+    def test_unknown_preset(self):
+        with pytest.raises(ValueError, match="Known presets: fast, balanced, smallest"):
+            encoder_preset("ultra")
+
+
+class TestConvertWithPreset:
+    """Tests for convert_image_to_format with a preset."""
+
+    @pytest.mark.parametrize("output_format", ["PNG", "WEBP"])
+    def test_preset_options_are_passed_to_save(self, mock_env, output_format):
+        bg_remove = mock_env["module"]
+        img = MagicMock(mode="RGBA", info={})
+
+        bg_remove.convert_image_to_format(img, output_format, "smallest")
+
+        _, kwargs = img.save.call_args
+        assert kwargs == dict(
+            format=output_format, **save_options(output_format, "smallest")
+        )
+
+    def test_jpeg_preset(self, mock_env):
+        bg_remove = mock_env["module"]
+        img = MagicMock(mode="RGB", info={})
+
+        bg_remove.convert_image_to_format(img, "JPEG", "fast")
+
+        _, kwargs = img.save.call_args
+        assert kwargs["subsampling"] == "4:2:0"
+        assert "progressive" not in kwargs
+
+    def test_preset_change_only_reencodes(self, mock_env):
+        bg_remove = mock_env["module"]
+        from bg_remove_core.pipeline import StageCache
+
+        stages = StageCache(max_bytes=1 << 20)
+        with (
+            patch.object(
+                bg_remove, "apply_background_replacement", return_value=b"composite"
+            ) as mock_composite,
+            patch.object(
+                bg_remove, "convert_image_to_format", return_value=b"bytes"
+            ) as mock_encode,
+        ):
+            for preset in ("fast", "smallest", "fast"):
+                bg_remove.render_result(
+                    "orig",
+                    "fixed",
+                    "photo.png",
+                    stages=stages,
+                    source="src",
+                    bg_mode="solid_color",
+                    bg_color="#FF0000",
+                    encoder_preset=preset,
+                )
+
+        assert mock_composite.call_count == 1
+        assert [c.args[2] for c in mock_encode.call_args_list] == ["fast", "smallest"]
+
+    def test_remove_background_uses_the_preset(self, mock_env):
+        from bg_remove_core import processing
+
+        with (
+            patch.object(processing, "open_image"),
+            patch.object(processing, "resize_image"),
+            patch.object(processing, "segment_masks", return_value=["mask"]),
+            patch.object(processing, "cutout_with_mask"),
+            patch.object(processing, "apply_background_replacement") as mock_bg,
+            patch.object(
+                processing, "convert_image_to_format", return_value=b"out"
+            ) as mock_encode,
+        ):
+            processing.remove_background(b"data", "WEBP", encoder_preset="fast")
+
+        mock_encode.assert_called_once_with(mock_bg.return_value, "WEBP", "fast")
@@ -31,6 +31,7 @@ sys.modules['PIL.Image'] = mock_image_module
 # Import the module
 sys.path.append(os.path.abspath(os.path.dirname(__file__) + '/../'))
 import bg_remove  # noqa: E402
+from bg_remove_core import processing  # noqa: E402
 
 def test_process_image_validates_format_success():
     """Test that process_image accepts valid formats (PNG, JPEG)."""
@@ -44,7 +45,7 @@ def test_process_image_validates_format_success():
 
     with patch.object(bg_remove.Image, "open", return_value=mock_img):
         # We also need to mock remove to return something
-        with patch("bg_remove.remove", return_value=MagicMock()):
+        with patch.object(processing, "remove", return_value=MagicMock()):
              img, fixed = bg_remove.process_image(b"fake_bytes")
              assert img is not None
              assert fixed is not None
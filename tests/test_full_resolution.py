@@ -0,0 +1,106 @@
+"""Tests for full-resolution output via mask upsampling."""
+
+from unittest.mock import MagicMock, patch
+
+
+class TestUpsampleMask:
+    """Tests for the guided mask upsampling entry point."""
+
+    def test_mask_at_source_size_is_returned_as_is(self, mock_env):
+        from bg_remove_core.refine import upsample_mask
+
+        mask = MagicMock()
+        mask.size = (800, 600)
+        image = MagicMock()
+        image.size = (800, 600)
+
+        assert upsample_mask(mask, image, image) is mask
+
+
+class TestFullResolutionCutout:
+    """Tests for cutting out the source instead of the working image."""
+
+    def test_apply_mask_cuts_out_source_with_upsampled_mask(self, mock_env):
+        from bg_remove_core import processing
+
+        bg_remove = mock_env["module"]
+        compact_mask = MagicMock()
+
+        with (
+            patch.object(
+                processing, "upsample_mask", return_value="full_mask"
+            ) as mock_upsample,
+            patch.object(processing, "cutout", return_value="cut") as mock_cutout,
+        ):
+            result = bg_remove.apply_mask("working", compact_mask, "source")
+
+        mock_upsample.assert_called_once_with(
+            compact_mask.to_image.return_value, "working", "source"
+        )
+        mock_cutout.assert_called_once_with("source", "full_mask")
+        assert result == "cut"
+
+    def test_apply_mask_defaults_to_working_size(self, mock_env):
+        from bg_remove_core import processing
+
+        bg_remove = mock_env["module"]
+        compact_mask = MagicMock()
+
+        with (
+            patch.object(processing, "upsample_mask") as mock_upsample,
+            patch.object(processing, "cutout", return_value="cut") as mock_cutout,
+        ):
+            bg_remove.apply_mask("working", compact_mask)
+
+        mock_upsample.assert_not_called()
+        mock_cutout.assert_called_once_with(
+            "working", compact_mask.to_image.return_value
+        )
+
+    def test_process_image_passes_exif_corrected_source(self, mock_env):
+        bg_remove = mock_env["module"]
+
+        with (
+            patch.object(bg_remove, "load_image", return_value=("orig", "working")),
+            patch.object(
+                bg_remove, "compute_masks", return_value=["mask"]
+            ) as mock_compute,
+            patch.object(bg_remove, "apply_mask", return_value="cut") as mock_apply,
+            patch.object(
+                bg_remove.ImageOps, "exif_transpose", return_value="source"
+            ) as mock_transpose,
+        ):
+            image, fixed = bg_remove.process_image(b"img", full_resolution=True)
+
+        # The model still runs on the working image
+        mock_compute.assert_called_once_with(
+            (b"img",), ["working"], bg_remove.MODEL_NAME
+        )
+        mock_transpose.assert_called_once_with("orig")
+        mock_apply.assert_called_once_with("working", "mask", "source")
+        assert (image, fixed) == ("orig", "cut")
+
+    def test_output_sizes_have_separate_stage_keys(self, mock_env):
+        bg_remove = mock_env["module"]
+
+        assert bg_remove.segment_key("src") != bg_remove.segment_key(
+            "src", full_resolution=True
+        )
+
+    def test_batch_forwards_full_resolution(self, mock_env):
+        bg_remove = mock_env["module"]
+
+        with (
+            patch.object(bg_remove, "read_upload", return_value=(b"img", "photo.png")),
+            patch.object(
+                bg_remove, "process_images", return_value=[("orig", "cut")]
+            ) as mock_process,
+            patch.object(
+                bg_remove, "render_result", return_value="result"
+            ) as mock_render,
+        ):
+            results = bg_remove.process_batch(["upload"], full_resolution=True)
+
+        assert mock_process.call_args.kwargs["full_resolution"] is True
+        assert mock_render.call_args.kwargs["full_resolution"] is True
+        assert results == ["result"]
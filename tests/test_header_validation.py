@@ -0,0 +1,193 @@
+"""Tests for header-only upload validation and the rejected uploads cache."""
+
+import struct
+from unittest.mock import MagicMock, patch
+
+
+def _png(width, height):
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + struct.pack(">I4sII", 13, b"IHDR", width, height)
+        + b"\x08\x06\x00\x00\x00"
+    )
+
+
+def _segment(marker, payload):
+    return bytes((0xFF, marker)) + struct.pack(">H", len(payload) + 2) + payload
+
+
+def _jpeg(width, height, sof=0xC0):
+    return (
+        b"\xff\xd8"
+        + _segment(0xE0, b"JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00")
+        + _segment(0xE1, b"Exif\x00\x00" + b"\x00" * 5000)
+        + _segment(0xDB, b"\x00" * 65)
+        + b"\xff"  # Fill byte
+        + _segment(sof, struct.pack(">BHHB", 8, height, width, 3) + b"\x01\x22\x00" * 3)
+        + _segment(0xDA, b"\x00" * 10)
+    )
+
+
+def _upload(data, name="photo.jpg"):
+    upload = MagicMock()
+    upload.name = name
+    upload.size = len(data)
+    upload.getbuffer.return_value = memoryview(data)
+    upload.getvalue.return_value = data
+    return upload
+
+
+class TestSniffImage:
+    """Tests for reading format and size from image headers."""
+
+    def test_png(self, mock_env):
+        from bg_remove_core.validation import sniff_image
+
+        assert sniff_image(_png(640, 480)) == ("PNG", (640, 480))
+
+    def test_jpeg_skips_metadata_segments(self, mock_env):
+        from bg_remove_core.validation import sniff_image
+
+        assert sniff_image(_jpeg(6000, 4000)) == ("JPEG", (6000, 4000))
+        assert sniff_image(memoryview(_jpeg(800, 600, sof=0xC2))) == (
+            "JPEG",
+            (800, 600),
+        )
+
+    def test_jpeg_without_frame_header_has_unknown_size(self, mock_env):
+        from bg_remove_core.validation import sniff_image
+
+        assert sniff_image(b"\xff\xd8" + _segment(0xDA, b"\x00" * 4)) == ("JPEG", None)
+        assert sniff_image(_jpeg(800, 600)[:100]) == ("JPEG", None)
+
+    def test_other_formats(self, mock_env):
+        from bg_remove_core.validation import sniff_image
+
+        assert sniff_image(b"GIF89a" + b"\x00" * 20) == (None, None)
+        assert sniff_image(b"") == (None, None)
+
+
+class TestValidateUploadHeader:
+    """Tests for rejecting uploads before they are read in full."""
+
+    def test_rejects_unsupported_format_without_reading(self, mock_env):
+        bg_remove = mock_env["module"]
+        upload = _upload(b"GIF89a" + b"\x00" * 100, "anim.gif")
+
+        is_valid, error_msg = bg_remove.validate_uploaded_file(upload)
+
+        assert is_valid is False
+        assert "anim.gif" in error_msg and "PNG or JPEG" in error_msg
+        upload.getvalue.assert_not_called()
+
+    def test_rejects_oversized_dimensions_from_header(self, mock_env):
+        bg_remove = mock_env["module"]
+
+        is_valid, error_msg = bg_remove.validate_uploaded_file(
+            _upload(_jpeg(8000, 4000))
+        )
+
+        assert is_valid is False
+        assert "8000x4000" in error_msg
+
+    def test_accepts_valid_headers(self, mock_env):
+        bg_remove = mock_env["module"]
+
+        assert bg_remove.validate_uploaded_file(_upload(_jpeg(6000, 4000))) == (
+            True,
+            None,
+        )
+        assert bg_remove.validate_uploaded_file(_upload(_png(100, 100), "a.png")) == (
+            True,
+            None,
+        )
+
+
+class TestRejectedUploads:
+    """Tests for negatively caching uploads that failed to decode."""
+
+    def test_bounded_lru(self, mock_env):
+        from bg_remove_core.validation import RejectedUploads
+
+        rejected = RejectedUploads(max_entries=2)
+        rejected.add("a", "bad a")
+        rejected.add("b", "bad b")
+        rejected.get("a")
+        rejected.add("c", "bad c")
+
+        assert rejected.get("a") == "bad a"
+        assert rejected.get("b") is None
+        assert len(rejected) == 2
+
+    def test_corrupt_upload_is_remembered(self, mock_env):
+        bg_remove = mock_env["module"]
+        from bg_remove_core.validation import RejectedUploads
+
+        rejected = RejectedUploads()
+        data = _jpeg(800, 600)
+        key = bg_remove.source_key(data)
+        image = mock_env["image_module"].open.return_value
+        image.format = "JPEG"
+        image.width, image.height = 800, 600
+        image.load.side_effect = OSError("image file is truncated")
+
+        with patch.object(bg_remove, "get_rejected_uploads", return_value=rejected):
+            assert bg_remove.decode_image(data, source=key) is None
+            assert bg_remove.previous_rejection(_upload(data)) == rejected.get(key)
+
+        assert "corrupt" in rejected.get(key)
+
+    def test_uploads_are_checked_once_per_session(self, mock_env):
+        bg_remove = mock_env["module"]
+        from bg_remove_core.validation import RejectedUploads
+
+        bg_remove.st.session_state.clear()
+        good, bad = _upload(_png(100, 100), "a.png"), _upload(b"GIF89a", "b.png")
+        good.file_id, bad.file_id = "a", "b"
+
+        with patch.object(
+            bg_remove, "get_rejected_uploads", return_value=RejectedUploads()
+        ):
+            with patch.object(
+                bg_remove, "source_key", wraps=bg_remove.source_key
+            ) as mock_key:
+                first = bg_remove.upload_errors([good, bad])
+                assert bg_remove.upload_errors([good, bad]) == first
+
+        assert first[0] is None and first[1] is not None
+        assert mock_key.call_count == 1
+        assert good.getvalue.call_count == 1
+        assert bad.getbuffer.call_count == 1
+
+    def test_failed_decode_rechecks_uploads(self, mock_env):
+        bg_remove = mock_env["module"]
+        from bg_remove_core.validation import RejectedUploads
+
+        bg_remove.st.session_state.clear()
+        rejected = RejectedUploads()
+        data = _jpeg(800, 600)
+        upload = _upload(data)
+        upload.file_id = "a"
+        upload.getbuffer.side_effect = lambda: memoryview(data)
+        mock_env["image_module"].open.side_effect = OSError(
+            "cannot identify image file"
+        )
+
+        with patch.object(bg_remove, "get_rejected_uploads", return_value=rejected):
+            assert bg_remove.upload_errors([upload]) == [None]
+            bg_remove.decode_image(data, source=bg_remove.source_key(data))
+            error = rejected.get(bg_remove.source_key(data))
+            assert error is not None
+            assert bg_remove.upload_errors([upload]) == [error]
+
+    def test_transient_errors_are_not_remembered(self, mock_env):
+        bg_remove = mock_env["module"]
+        from bg_remove_core.validation import RejectedUploads
+
+        rejected = RejectedUploads()
+        mock_env["image_module"].open.side_effect = MemoryError()
+
+        with patch.object(bg_remove, "get_rejected_uploads", return_value=rejected):
+            assert bg_remove.decode_image(b"data", source="key") is None
+
+        assert len(rejected) == 0
@@ -0,0 +1,78 @@
+"""Tests for decoding large JPEGs at a reduced DCT scale."""
+
+from unittest.mock import MagicMock, patch
+
+
+def _image(fmt, size):
+    image = MagicMock()
+    image.format = fmt
+    image.mode = "RGB"
+    image.size = size
+    image.width, image.height = size
+    return image
+
+
+class TestDraftDecode:
+    """Tests for decode_image draft mode."""
+
+    def test_jpeg_is_drafted_to_cover_working_size(self, mock_env):
+        bg_remove = mock_env["module"]
+        image = _image("JPEG", (6000, 4000))
+        order = []
+        image.draft.side_effect = lambda *a: order.append("draft")
+        image.load.side_effect = lambda: order.append("load")
+
+        with patch.object(mock_env["image_module"], "open", return_value=image):
+            assert bg_remove.decode_image(b"jpeg", max_size=2000) is image
+
+        image.draft.assert_called_once_with("RGB", (2000, 1333))
+        assert order == ["draft", "load"]
+
+    def test_png_is_decoded_at_full_size(self, mock_env):
+        bg_remove = mock_env["module"]
+        image = _image("PNG", (6000, 4000))
+
+        with patch.object(mock_env["image_module"], "open", return_value=image):
+            bg_remove.decode_image(b"png", max_size=2000)
+
+        image.draft.assert_not_called()
+
+    def test_no_draft_without_max_size(self, mock_env):
+        bg_remove = mock_env["module"]
+        image = _image("JPEG", (6000, 4000))
+
+        with patch.object(mock_env["image_module"], "open", return_value=image):
+            bg_remove.decode_image(b"jpeg")
+
+        image.draft.assert_not_called()
+
+    def test_oversized_jpeg_is_rejected_before_decoding(self, mock_env):
+        bg_remove = mock_env["module"]
+        image = _image("JPEG", (7000, 7000))
+
+        with patch.object(mock_env["image_module"], "open", return_value=image):
+            assert bg_remove.decode_image(b"jpeg", max_size=2000) is None
+
+        image.draft.assert_not_called()
+        image.load.assert_not_called()
+
+    def test_full_resolution_keeps_full_decode(self, mock_env):
+        bg_remove = mock_env["module"]
+        from bg_remove_core.pipeline import StageCache
+
+        stages = StageCache(max_bytes=1 << 20)
+        with patch.object(bg_remove, "decode_image", return_value=None) as mock_decode:
+            bg_remove.load_image(b"img", stages, "src")
+            bg_remove.load_image(b"img", stages, "src", full_resolution=True)
+
+        assert [c.args[1] for c in mock_decode.call_args_list] == [
+            bg_remove.MAX_IMAGE_SIZE,
+            None,
+        ]
+
+    def test_working_size(self, mock_env):
+        from bg_remove_core.processing import working_size
+
+        assert working_size((6000, 4000), 2000) == (2000, 1333)
+        assert working_size((1000, 5000), 2000) == (400, 2000)
+        assert working_size((800, 600), 2000) == (800, 600)
@@ -0,0 +1,216 @@
+"""Tests for the persistent on-disk mask cache."""
+
+import os
+import time
+from unittest.mock import MagicMock, patch
+
+
+def _mask(payload):
+    mask = MagicMock()
+    mask.save.side_effect = lambda buf, **kwargs: buf.write(payload)
+    return mask
+
+
+class TestMakeKey:
+    """Tests for content-addressed cache keys."""
+
+    def test_key_is_stable(self, mock_env):
+        from bg_remove_core.mask_cache import make_key
+
+        assert make_key(b"img", "u2net", 2000) == make_key(b"img", "u2net", 2000)
+
+    def test_key_changes_with_content_and_params(self, mock_env):
+        from bg_remove_core.mask_cache import make_key
+
+        base = make_key(b"img", "u2net", "rembg-2.0.55", 2000)
+        assert make_key(b"other", "u2net", "rembg-2.0.55", 2000) != base
+        assert make_key(b"img", "u2netp", "rembg-2.0.55", 2000) != base
+        assert make_key(b"img", "u2net", "rembg-2.0.56", 2000) != base
+        assert make_key(b"img", "u2net", "rembg-2.0.55", 1000) != base
+
+
+class TestDiskMaskCache:
+    """Tests for DiskMaskCache storage and eviction."""
+
+    def test_miss_returns_none(self, mock_env, tmp_path):
+        from bg_remove_core.mask_cache import DiskMaskCache
+
+        cache = DiskMaskCache(str(tmp_path), max_bytes=1024)
+        assert cache.get("ab" * 32) is None
+
+    def test_put_then_get(self, mock_env, tmp_path):
+        from bg_remove_core.mask_cache import DiskMaskCache
+
+        image_module = mock_env["image_module"]
+        cache = DiskMaskCache(str(tmp_path), max_bytes=1024)
+        key = "cd" * 32
+
+        cache.put(key, _mask(b"png-data"))
+        stored = cache.get(key)
+
+        path = tmp_path / key[:2] / f"{key}.png"
+        assert path.read_bytes() == b"png-data"
+        assert stored is image_module.open.return_value
+        stored.load.assert_called()
+        # No temporary files are left behind by the atomic write
+        assert [p.name for p in path.parent.iterdir()] == [f"{key}.png"]
+
+    def test_failed_write_leaves_no_partial_file(self, mock_env, tmp_path):
+        from bg_remove_core.mask_cache import DiskMaskCache
+
+        cache = DiskMaskCache(str(tmp_path), max_bytes=1024)
+        key = "ef" * 32
+
+        with patch("os.replace", side_effect=OSError("disk full")):
+            try:
+                cache.put(key, _mask(b"data"))
+            except OSError:
+                pass
+
+        assert list((tmp_path / key[:2]).iterdir()) == []
+        assert cache.get(key) is None
+
+    def test_evicts_least_recently_used(self, mock_env, tmp_path):
+        from bg_remove_core.mask_cache import DiskMaskCache
+
+        cache = DiskMaskCache(str(tmp_path), max_bytes=350)
+        keys = [f"{i:02d}" * 32 for i in range(3)]
+
+        now = time.time()
+        for age, key in zip((300, 200, 100), keys):
+            cache.put(key, _mask(b"x" * 100))
+            path = tmp_path / key[:2] / f"{key}.png"
+            os.utime(path, (now - age, now - age))
+
+        # Reading the oldest entry makes it the most recently used
+        assert cache.get(keys[0]) is not None
+        cache.put("ff" * 32, _mask(b"x" * 100))
+
+        assert cache.get(keys[0]) is not None
+        assert cache.get(keys[1]) is None
+        assert cache.get(keys[2]) is not None
+        assert cache.get("ff" * 32) is not None
+
+    def test_overwrites_do_not_grow_the_total(self, mock_env, tmp_path):
+        from bg_remove_core.mask_cache import DiskMaskCache
+
+        cache = DiskMaskCache(str(tmp_path), max_bytes=350)
+        keys = [f"{i:02d}" * 32 for i in range(3)]
+        for key in keys:
+            cache.put(key, _mask(b"x" * 100))
+
+        # Rewriting an entry replaces its bytes: nothing is evicted
+        for _ in range(5):
+            cache.put(keys[0], _mask(b"x" * 100))
+        cache.put(keys[1], _mask(b"x" * 50))
+
+        assert cache._total_bytes == 250
+        assert all(cache.get(key) is not None for key in keys)
+
+    def test_unreadable_entry_is_discarded(self, mock_env, tmp_path):
+        from bg_remove_core.mask_cache import DiskMaskCache
+
+        cache = DiskMaskCache(str(tmp_path), max_bytes=1024)
+        key = "aa" * 32
+        cache.put(key, _mask(b"garbage"))
+        mock_env["image_module"].open.side_effect = OSError(
+            "cannot identify image file"
+        )
+
+        assert cache.get(key) is None
+        assert not (tmp_path / key[:2] / f"{key}.png").exists()
+
+
+class TestCompactMask:
+    """Tests for the compact in-memory mask representation."""
+
+    def test_compressed_round_trip(self, mock_env):
+        from bg_remove_core.mask_cache import CompactMask
+
+        image_module = mock_env["image_module"]
+        mask = _mask(b"png-bytes")
+        mask.size = (4, 3)
+
+        compact = CompactMask.from_image(mask, "k" * 64)
+
+        assert compact.data == b"png-bytes"
+        assert compact.nbytes == len(b"png-bytes")
+        assert compact.size == (4, 3)
+        assert compact.to_image() is image_module.open.return_value
+
+    def test_uncompressed_keeps_raw_pixels(self, mock_env):
+        from bg_remove_core.mask_cache import CompactMask
+
+        image_module = mock_env["image_module"]
+        mask = MagicMock()
+        mask.size = (2, 2)
+        mask.tobytes.return_value = b"\x00\xff\xff\x00"
+
+        compact = CompactMask.from_image(mask, "k" * 64, compress=False)
+
+        assert compact.data == b"\x00\xff\xff\x00"
+        compact.to_image()
+        image_module.frombytes.assert_called_once_with("L", (2, 2), b"\x00\xff\xff\x00")
+
+
+class TestSegmentMasks:
+    """Tests for how the app uses the mask cache."""
+
+    def test_cached_masks_skip_inference(self, mock_env):
+        from bg_remove_core import processing
+
+        cache = MagicMock()
+        cache.get.side_effect = lambda key: "cached_mask" if key == "hit" else None
+
+        with patch.object(processing, "mask_cache", return_value=cache):
+            with patch.object(
+                processing, "predict_masks_for", return_value=["new_mask"]
+            ) as mock_predict:
+                results = processing.segment_masks(
+                    ["hit", "miss"], ["img_hit", "img_miss"]
+                )
+
+        assert results == ["cached_mask", "new_mask"]
+        mock_predict.assert_called_once_with(
+            ["img_miss"], processing.MODEL_NAME, session=None
+        )
+        cache.put.assert_called_once_with("miss", "new_mask")
+
+    def test_cache_write_errors_are_not_fatal(self, mock_env):
+        from bg_remove_core import processing
+
+        cache = MagicMock()
+        cache.get.return_value = None
+        cache.put.side_effect = OSError("read-only file system")
+
+        with patch.object(processing, "mask_cache", return_value=cache):
+            with patch.object(processing, "predict_masks_for", return_value=["mask"]):
+                assert processing.segment_masks(["a"], ["img"]) == ["mask"]
+
+    def test_compute_masks_caches_compact_masks_only(self, mock_env):
+        bg_remove = mock_env["module"]
+        from bg_remove_core.mask_cache import CompactMask
+
+        with patch.object(
+            bg_remove, "segment_masks", return_value=[_mask(b"m")]
+        ) as mock_segment:
+            results = bg_remove.compute_masks((b"img",), ["working"])
+
+        key = bg_remove.mask_cache_key(b"img")
+        mock_segment.assert_called_once_with([key], ["working"], bg_remove.MODEL_NAME)
+        assert len(results) == 1
+        assert isinstance(results[0], CompactMask)
+        assert results[0].key == key
+        assert results[0].data == b"m"
+
+    def test_key_includes_model_and_working_size(self, mock_env):
+        bg_remove = mock_env["module"]
+        from bg_remove_core.mask_cache import make_key
+
+        expected = make_key(
+            b"img",
+            bg_remove.MODEL_NAME,
+            bg_remove.MODEL_VERSION,
+            bg_remove.MAX_IMAGE_SIZE,
+        )
+        assert bg_remove.mask_cache_key(b"img") == expected
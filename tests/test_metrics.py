@@ -0,0 +1,220 @@
+"""Tests for the latency and throughput metrics."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from bg_remove_core.metrics import Counter, Histogram, Registry
+
+
+def family(text, name):
+    """The sample lines of metric `name` in an exposition."""
+    return [
+        line
+        for line in text.splitlines()
+        if line.startswith(name) and not line.startswith("#")
+    ]
+
+
+class TestExposition:
+    """Tests for the Prometheus text format."""
+
+    def test_counter(self):
+        registry = Registry()
+        counter = registry.register(Counter("jobs_total", "Jobs done.", ["frontend"]))
+        counter.inc(frontend="api")
+        counter.inc(2, frontend="api")
+        counter.inc(frontend="app")
+
+        assert registry.exposition() == (
+            "# HELP jobs_total Jobs done.\n"
+            "# TYPE jobs_total counter\n"
+            'jobs_total{frontend="api"} 3\n'
+            'jobs_total{frontend="app"} 1\n'
+        )
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = Registry()
+        histogram = registry.register(
+            Histogram("latency_seconds", "Latency.", ["stage"], buckets=(0.1, 1))
+        )
+        for value in (0.05, 0.5, 0.5, 3):
+            histogram.observe(value, stage="decode")
+
+        assert family(registry.exposition(), "latency_seconds") == [
+            'latency_seconds_bucket{stage="decode",le="0.1"} 1',
+            'latency_seconds_bucket{stage="decode",le="1"} 3',
+            'latency_seconds_bucket{stage="decode",le="+Inf"} 4',
+            'latency_seconds_sum{stage="decode"} 4.05',
+            'latency_seconds_count{stage="decode"} 4',
+        ]
+        assert histogram.count(stage="decode") == 4
+
+    def test_histogram_times_blocks(self):
+        histogram = Histogram("latency_seconds", "Latency.", ["stage"])
+
+        with pytest.raises(RuntimeError):
+            with histogram.time(stage="zip"):
+                raise RuntimeError("failed")
+
+        assert histogram.count(stage="zip") == 1
+
+    def test_label_values_are_escaped(self):
+        registry = Registry()
+        counter = registry.register(Counter("files_total", "Files.", ["name"]))
+        counter.inc(name='a "b"\\c\n')
+
+        assert family(registry.exposition(), "files_total") == [
+            r'files_total{name="a \"b\"\\c\n"} 1'
+        ]
+
+    def test_labels_must_match(self):
+        counter = Counter("jobs_total", "Jobs done.", ["frontend"])
+
+        with pytest.raises(ValueError):
+            counter.inc(stage="decode")
+        with pytest.raises(ValueError):
+            counter.inc(-1, frontend="api")
+
+    def test_collectors_are_read_at_scrape_time(self):
+        registry = Registry()
+        depth = [3]
+        registry.register_collector(
+            "queue", lambda: [("queue_depth", "gauge", "Depth.", [({}, depth[0])])]
+        )
+
+        assert "queue_depth 3" in registry.exposition()
+        depth[0] = 0
+        assert "queue_depth 0" in registry.exposition()
+
+    def test_collectors_are_replaced_by_name(self):
+        registry = Registry()
+        registry.register_collector("queue", lambda: [("a", "gauge", "A.", [])])
+        registry.register_collector("queue", lambda: [("b", "gauge", "B.", [])])
+
+        text = registry.exposition()
+
+        assert "# TYPE b gauge" in text
+        assert "# TYPE a" not in text
+
+
+class TestStageTimings:
+    """Tests for recording where the time goes."""
+
+    def test_timed_records_the_stage_with_or_without_timings(self, mock_env):
+        from bg_remove_core import processing
+        from bg_remove_core.metrics import STAGE_SECONDS
+
+        timings = {}
+        with processing.timed(timings, "encode"):
+            pass
+        with processing.timed(None, "encode"):
+            pass
+
+        assert STAGE_SECONDS.count(stage="encode") == 2
+        assert list(timings) == ["encode"]
+
+    def test_memoized_stages_are_timed_only_when_computed(self, mock_env):
+        from bg_remove_core.metrics import STAGE_SECONDS
+        from bg_remove_core.pipeline import StageCache
+
+        stages = StageCache(1 << 20)
+        for _ in range(3):
+            stages.run("composite", "key", lambda: b"result")
+
+        assert STAGE_SECONDS.count(stage="composite") == 1
+
+    def test_inference_is_timed_and_counted(self, mock_env):
+        from bg_remove_core import processing
+        from bg_remove_core.metrics import INFERENCE_IMAGES, STAGE_SECONDS
+
+        with (
+            patch.object(processing, "get_session"),
+            patch.object(processing, "predict_masks", return_value=["a", "b"]),
+        ):
+            processing.predict_masks_for([MagicMock(), MagicMock()], "u2netp")
+
+        assert STAGE_SECONDS.count(stage="inference") == 1
+        assert INFERENCE_IMAGES.value(model="u2netp") == 2
+
+    def test_mask_cache_lookups(self, mock_env):
+        from bg_remove_core import processing
+        from bg_remove_core.metrics import MASK_CACHE_LOOKUPS
+
+        cache = MagicMock()
+        cache.get.side_effect = lambda key: "mask" if key == "cached" else None
+        with (
+            patch.object(processing, "mask_cache", return_value=cache),
+            patch.object(processing, "predict_masks_for", return_value=["new"]),
+        ):
+            processing.segment_masks(["cached", "new"], [MagicMock(), MagicMock()])
+
+        assert MASK_CACHE_LOOKUPS.value(result="hit") == 1
+        assert MASK_CACHE_LOOKUPS.value(result="miss") == 1
+
+    def test_zip_archives_are_timed_and_measured(self, mock_env):
+        bg_remove = mock_env["module"]
+        from bg_remove_core.metrics import BYTES_ENCODED, STAGE_SECONDS
+
+        archive = bg_remove.create_zip_archive([("a.png", b"x" * 100)])
+
+        assert STAGE_SECONDS.count(stage="zip") == 1
+        assert BYTES_ENCODED.value(format="ZIP") == len(archive.read())
+
+
+class TestCollectedValues:
+    """Tests for the values read from the caches and the inference gate."""
+
+    def test_render_cache_counters(self, mock_env):
+        from bg_remove_core.metrics import Registry
+        from bg_remove_core.pipeline import StageCache
+
+        stages = StageCache(1 << 20)
+        stages.run("encode", "key", lambda: b"png")
+        stages.run("encode", "key", lambda: b"png")
+        registry = Registry()
+        registry.register_collector("render_cache", stages.collect_metrics)
+
+        text = registry.exposition()
+
+        assert 'bg_remove_render_cache_hits_total{stage="encode"} 1' in text
+        assert 'bg_remove_render_cache_misses_total{stage="encode"} 1' in text
+        assert "bg_remove_render_cache_bytes 3" in text
+
+    def test_app_registers_its_render_cache(self, mock_env):
+        bg_remove = mock_env["module"]
+        from bg_remove_core.metrics import REGISTRY
+
+        bg_remove.get_stage_cache()
+
+        assert "bg_remove_render_cache_hits_total" in REGISTRY.exposition()
+
+    def test_inference_gate(self, mock_env):
+        from bg_remove_core.metrics import REGISTRY
+        from bg_remove_core.settings import inference_gate
+
+        with inference_gate().slot():
+            text = REGISTRY.exposition()
+
+        assert "bg_remove_inference_running 1" in text
+        assert "bg_remove_inference_queue_depth 0" in text
+        assert "bg_remove_inference_queue_rejections_total 0" in text
+
+
+class TestMeterUploads:
+    """Tests for counting the app's uploads once."""
+
+    def test_uploads_are_counted_once_per_session(self, mock_env):
+        bg_remove = mock_env["module"]
+        from bg_remove_core.metrics import BYTES_RECEIVED, IMAGES_RECEIVED
+
+        bg_remove.st.session_state = {}
+        first = MagicMock(file_id="a", size=100)
+        second = MagicMock(file_id="b", size=50)
+
+        assert bg_remove.meter_uploads([first]) == {"a"}
+        assert bg_remove.meter_uploads([first, second]) == {"b"}
+        assert bg_remove.meter_uploads([first, second]) == set()
+
+        assert IMAGES_RECEIVED.value(frontend="app") == 2
+        assert BYTES_RECEIVED.value(frontend="app") == 150
@@ -0,0 +1,177 @@
+"""Tests for the segmentation model registry and per-request model selection."""
+
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+
+class TestSessionRegistry:
+    """Tests for lazy, bounded session loading."""
+
+    def test_sessions_load_lazily_once(self, mock_env):
+        from bg_remove_core.models import SessionRegistry
+
+        factory = MagicMock(side_effect=lambda name: f"session_{name}")
+        registry = SessionRegistry(max_sessions=2, factory=factory)
+
+        factory.assert_not_called()
+        assert registry.get("u2netp") == "session_u2netp"
+        assert registry.get("u2netp") == "session_u2netp"
+        factory.assert_called_once_with("u2netp")
+
+    def test_least_recently_used_session_is_dropped(self, mock_env):
+        from bg_remove_core.models import SessionRegistry
+
+        registry = SessionRegistry(max_sessions=2, factory=lambda name: name)
+        registry.get("u2net")
+        registry.get("u2netp")
+        registry.get("u2net")
+        registry.get("silueta")
+
+        assert registry.loaded() == ["u2net", "silueta"]
+        assert len(registry) == 2
+
+    def test_concurrent_requests_load_a_model_once(self, mock_env):
+        from bg_remove_core.models import SessionRegistry
+
+        loads = []
+
+        def slow_factory(name):
+            loads.append(name)
+            time.sleep(0.05)
+            return object()
+
+        registry = SessionRegistry(max_sessions=2, factory=slow_factory)
+        sessions = []
+        threads = [
+            threading.Thread(target=lambda: sessions.append(registry.get("silueta")))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert loads == ["silueta"]
+        assert len({id(session) for session in sessions}) == 1
+
+    def test_unknown_model_is_rejected(self, mock_env):
+        from bg_remove_core.models import SessionRegistry
+
+        factory = MagicMock()
+        registry = SessionRegistry(factory=factory)
+
+        with pytest.raises(ValueError, match="Unknown segmentation model"):
+            registry.get("not-a-model")
+        factory.assert_not_called()
+
+
+class TestSelectableModels:
+    """Tests for the models offered to users."""
+
+    def test_default_first_then_all_models(self, mock_env):
+        from bg_remove_core.models import MODELS, model_available, selectable_models
+
+        models = selectable_models("silueta")
+
+        assert models[0] == "silueta"
+        assert sorted(models) == sorted(
+            name for name in MODELS if model_available(name)
+        )
+
+    def test_configured_subset(self, mock_env):
+        from bg_remove_core.models import selectable_models
+
+        assert selectable_models("u2net", "u2netp, u2net,isnet-general-use") == [
+            "u2net",
+            "u2netp",
+            "isnet-general-use",
+        ]
+
+    def test_unknown_names_are_rejected(self, mock_env):
+        from bg_remove_core.models import selectable_models
+
+        with pytest.raises(ValueError, match="birefnet"):
+            selectable_models("u2net", "u2netp,birefnet")
+        with pytest.raises(ValueError, match="u3net"):
+            selectable_models("u3net")
+
+
+class TestModelSelection:
+    """Tests for threading the selected model through the app."""
+
+    def test_get_session_uses_registry(self, mock_env):
+        from bg_remove_core import processing
+
+        registry = MagicMock()
+        with patch.object(processing, "model_registry", return_value=registry):
+            session = processing.get_session("silueta")
+
+        registry.get.assert_called_once_with("silueta")
+        assert session is registry.get.return_value
+
+    def test_fix_image_uses_selected_model(self, mock_env):
+        bg_remove = mock_env["module"]
+
+        with (
+            patch.object(bg_remove, "read_upload", return_value=(b"img", "photo.png")),
+            patch.object(
+                bg_remove, "process_image", return_value=(b"orig", b"fixed")
+            ) as mock_process,
+            patch.object(bg_remove, "render_result") as mock_render,
+        ):
+            bg_remove.fix_image("upload", model_name="isnet-general-use")
+
+        assert mock_process.call_args.kwargs["model_name"] == "isnet-general-use"
+        assert mock_render.call_args.kwargs["model_name"] == "isnet-general-use"
+
+    def test_no_preview_when_preview_model_is_selected(self, mock_env):
+        bg_remove = mock_env["module"]
+        on_preview = MagicMock()
+
+        with (
+            patch.object(bg_remove, "read_upload", return_value=(b"img", "photo.png")),
+            patch.object(bg_remove, "mask_ready", return_value=False),
+            patch.object(bg_remove, "preview_image") as mock_preview,
+            patch.object(bg_remove, "process_image", return_value=(b"orig", b"fixed")),
+            patch.object(bg_remove, "render_result"),
+        ):
+            bg_remove.fix_image(
+                "upload",
+                on_preview=on_preview,
+                model_name=bg_remove.PREVIEW_MODEL_NAME,
+            )
+
+        mock_preview.assert_not_called()
+        on_preview.assert_not_called()
+
+    def test_batch_uses_selected_model(self, mock_env):
+        bg_remove = mock_env["module"]
+
+        with (
+            patch.object(bg_remove, "read_upload", return_value=(b"img", "photo.png")),
+            patch.object(
+                bg_remove, "process_images", return_value=[(b"orig", b"fixed")]
+            ) as mock_process,
+            patch.object(
+                bg_remove, "render_result", return_value="result"
+            ) as mock_render,
+        ):
+            results = bg_remove.process_batch(["upload"], model_name="silueta")
+
+        assert mock_process.call_args.kwargs["model_name"] == "silueta"
+        assert mock_render.call_args.kwargs["model_name"] == "silueta"
+        assert results == ["result"]
+
+    def test_every_model_has_its_own_cache_keys(self, mock_env):
+        bg_remove = mock_env["module"]
+        from bg_remove_core.models import MODELS
+
+        assert len({bg_remove.segment_key("src", name) for name in MODELS}) == len(
+            MODELS
+        )
+        assert len({bg_remove.mask_cache_key(b"img", name) for name in MODELS}) == len(
+            MODELS
+        )
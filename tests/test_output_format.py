@@ -1,6 +1,6 @@
 """Tests for output format conversion logic."""
 
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 
 class TestConvertImageToFormat:
@@ -38,6 +38,8 @@ class TestConvertImageToFormat:
         assert kwargs["quality"] == 90
 
     def test_jpeg_converts_rgba_to_rgb_with_white_background(self, mock_env):
+        from bg_remove_core import processing
+
         bg_remove = mock_env["module"]
 
         # Mock an RGBA image
@@ -50,8 +52,12 @@ class TestConvertImageToFormat:
         mock_alpha = MagicMock()
         img.split.return_value = [MagicMock(), MagicMock(), MagicMock(), mock_alpha]
 
-        # The function should create a new RGB background and paste
-        result_bytes = bg_remove.convert_image_to_format(img, "JPEG")
+        # The function should composite onto white straight to RGB
+        with patch.object(processing, "composite") as mock_composite:
+            result_bytes = bg_remove.convert_image_to_format(img, "JPEG")
+
+        mock_composite.assert_called_once_with(img, rgb=True)
+        mock_composite.return_value.save.assert_called_once()
 
         # Verify the function returns bytes (not None)
         assert result_bytes is not None
@@ -74,6 +80,8 @@ class TestConvertImageToFormat:
         assert kwargs["quality"] == 95
 
     def test_jpeg_converts_la_mode(self, mock_env):
+        from bg_remove_core import processing
+
         bg_remove = mock_env["module"]
 
         img = MagicMock()
@@ -83,7 +91,9 @@ class TestConvertImageToFormat:
         mock_alpha = MagicMock()
         img.split.return_value = [MagicMock(), mock_alpha]
 
-        result_bytes = bg_remove.convert_image_to_format(img, "JPEG")
+        with patch.object(processing, "composite") as mock_composite:
+            result_bytes = bg_remove.convert_image_to_format(img, "JPEG")
+        mock_composite.assert_called_once_with(img, rgb=True)
         assert result_bytes is not None
 
     def test_returns_bytes(self, mock_env):
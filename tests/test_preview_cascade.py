@@ -0,0 +1,107 @@
+"""Tests for the preview-then-full model cascade of single images."""
+
+from unittest.mock import MagicMock, patch
+
+
+def _render(image, fixed, original_filename, model_name=None, encode=True, **kwargs):
+    return (image, fixed, original_filename, b"bytes" if encode else None)
+
+
+class TestPreviewCascade:
+    """Tests for fix_image showing the preview model's result first."""
+
+    @staticmethod
+    def _fix(bg_remove, on_preview, ready=False, preview=(b"orig", b"preview")):
+        calls = []
+        with (
+            patch.object(bg_remove, "read_upload", return_value=(b"img", "photo.png")),
+            patch.object(bg_remove, "mask_ready", return_value=ready),
+            patch.object(
+                bg_remove,
+                "preview_image",
+                side_effect=lambda *a, **k: calls.append("preview") or preview,
+            ),
+            patch.object(
+                bg_remove,
+                "process_image",
+                side_effect=lambda *a, **k: calls.append("full") or (b"orig", b"full"),
+            ),
+            patch.object(
+                bg_remove, "render_result", side_effect=_render
+            ) as mock_render,
+        ):
+            result = bg_remove.fix_image("upload", on_preview=on_preview)
+        return result, calls, mock_render
+
+    def test_preview_is_shown_before_full_result(self, mock_env):
+        bg_remove = mock_env["module"]
+        on_preview = MagicMock()
+
+        result, calls, mock_render = self._fix(bg_remove, on_preview)
+
+        assert calls == ["preview", "full"]
+        on_preview.assert_called_once_with((b"orig", b"preview", "photo.png", None))
+        preview_call = mock_render.call_args_list[0]
+        assert preview_call.kwargs["model_name"] == bg_remove.PREVIEW_MODEL_NAME
+        assert preview_call.kwargs["encode"] is False
+        assert result == (b"orig", b"full", "photo.png", b"bytes")
+
+    def test_no_preview_when_full_mask_is_ready(self, mock_env):
+        bg_remove = mock_env["module"]
+        on_preview = MagicMock()
+
+        result, calls, _ = self._fix(bg_remove, on_preview, ready=True)
+
+        assert calls == ["full"]
+        on_preview.assert_not_called()
+        assert result[1] == b"full"
+
+    def test_preview_can_be_disabled(self, mock_env):
+        bg_remove = mock_env["module"]
+        on_preview = MagicMock()
+
+        with patch.object(bg_remove, "PREVIEW_MODEL_NAME", ""):
+            _, calls, _ = self._fix(bg_remove, on_preview)
+
+        assert calls == ["full"]
+        on_preview.assert_not_called()
+
+    def test_failed_preview_still_returns_full_result(self, mock_env):
+        bg_remove = mock_env["module"]
+        on_preview = MagicMock()
+
+        result, calls, _ = self._fix(bg_remove, on_preview, preview=(b"orig", None))
+
+        assert calls == ["preview", "full"]
+        on_preview.assert_not_called()
+        assert result[1] == b"full"
+
+    def test_rejected_image_is_not_processed_twice(self, mock_env):
+        bg_remove = mock_env["module"]
+
+        result, calls, _ = self._fix(bg_remove, MagicMock(), preview=(None, None))
+
+        assert result is None
+        assert calls == ["preview"]
+
+    def test_models_have_separate_cache_keys(self, mock_env):
+        bg_remove = mock_env["module"]
+
+        assert bg_remove.segment_key("src") != bg_remove.segment_key(
+            "src", bg_remove.PREVIEW_MODEL_NAME
+        )
+        assert bg_remove.mask_cache_key(b"img") != bg_remove.mask_cache_key(
+            b"img", bg_remove.PREVIEW_MODEL_NAME
+        )
+
+    def test_preview_display_has_no_download(self, mock_env):
+        bg_remove = mock_env["module"]
+        col2 = mock_env["col2"]
+        col2.reset_mock()
+
+        bg_remove.display_single_result(
+            b"orig", MagicMock(), "photo_rmbg.png", None, "PNG", preview=True
+        )
+
+        col2.download_button.assert_not_called()
+        assert "preview" in col2.caption.call_args.args[0].lower()
@@ -0,0 +1,93 @@
+"""Tests for serving INT8-quantized models."""
+
+import sys
+from unittest.mock import patch
+
+import pytest
+
+
+@pytest.fixture
+def model_home(tmp_path, monkeypatch):
+    monkeypatch.setenv("U2NET_HOME", str(tmp_path))
+    return tmp_path
+
+
+class TestQuantizedModelNames:
+    """Tests for mapping quantized model names to files."""
+
+    def test_base_model(self, mock_env):
+        from bg_remove_core.quantize import base_model
+
+        assert base_model("u2net-int8") == "u2net"
+        assert base_model("silueta-int8") == "silueta"
+        assert base_model("u2net") is None
+        # IS-Net needs different preprocessing than u2net_custom provides
+        assert base_model("isnet-general-use-int8") is None
+
+    def test_quantized_file_lives_next_to_rembg_models(self, mock_env, model_home):
+        from bg_remove_core.quantize import quantized_model_path
+
+        assert quantized_model_path("u2net-int8") == str(model_home / "u2net-int8.onnx")
+
+    def test_calibration_files_are_sorted_images(self, mock_env, tmp_path):
+        from bg_remove_core.quantize import calibration_files
+
+        for name in ("b.jpg", "a.PNG", "notes.txt"):
+            (tmp_path / name).write_bytes(b"")
+        extra = str(tmp_path / "b.jpg")
+
+        assert calibration_files([str(tmp_path), extra]) == [
+            str(tmp_path / "a.PNG"),
+            str(tmp_path / "b.jpg"),
+        ]
+
+    def test_calibration_reader_feeds_each_image_once(self, mock_env):
+        from bg_remove_core import quantize
+
+        with patch.object(quantize, "preprocess") as mock_preprocess:
+            reader = quantize.CalibrationReader(["a.jpg", "b.jpg"], "input.1", "u2net")
+            batches = [reader.get_next(), reader.get_next(), reader.get_next()]
+
+        assert batches[2] is None
+        assert list(batches[0]) == ["input.1"]
+        assert mock_preprocess.call_count == 2
+
+
+class TestQuantizedSessions:
+    """Tests for loading quantized models through the session factory."""
+
+    def test_missing_file_explains_how_to_build_it(self, mock_env, model_home):
+        from bg_remove_core.session_options import create_session
+
+        with pytest.raises(FileNotFoundError, match="bg_remove_core.quantize"):
+            create_session("u2net-int8")
+
+    def test_loads_local_file_with_u2net_custom(self, mock_env, model_home):
+        from bg_remove_core.session_options import SessionConfig, create_session
+
+        (model_home / "u2net-int8.onnx").write_bytes(b"onnx")
+        custom = sys.modules["rembg"].sessions.u2net_custom.U2netCustomSession
+
+        with patch.object(SessionConfig, "session_options", return_value="opts"):
+            session = create_session("u2net-int8")
+
+        custom.assert_called_once_with(
+            "u2net_custom",
+            "opts",
+            None,
+            model_path=str(model_home / "u2net-int8.onnx"),
+        )
+        assert session is custom.return_value
+
+    def test_offered_only_once_built(self, mock_env, model_home):
+        from bg_remove_core.models import selectable_models
+
+        assert "u2net-int8" not in selectable_models("u2net")
+        (model_home / "u2net-int8.onnx").write_bytes(b"onnx")
+        assert "u2net-int8" in selectable_models("u2net")
+
+    def test_configured_but_missing_is_rejected(self, mock_env, model_home):
+        from bg_remove_core.models import selectable_models
+
+        with pytest.raises(ValueError, match="not built"):
+            selectable_models("u2net-int8")
@@ -1,6 +1,5 @@
 import sys
 from unittest.mock import MagicMock, patch
-import pytest
 import os
 import time
 
@@ -27,34 +26,35 @@ sys.modules['PIL.Image'] = MagicMock()
 sys.path.append(os.path.abspath(os.path.dirname(__file__) + '/../'))
 import bg_remove  # noqa: E402
 
-def test_check_rate_limit_logic():
+def test_charge_rate_limit_logic():
     """
-    Test the check_rate_limit function logic.
+    Test that the rate limit is shared by a client's sessions and charged by cost.
     """
-    # Ensure check_rate_limit exists (it will be added)
-    if not hasattr(bg_remove, "check_rate_limit"):
-        pytest.fail("check_rate_limit function not found in bg_remove module")
-
-    # Reset session state
-    mock_st.session_state.clear()
-
-    # 1. First request -> Allowed
-    assert bg_remove.check_rate_limit() is True
-    assert "request_times" in mock_st.session_state
-    assert len(mock_st.session_state["request_times"]) == 1
-
-    # 2. Add 4 more requests -> Allowed (Total 5)
-    for _ in range(4):
-        assert bg_remove.check_rate_limit() is True
-
-    assert len(mock_st.session_state["request_times"]) == 5
-
-    # 3. 6th request -> Blocked
-    assert bg_remove.check_rate_limit() is False
-
-    # 4. Advance time by 61 seconds -> Allowed again
-    future_time = time.time() + 61
-    with patch('time.time', return_value=future_time):
-        assert bg_remove.check_rate_limit() is True
-        # Old requests should be gone, only the new one remains
-        assert len(mock_st.session_state["request_times"]) == 1
+    from bg_remove_core.ratelimit import TokenBuckets
+
+    buckets = TokenBuckets(capacity=10, window=60)
+    upload = MagicMock(file_id="f3")
+    now = time.time()
+
+    with patch.object(bg_remove, "get_token_buckets", return_value=buckets), \
+            patch.object(bg_remove, "client_identity", return_value="1.2.3.4"), \
+            patch.object(bg_remove, "image_cost", return_value=4.0), \
+            patch('time.time', return_value=now):
+        # 1. Two requests costing 4 each -> Allowed, a third -> Blocked
+        for file_id in ("f1", "f2"):
+            mock_st.session_state.clear()
+            assert bg_remove.charge_rate_limit([MagicMock(file_id=file_id)]) == 0
+        mock_st.session_state.clear()
+        wait = bg_remove.charge_rate_limit([upload])
+        assert wait == 12  # 2 units missing, refilled at 10 per minute
+
+        # 2. A new tab (fresh session state) does not reset the limit
+        mock_st.session_state.clear()
+        assert bg_remove.charge_rate_limit([upload]) > 0
+
+    # 3. Once the bucket has refilled enough -> Allowed again
+    with patch.object(bg_remove, "get_token_buckets", return_value=buckets), \
+            patch.object(bg_remove, "client_identity", return_value="1.2.3.4"), \
+            patch.object(bg_remove, "image_cost", return_value=4.0), \
+            patch('time.time', return_value=now + wait):
+        assert bg_remove.charge_rate_limit([upload]) == 0
@@ -1,62 +1,253 @@
 """Tests for rate limiting logic."""
 
-import time
-from unittest.mock import patch
+import struct
+import threading
+from unittest.mock import MagicMock, patch
 
+import pytest
 
-class TestCheckRateLimit:
-    """Tests for the check_rate_limit function."""
 
-    def test_first_request_allowed(self, mock_env):
-        bg_remove = mock_env["module"]
-        mock_st = mock_env["st"]
-        mock_st.session_state.clear()
+def _png(width, height):
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + struct.pack(">I4sII", 13, b"IHDR", width, height)
+        + b"\x08\x06\x00\x00\x00"
+    )
 
-        assert bg_remove.check_rate_limit() is True
-        assert "request_times" in mock_st.session_state
-        assert len(mock_st.session_state["request_times"]) == 1
 
-    def test_five_requests_within_window_allowed(self, mock_env):
-        bg_remove = mock_env["module"]
-        mock_st = mock_env["st"]
-        mock_st.session_state.clear()
+@pytest.fixture(params=["memory", "sqlite"])
+def make_buckets(request, tmp_path):
+    """Factory for both bucket stores."""
+    from bg_remove_core.ratelimit import SQLiteTokenBuckets, TokenBuckets
 
-        for i in range(5):
-            assert bg_remove.check_rate_limit() is True
+    def make(capacity=10, window=60, **kwargs):
+        if request.param == "memory":
+            return TokenBuckets(capacity, window, **kwargs)
+        return SQLiteTokenBuckets(tmp_path / "buckets.db", capacity, window, **kwargs)
 
-        assert len(mock_st.session_state["request_times"]) == 5
+    return make
 
-    def test_sixth_request_blocked(self, mock_env):
-        bg_remove = mock_env["module"]
-        mock_st = mock_env["st"]
-        mock_st.session_state.clear()
 
-        for _ in range(5):
-            bg_remove.check_rate_limit()
+def close_to(value, expected):
+    return abs(value - expected) < 1e-9
+
+
+class TestTokenBuckets:
+    """Tests for the token buckets, in memory and in SQLite."""
+
+    def test_charges_cost_and_refills(self, mock_env, make_buckets):
+        buckets = make_buckets(capacity=10, window=60)
+
+        assert buckets.take("a", 6, now=0) == 0
+        assert buckets.take("a", 3, now=0) == 0
+        assert close_to(buckets.take("a", 3, now=0), 12)  # 2 units short
+        assert buckets.take("b", 10, now=0) == 0
+        assert buckets.take("a", 3, now=12) == 0
+
+    def test_rejected_requests_are_not_charged(self, mock_env, make_buckets):
+        buckets = make_buckets(capacity=10, window=60)
+        buckets.take("a", 8, now=0)
+
+        assert buckets.take("a", 5, now=0) > 0
+        assert buckets.take("a", 2, now=0) == 0
+
+    def test_requests_over_capacity_wait_for_a_full_bucket(
+        self, mock_env, make_buckets
+    ):
+        buckets = make_buckets(capacity=10, window=60)
+        buckets.take("a", 1, now=0)
+
+        assert close_to(buckets.take("a", 25, now=0), 6)
+        assert buckets.take("a", 25, now=6) == 0
+        # The bucket is 15 units in debt: 1.5 windows until it is full again
+        assert close_to(buckets.take("a", 10, now=6), 150)
+
+    def test_full_buckets_are_forgotten(self, mock_env, make_buckets):
+        buckets = make_buckets(capacity=10, window=60)
+        buckets.max_clients = buckets.prune_every = 3
+        for client in "ab":
+            buckets.take(client, 5, now=0)
+        buckets.take("c", 5, now=100)
+        buckets.take("d", 5, now=100)
+
+        assert len(buckets) == 2
+
+    def test_sqlite_buckets_are_shared(self, mock_env, tmp_path):
+        from bg_remove_core.ratelimit import SQLiteTokenBuckets
+
+        first = SQLiteTokenBuckets(tmp_path / "b.db", 10, 60)
+        second = SQLiteTokenBuckets(tmp_path / "b.db", 10, 60)
+
+        assert first.take("a", 8, now=0) == 0
+        assert second.take("a", 8, now=0) > 0
+
+    def test_sqlite_concurrent_charges_spend_each_token_once(self, mock_env, tmp_path):
+        from bg_remove_core.ratelimit import SQLiteTokenBuckets
+
+        buckets = SQLiteTokenBuckets(tmp_path / "b.db", 20, 3600)
+        results = []
+
+        def charge():
+            results.extend(buckets.take("a", 1, now=0) == 0 for _ in range(10))
+
+        threads = [threading.Thread(target=charge) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results.count(True) == 20
+
+
+class TestImageCost:
+    """Tests for the cost charged per image."""
+
+    def test_working_size_megapixels_plus_model_run(self, mock_env):
+        from bg_remove_core.processing import image_cost
+
+        # 4000x3000 is processed at the 2000x1500 working size
+        assert close_to(image_cost(_png(4000, 3000), "u2net"), 1 + 3.0)
+        assert close_to(image_cost(_png(1000, 1000), "u2netp"), 0.3 + 1.0)
+
+    def test_full_resolution_charges_the_source_size(self, mock_env):
+        from bg_remove_core.processing import image_cost
+
+        cost = image_cost(_png(4000, 3000), "u2net", full_resolution=True)
+
+        assert close_to(cost, 1 + 12.0)
 
-        assert bg_remove.check_rate_limit() is False
+    def test_segmented_images_are_charged_without_the_model(self, mock_env):
+        from bg_remove_core.processing import image_cost
+
+        cost = image_cost(_png(1000, 1000), "u2net", segmented=True)
+
+        assert close_to(cost, 1.0)
+
+    def test_unknown_size_is_charged_as_the_largest_working_image(self, mock_env):
+        from bg_remove_core.processing import image_cost
+
+        assert close_to(image_cost(b"\xff\xd8\xff" + b"\x00" * 20), 1 + 4.0)
+
+
+class TestChargeRateLimit:
+    """Tests for charging the app's requests."""
+
+    @pytest.fixture
+    def charge(self, mock_env):
+        from bg_remove_core.ratelimit import TokenBuckets
 
-    def test_requests_allowed_after_window_expires(self, mock_env):
         bg_remove = mock_env["module"]
-        mock_st = mock_env["st"]
-        mock_st.session_state.clear()
+        bg_remove.st.session_state = {}
+        buckets = TokenBuckets(capacity=10, window=60)
+        with (
+            patch.object(bg_remove, "get_token_buckets", return_value=buckets),
+            patch.object(bg_remove, "client_identity", return_value="1.2.3.4"),
+            patch.object(
+                bg_remove,
+                "image_cost",
+                side_effect=lambda *args, segmented: 1.0 if segmented else 3.0,
+            ) as mock_cost,
+        ):
+            yield bg_remove, buckets, mock_cost
+
+    def test_batch_is_charged_per_image(self, charge):
+        bg_remove, buckets, mock_cost = charge
+        uploads = [MagicMock(file_id=str(idx)) for idx in range(3)]
+
+        assert bg_remove.charge_rate_limit(uploads, "u2netp", True) == 0
+
+        assert mock_cost.call_count == 3
+        assert mock_cost.call_args.args[1:] == ("u2netp", True)
+        assert buckets.take("1.2.3.4", 2) > 0  # 1 unit left
+
+    def test_reruns_of_the_same_request_are_free(self, charge):
+        bg_remove, buckets, mock_cost = charge
+        uploads = [MagicMock(file_id="a"), MagicMock(file_id="b")]
 
-        # Fill up the limit
         for _ in range(5):
-            bg_remove.check_rate_limit()
+            assert bg_remove.charge_rate_limit(uploads, settings_key=("PNG",)) == 0
+
+        assert mock_cost.call_count == 2
+
+    def test_new_settings_are_charged_without_the_model(self, charge):
+        bg_remove, buckets, mock_cost = charge
+        uploads = [MagicMock(file_id="a"), MagicMock(file_id="b")]
+
+        assert bg_remove.charge_rate_limit(uploads, settings_key=("PNG",)) == 0
+        assert bg_remove.charge_rate_limit(uploads, settings_key=("WEBP",)) == 0
+        assert bg_remove.charge_rate_limit(uploads, full_resolution=True) == 0
+
+        # 6 units for segmenting, then 2 for each change of settings
+        assert [c.kwargs["segmented"] for c in mock_cost.call_args_list] == [
+            False,
+            False,
+            True,
+            True,
+            True,
+            True,
+        ]
+        assert buckets.take("1.2.3.4", 1) > 0  # all 10 units spent
+
+    def test_earlier_settings_are_free(self, charge):
+        bg_remove, _, mock_cost = charge
+        uploads = [MagicMock(file_id="a")]
+
+        for settings_key in [("PNG",), ("WEBP",), ("PNG",), ("WEBP",)]:
+            assert bg_remove.charge_rate_limit(uploads, settings_key=settings_key) == 0
+
+        assert mock_cost.call_count == 2
+
+    def test_new_model_is_charged_in_full(self, charge):
+        bg_remove, _, mock_cost = charge
+        uploads = [MagicMock(file_id="a")]
+
+        bg_remove.charge_rate_limit(uploads, "u2net")
+        bg_remove.charge_rate_limit(uploads, "u2netp")
+
+        assert mock_cost.call_args.kwargs["segmented"] is False
+
+    def test_only_the_added_upload_is_charged(self, charge):
+        bg_remove, _, mock_cost = charge
+        first = MagicMock(file_id="a")
+
+        bg_remove.charge_rate_limit([first])
+        bg_remove.charge_rate_limit([first, MagicMock(file_id="b")])
+
+        assert mock_cost.call_count == 2
+        assert mock_cost.call_args.kwargs["segmented"] is False
+
+    def test_rate_limited_requests_are_not_remembered(self, charge):
+        bg_remove, buckets, mock_cost = charge
+        buckets.take("1.2.3.4", 9)
+
+        assert bg_remove.charge_rate_limit([MagicMock(file_id="a")]) > 0
+        assert bg_remove.charge_rate_limit([MagicMock(file_id="a")]) > 0
+        assert mock_cost.call_count == 2
+
+    def test_limit_is_shared_by_sessions(self, charge):
+        bg_remove, _, _ = charge
+        upload = MagicMock(file_id="a")
+
+        for _ in range(3):
+            bg_remove.st.session_state = {}  # a new tab
+            assert bg_remove.charge_rate_limit([upload]) == 0
+        bg_remove.st.session_state = {}
+        assert bg_remove.charge_rate_limit([upload]) > 0
+
+
+class TestClientIdentity:
+    """Tests for the rate limit key of app users."""
+
+    def test_proxy_header(self, mock_env):
+        bg_remove = mock_env["module"]
+        bg_remove.st.context.headers = {"X-Forwarded-For": "203.0.113.7, 10.0.0.1"}
 
-        # Advance time by 61 seconds
-        future_time = time.time() + 61
-        with patch("time.time", return_value=future_time):
-            assert bg_remove.check_rate_limit() is True
-            # Old requests should be cleaned up
-            assert len(mock_st.session_state["request_times"]) == 1
+        with patch.object(bg_remove, "CLIENT_IP_HEADER", "X-Forwarded-For"):
+            assert bg_remove.client_identity() == "203.0.113.7"
 
-    def test_initializes_session_state(self, mock_env):
+    def test_header_is_ignored_unless_configured(self, mock_env):
         bg_remove = mock_env["module"]
-        mock_st = mock_env["st"]
-        mock_st.session_state.clear()
+        bg_remove.st.context.headers = {"X-Forwarded-For": "203.0.113.7"}
 
-        assert "request_times" not in mock_st.session_state
-        bg_remove.check_rate_limit()
-        assert "request_times" in mock_st.session_state
+        with patch.object(bg_remove, "CLIENT_IP_HEADER", ""):
+            assert bg_remove.client_identity() == "unknown"
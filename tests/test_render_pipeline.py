@@ -0,0 +1,312 @@
+"""Tests for the memoized render pipeline stages."""
+
+from unittest.mock import MagicMock, patch
+
+
+class TestStageCache:
+    """Tests for StageCache memoization, counters and eviction."""
+
+    def test_run_memoizes_and_counts(self, mock_env):
+        from bg_remove_core.pipeline import StageCache
+
+        stages = StageCache(max_bytes=1024)
+        compute = MagicMock(return_value=b"encoded")
+
+        assert stages.run("encode", ("k", "PNG"), compute) == b"encoded"
+        assert stages.run("encode", ("k", "PNG"), compute) == b"encoded"
+
+        compute.assert_called_once()
+        assert stages.stats()["encode"] == {"hits": 1, "misses": 1}
+        assert stages.stats()["resize"] == {"hits": 0, "misses": 0}
+
+    def test_none_keys_and_values_are_not_stored(self, mock_env):
+        from bg_remove_core.pipeline import StageCache
+
+        stages = StageCache(max_bytes=1024)
+        stages.run("segment", "rejected", lambda: None)
+        stages.run("encode", None, lambda: b"data")
+
+        assert stages.nbytes == 0
+        assert stages.get("segment", "rejected") is None
+
+    def test_evicts_least_recently_used_within_budget(self, mock_env):
+        from bg_remove_core.pipeline import StageCache
+
+        stages = StageCache(max_bytes=250)
+        stages.put("encode", "a", bytes(100))
+        stages.put("encode", "b", bytes(100))
+        stages.get("encode", "a")  # "a" becomes the most recently used
+        stages.put("encode", "c", bytes(100))
+
+        assert stages.get("encode", "a") is not None
+        assert stages.get("encode", "b") is None
+        assert stages.get("encode", "c") is not None
+        assert stages.nbytes == 200
+
+    def test_values_stored_under_several_keys_are_counted_once(self, mock_env):
+        from bg_remove_core.pipeline import StageCache
+
+        stages = StageCache(max_bytes=250)
+        cutout = bytes(100)  # distinct objects, unlike folded constants
+        stages.put("segment", "a", cutout)
+        # A transparent composite is the cutout itself
+        stages.put("composite", "a", cutout)
+        assert stages.nbytes == 100
+
+        stages.put("encode", "a", bytes(100))
+        stages.put("encode", "b", bytes(100))
+
+        # Evicting the segment entry frees nothing while the composite holds the cutout
+        assert stages.get("segment", "a") is None
+        assert stages.get("composite", "a") is None
+        assert stages.nbytes == 200
+
+    def test_zero_budget_disables_memoization(self, mock_env):
+        from bg_remove_core.pipeline import StageCache
+
+        stages = StageCache(max_bytes=0)
+        compute = MagicMock(return_value=b"x")
+        stages.run("encode", "k", compute)
+        stages.run("encode", "k", compute)
+
+        assert compute.call_count == 2
+
+    def test_image_size_estimate(self, mock_env):
+        from bg_remove_core.pipeline import value_nbytes
+
+        image = MagicMock()
+        image.size = (10, 20)
+        image.getbands.return_value = ("R", "G", "B", "A")
+
+        assert value_nbytes(image) == 800
+        assert value_nbytes((image, b"abc")) == 803
+
+
+class TestLoadImageStages:
+    """Tests for the stages memoized when an upload is loaded."""
+
+    def test_source_is_decoded_only_on_a_resize_miss(self, mock_env):
+        bg_remove = mock_env["module"]
+        from bg_remove_core.pipeline import LazyOriginal, StageCache
+
+        stages = StageCache(max_bytes=1 << 20)
+        with (
+            patch.object(bg_remove, "decode_image") as mock_decode,
+            patch.object(bg_remove, "resize_image") as mock_resize,
+        ):
+            for _ in range(2):
+                original, _ = bg_remove.load_image(b"img", stages, "src")
+
+            assert isinstance(original, LazyOriginal)
+            mock_decode.assert_called_once()
+            mock_resize.assert_called_once()
+            assert stages.stats()["resize"] == {"hits": 1, "misses": 1}
+
+            # The original is decoded when a stage needs it, then only once
+            assert original.get() is mock_decode.return_value
+            original.get()
+            assert mock_decode.call_count == 2
+
+    def test_format_change_does_not_decode(self, mock_env):
+        bg_remove = mock_env["module"]
+        from bg_remove_core.pipeline import StageCache
+
+        stages = StageCache(max_bytes=1 << 20)
+        with (
+            patch.object(bg_remove, "decode_image") as mock_decode,
+            patch.object(bg_remove, "resize_image"),
+            patch.object(bg_remove, "compute_masks", return_value=["mask"]),
+            patch.object(bg_remove, "apply_mask", return_value=MagicMock(size=(8, 8))),
+            patch.object(bg_remove, "pyramid_blur", return_value=b"blurred"),
+            patch.object(
+                bg_remove, "apply_background_replacement", return_value=b"composite"
+            ),
+            patch.object(bg_remove, "convert_image_to_format", return_value=b"bytes"),
+        ):
+            for output_format in ("PNG", "WEBP"):
+                image, fixed = bg_remove.process_image(b"img", stages, "src")
+                bg_remove.render_result(
+                    image,
+                    fixed,
+                    "photo.png",
+                    output_format=output_format,
+                    bg_mode="blur",
+                    stages=stages,
+                    source="src",
+                )
+
+        # Only the first run's resize and blurred background needed the pixels
+        mock_decode.assert_called_once()
+        assert stages.stats()["encode"] == {"hits": 0, "misses": 2}
+
+
+class TestRenderResultStages:
+    """Tests that sidebar changes only recompute downstream stages."""
+
+    @staticmethod
+    def _render(bg_remove, stages, **kwargs):
+        return bg_remove.render_result(
+            "orig", "fixed", "photo.png", stages=stages, source="src", **kwargs
+        )
+
+    def test_format_change_only_reencodes(self, mock_env):
+        bg_remove = mock_env["module"]
+        from bg_remove_core.pipeline import StageCache
+
+        stages = StageCache(max_bytes=1 << 20)
+        with (
+            patch.object(
+                bg_remove, "apply_background_replacement", return_value=b"composite"
+            ) as mock_composite,
+            patch.object(
+                bg_remove, "convert_image_to_format", return_value=b"bytes"
+            ) as mock_encode,
+        ):
+            self._render(
+                bg_remove,
+                stages,
+                output_format="PNG",
+                bg_mode="solid_color",
+                bg_color="#FF0000",
+            )
+            self._render(
+                bg_remove,
+                stages,
+                output_format="WEBP",
+                bg_mode="solid_color",
+                bg_color="#FF0000",
+            )
+            self._render(
+                bg_remove,
+                stages,
+                output_format="PNG",
+                bg_mode="solid_color",
+                bg_color="#FF0000",
+            )
+
+        assert mock_composite.call_count == 1
+        assert mock_encode.call_count == 2
+        assert stages.stats()["composite"] == {"hits": 2, "misses": 1}
+        assert stages.stats()["encode"] == {"hits": 1, "misses": 2}
+
+    def test_colour_change_recomposites(self, mock_env):
+        bg_remove = mock_env["module"]
+        from bg_remove_core.pipeline import StageCache
+
+        stages = StageCache(max_bytes=1 << 20)
+        with (
+            patch.object(
+                bg_remove, "apply_background_replacement", side_effect=[b"red", b"blue"]
+            ) as mock_composite,
+            patch.object(bg_remove, "convert_image_to_format", return_value=b"bytes"),
+        ):
+            self._render(bg_remove, stages, bg_mode="solid_color", bg_color="#FF0000")
+            _, result, _, _ = self._render(
+                bg_remove, stages, bg_mode="solid_color", bg_color="#0000FF"
+            )
+
+        assert mock_composite.call_count == 2
+        assert result == b"blue"
+
+    def test_irrelevant_settings_do_not_invalidate(self, mock_env):
+        bg_remove = mock_env["module"]
+        from bg_remove_core.pipeline import StageCache
+
+        stages = StageCache(max_bytes=1 << 20)
+        with (
+            patch.object(
+                bg_remove, "apply_background_replacement", return_value=b"composite"
+            ) as mock_composite,
+            patch.object(bg_remove, "convert_image_to_format", return_value=b"bytes"),
+        ):
+            # The blur radius does not affect a transparent result
+            self._render(bg_remove, stages, bg_mode="transparent", bg_blur_radius=10)
+            self._render(bg_remove, stages, bg_mode="transparent", bg_blur_radius=30)
+
+        assert mock_composite.call_count == 1
+
+    def test_unidentified_custom_background_is_not_memoized(self, mock_env):
+        bg_remove = mock_env["module"]
+        from bg_remove_core.pipeline import StageCache
+
+        stages = StageCache(max_bytes=1 << 20)
+        with (
+            patch.object(
+                bg_remove, "apply_background_replacement", return_value=b"composite"
+            ) as mock_composite,
+            patch.object(bg_remove, "convert_image_to_format", return_value=b"bytes"),
+        ):
+            for _ in range(2):
+                self._render(
+                    bg_remove,
+                    stages,
+                    bg_mode="custom_image",
+                    bg_custom_image=MagicMock(),
+                )
+            for _ in range(2):
+                self._render(
+                    bg_remove,
+                    stages,
+                    bg_mode="custom_image",
+                    bg_custom_image=MagicMock(),
+                    bg_custom_key="bg",
+                )
+
+        assert mock_composite.call_count == 3
+
+
+class TestProcessImagesStages:
+    """Tests that batch reruns reuse memoized cutouts."""
+
+    def test_memoized_cutouts_skip_segmentation(self, mock_env):
+        bg_remove = mock_env["module"]
+        from bg_remove_core.pipeline import StageCache
+
+        stages = StageCache(max_bytes=1 << 20)
+        stages.put(
+            "segment", bg_remove.segment_key(bg_remove.source_key(b"a")), b"cut_a"
+        )
+
+        with (
+            patch.object(bg_remove, "load_image", return_value=(b"orig", b"working")),
+            patch.object(bg_remove, "apply_mask", return_value=b"cut_b"),
+            patch.object(
+                bg_remove, "compute_masks", return_value=["mask_b"]
+            ) as mock_compute,
+        ):
+            results = bg_remove.process_images((b"a", b"b"), stages=stages)
+
+        mock_compute.assert_called_once_with(
+            (b"b",), [b"working"], bg_remove.MODEL_NAME
+        )
+        assert results == [(b"orig", b"cut_a"), (b"orig", b"cut_b")]
+
+
+class TestRenderResultJpeg:
+    """Tests for the direct RGB composite used for JPEG output."""
+
+    def test_jpeg_composites_to_rgb(self, mock_env):
+        bg_remove = mock_env["module"]
+        from bg_remove_core.pipeline import StageCache
+
+        stages = StageCache(max_bytes=1 << 20)
+        with (
+            patch.object(
+                bg_remove, "apply_background_replacement", return_value=b"composite"
+            ) as mock_composite,
+            patch.object(bg_remove, "convert_image_to_format", return_value=b"bytes"),
+        ):
+            for output_format in ("PNG", "WEBP", "JPEG"):
+                bg_remove.render_result(
+                    "orig",
+                    "fixed",
+                    "photo.png",
+                    output_format=output_format,
+                    bg_mode="solid_color",
+                    bg_color="#FF0000",
+                    stages=stages,
+                    source="src",
+                )
+
+        # PNG and WEBP share the RGBA composite; JPEG gets its own RGB one
+        assert [c.kwargs["rgb"] for c in mock_composite.call_args_list] == [False, True]
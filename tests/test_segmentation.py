@@ -0,0 +1,90 @@
+"""Tests for the batched segmentation engine."""
+
+from unittest.mock import MagicMock
+
+
+class FakeOutput:
+    """Stands in for the (N, 1, H, W) model output; slicing yields one entry per image."""
+
+    def __init__(self, count):
+        self.count = count
+
+    def __getitem__(self, key):
+        return [f"pred_{i}" for i in range(self.count)]
+
+
+def _session(batch_dim, model_name="u2net"):
+    session = MagicMock()
+    session.model_name = model_name
+    model_input = MagicMock()
+    model_input.name = "input.1"
+    model_input.shape = [batch_dim, 3, 320, 320]
+    session.inner_session.get_inputs.return_value = [model_input]
+    return session
+
+
+class TestRunBatched:
+    """Tests for chunked inference."""
+
+    def test_dynamic_batch_uses_requested_chunk_size(self, mock_env):
+        from bg_remove_core import segmentation
+
+        session = _session("batch_size")
+        segmentation.np.stack.side_effect = lambda chunk: chunk
+        session.inner_session.run.side_effect = lambda _, feeds: [
+            FakeOutput(len(feeds["input.1"]))
+        ]
+
+        preds = segmentation.run_batched(
+            session, ["t0", "t1", "t2", "t3", "t4"], batch_size=2
+        )
+
+        chunk_sizes = [
+            len(call.args[1]["input.1"])
+            for call in session.inner_session.run.call_args_list
+        ]
+        assert chunk_sizes == [2, 2, 1]
+        assert len(preds) == 5
+
+    def test_fixed_batch_dimension_limits_chunk_size(self, mock_env):
+        from bg_remove_core import segmentation
+
+        session = _session(1)
+        segmentation.np.stack.side_effect = lambda chunk: chunk
+        session.inner_session.run.side_effect = lambda _, feeds: [
+            FakeOutput(len(feeds["input.1"]))
+        ]
+
+        segmentation.run_batched(session, ["t0", "t1", "t2"], batch_size=8)
+
+        assert session.inner_session.run.call_count == 3
+
+    def test_max_batch_size(self, mock_env):
+        from bg_remove_core import segmentation
+
+        assert segmentation.max_batch_size(_session(1)) == 1
+        assert segmentation.max_batch_size(_session("N")) is None
+        assert segmentation.max_batch_size(_session(None)) is None
+
+
+class TestPredictMasks:
+    """Tests for model dispatch in predict_masks."""
+
+    def test_unknown_model_falls_back_to_session_predict(self, mock_env):
+        from bg_remove_core import segmentation
+
+        session = _session(1, model_name="sam")
+        session.predict.side_effect = lambda img: [f"mask_{img}"]
+
+        masks = segmentation.predict_masks(["a", "b"], session)
+
+        assert masks == ["mask_a", "mask_b"]
+        session.inner_session.run.assert_not_called()
+
+    def test_known_models_have_preprocessing_params(self, mock_env):
+        from bg_remove_core import segmentation
+
+        for name in ("u2net", "u2netp", "silueta", "isnet-general-use"):
+            mean, std, size = segmentation.MODEL_PARAMS[name]
+            assert len(mean) == len(std) == 3
+            assert size[0] == size[1]
@@ -0,0 +1,122 @@
+"""Tests for the tunable onnxruntime session options."""
+
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+
+class TestSessionConfig:
+    """Tests for reading and validating the options."""
+
+    def test_defaults_disable_spin_waiting(self, mock_env):
+        from bg_remove_core.session_options import SessionConfig
+
+        config = SessionConfig.from_env({})
+
+        assert config == SessionConfig()
+        assert config.intra_op_threads == 0
+        assert config.spin_wait is False
+        assert config.memory_arena is True
+
+    def test_reads_environment(self, mock_env):
+        from bg_remove_core.session_options import SessionConfig
+
+        config = SessionConfig.from_env(
+            {
+                "BG_REMOVE_ORT_INTRA_OP_THREADS": "2",
+                "BG_REMOVE_ORT_INTER_OP_THREADS": "1",
+                "BG_REMOVE_ORT_EXECUTION_MODE": "Parallel",
+                "BG_REMOVE_ORT_GRAPH_OPTIMIZATION": "extended",
+                "BG_REMOVE_ORT_MEMORY_ARENA": "0",
+                "BG_REMOVE_ORT_SPIN_WAIT": "1",
+            }
+        )
+
+        assert config == SessionConfig(
+            intra_op_threads=2,
+            inter_op_threads=1,
+            execution_mode="parallel",
+            graph_optimization="extended",
+            memory_arena=False,
+            spin_wait=True,
+        )
+
+    @pytest.mark.parametrize(
+        "kwargs",
+        [
+            {"execution_mode": "async"},
+            {"graph_optimization": "max"},
+            {"intra_op_threads": -1},
+        ],
+    )
+    def test_invalid_values_are_rejected(self, mock_env, kwargs):
+        from bg_remove_core.session_options import SessionConfig
+
+        with pytest.raises(ValueError):
+            SessionConfig(**kwargs)
+
+    def test_session_options_are_applied(self, mock_env):
+        from bg_remove_core.session_options import SessionConfig
+
+        ort = sys.modules["onnxruntime"]
+        options = SessionConfig(
+            intra_op_threads=3, graph_optimization="basic", memory_arena=False
+        ).session_options()
+
+        assert options is ort.SessionOptions.return_value
+        assert options.intra_op_num_threads == 3
+        assert options.inter_op_num_threads == 0
+        assert options.execution_mode == ort.ExecutionMode.ORT_SEQUENTIAL
+        assert (
+            options.graph_optimization_level
+            == ort.GraphOptimizationLevel.ORT_ENABLE_BASIC
+        )
+        assert options.enable_cpu_mem_arena is False
+        options.add_session_config_entry.assert_any_call(
+            "session.intra_op.allow_spinning", "0"
+        )
+        options.add_session_config_entry.assert_any_call(
+            "session.inter_op.allow_spinning", "0"
+        )
+
+
+class TestCreateSession:
+    """Tests for building rembg sessions with the options."""
+
+    def test_uses_the_models_session_class(self, mock_env):
+        from bg_remove_core.session_options import SessionConfig, create_session
+
+        rembg = sys.modules["rembg"]
+        silueta = MagicMock()
+        silueta.name.return_value = "silueta"
+        rembg.sessions.sessions_class = [silueta]
+        config = SessionConfig(intra_op_threads=1)
+
+        with patch.object(SessionConfig, "session_options", return_value="opts"):
+            session = create_session("silueta", config)
+
+        silueta.assert_called_once_with("silueta", "opts", None)
+        assert session is silueta.return_value
+
+    def test_worker_sessions_get_their_share_of_threads(self, mock_env):
+        from bg_remove_core import workers
+        from bg_remove_core.session_options import SessionConfig
+
+        config = SessionConfig(spin_wait=True)
+        with patch.object(workers, "create_session") as mock_create:
+            workers._init_worker("u2net", 2, config)
+
+        mock_create.assert_called_once_with(
+            "u2net", SessionConfig(intra_op_threads=2, spin_wait=True)
+        )
+
+    def test_app_sessions_use_configured_options(self, mock_env):
+        from bg_remove_core import settings
+
+        bg_remove = mock_env["module"]
+
+        with patch.object(settings, "create_session") as mock_create:
+            bg_remove.get_model_registry().get("u2netp")
+
+        mock_create.assert_called_once_with("u2netp", settings.ORT_SESSION_CONFIG)
@@ -1,7 +1,11 @@
 """Tests for file upload validation logic."""
 
+import struct
 from unittest.mock import MagicMock, patch
 
+# Signature and IHDR chunk of a 100x100 PNG
+PNG_HEADER = b"\x89PNG\r\n\x1a\n" + struct.pack(">I4sII", 13, b"IHDR", 100, 100)
+
 
 class TestValidateUploadedFile:
     """Tests for the validate_uploaded_file function."""
@@ -12,6 +16,7 @@ class TestValidateUploadedFile:
         upload = MagicMock()
         upload.size = 5 * 1024 * 1024  # 5MB
         upload.name = "photo.jpg"
+        upload.getbuffer.return_value = memoryview(PNG_HEADER)
 
         is_valid, error_msg = bg_remove.validate_uploaded_file(upload)
 
@@ -24,6 +29,7 @@ class TestValidateUploadedFile:
         upload = MagicMock()
         upload.size = 10 * 1024 * 1024  # 10MB (exact limit)
         upload.name = "photo.jpg"
+        upload.getbuffer.return_value = memoryview(PNG_HEADER)
 
         is_valid, error_msg = bg_remove.validate_uploaded_file(upload)
 
@@ -49,6 +55,7 @@ class TestValidateUploadedFile:
         upload = MagicMock()
         upload.size = 100  # 100 bytes
         upload.name = "tiny.png"
+        upload.getbuffer.return_value = memoryview(PNG_HEADER)
 
         is_valid, error_msg = bg_remove.validate_uploaded_file(upload)
 
@@ -83,7 +90,7 @@ class TestProcessImageFormatValidation:
         mock_img.resize.return_value = mock_img
 
         with patch.object(mock_image_module, "open", return_value=mock_img):
-            with patch("bg_remove.remove", return_value=MagicMock()):
+            with patch("bg_remove_core.processing.remove", return_value=MagicMock()):
                 img, fixed = bg_remove.process_image(b"fake_bytes")
                 assert img is not None
                 assert fixed is not None
@@ -100,7 +107,7 @@ class TestProcessImageFormatValidation:
         mock_img.resize.return_value = mock_img
 
         with patch.object(mock_image_module, "open", return_value=mock_img):
-            with patch("bg_remove.remove", return_value=MagicMock()):
+            with patch("bg_remove_core.processing.remove", return_value=MagicMock()):
                 img, fixed = bg_remove.process_image(b"fake_bytes")
                 assert img is not None
                 assert fixed is not None
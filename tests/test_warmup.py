@@ -0,0 +1,229 @@
+"""Tests for the startup warm-up and the readiness endpoint."""
+
+import sys
+import urllib.error
+import urllib.request
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from bg_remove_core.warmup import Warmup, serve_metrics, serve_readiness
+
+
+def get(server, path="/ready"):
+    url = f"http://127.0.0.1:{server.server_address[1]}{path}"
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, response.read().decode().strip()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode().strip()
+
+
+class TestWarmup:
+    """Tests for running the warm-up steps."""
+
+    def test_steps_run_in_order_then_ready(self):
+        calls = []
+        warmup = Warmup(
+            [("a", lambda: calls.append("a")), ("b", lambda: calls.append("b"))]
+        )
+
+        assert warmup.state == "starting"
+        warmup.start()
+
+        assert warmup.wait(timeout=5)
+        assert calls == ["a", "b"]
+        assert warmup.state == "ready"
+        assert warmup.elapsed is not None
+
+    def test_failed_step_leaves_replica_unready(self):
+        later = MagicMock()
+
+        def broken():
+            raise RuntimeError("model missing")
+
+        warmup = Warmup([("load u2net", broken), ("later", later)])
+        warmup.run()
+
+        assert not warmup.ready
+        assert warmup.state == "failed"
+        assert warmup.error == "load u2net: model missing"
+        later.assert_not_called()
+
+    def test_no_steps_is_ready_immediately(self):
+        warmup = Warmup([])
+        warmup.run()
+        assert warmup.ready
+
+
+class TestReadinessEndpoint:
+    """Tests for GET /ready and GET /metrics."""
+
+    @pytest.fixture
+    def server(self):
+        servers = []
+
+        def start(warmup=None, registry=None):
+            if registry is None:
+                server = serve_readiness(warmup, 0, host="127.0.0.1")
+            else:
+                server = serve_metrics(0, registry=registry)
+            servers.append(server)
+            return server
+
+        yield start
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+
+    def test_unavailable_until_warm(self, server):
+        warmup = Warmup([("noop", lambda: None)])
+        srv = server(warmup)
+
+        assert get(srv) == (503, "starting")
+        warmup.run()
+        assert get(srv) == (200, "ready")
+
+    def test_failure_is_reported(self, server):
+        def broken():
+            raise RuntimeError("boom")
+
+        warmup = Warmup([("load u2net", broken)])
+        warmup.run()
+
+        assert get(server(warmup)) == (503, "failed: load u2net: boom")
+
+    def test_other_paths_are_not_found(self, server):
+        warmup = Warmup([])
+        warmup.run()
+
+        assert get(server(warmup), "/health")[0] == 404
+
+    def test_metrics_are_served(self, server):
+        from bg_remove_core.metrics import Counter, Registry
+
+        registry = Registry()
+        registry.register(Counter("jobs_total", "Jobs.")).inc()
+
+        srv = server(registry=registry)
+        status, body = get(srv, "/metrics")
+
+        assert status == 200
+        assert body.endswith("# TYPE jobs_total counter\njobs_total 1")
+        assert srv.server_address[0] == "127.0.0.1"
+        assert get(srv, "/ready")[0] == 404
+
+    def test_metrics_are_not_served_with_readiness(self, server):
+        warmup = Warmup([])
+        warmup.run()
+
+        assert get(server(warmup), "/metrics")[0] == 404
+
+
+class TestWarmupSteps:
+    """Tests for choosing what to warm up."""
+
+    def test_default_and_preview_models(self, mock_env):
+        from bg_remove_core import settings
+
+        assert settings.warmup_models() == [
+            settings.MODEL_NAME,
+            settings.PREVIEW_MODEL_NAME,
+        ]
+
+    def test_process_backend_warms_the_pool(self, mock_env):
+        from bg_remove_core import settings
+
+        with patch.object(settings, "INFERENCE_BACKEND", "process"):
+            steps = settings.warmup_steps()
+
+        assert steps[-1][0].startswith("start ")
+
+        # One image per worker, so every worker loads the default model
+        pool = MagicMock()
+        with patch.object(settings, "inference_pool", return_value=pool):
+            steps[-1][1]()
+        assert len(pool.predict_masks.call_args.args[0]) == settings.PROCESS_WORKERS
+
+    def test_only_preview_model_in_process_with_process_backend(self, mock_env):
+        from bg_remove_core import settings
+
+        with patch.object(settings, "INFERENCE_BACKEND", "process"):
+            assert settings.warmup_models() == [settings.PREVIEW_MODEL_NAME]
+
+    def test_limited_to_loaded_sessions(self, mock_env):
+        from bg_remove_core import settings
+
+        with patch.object(settings, "MAX_MODEL_SESSIONS", 1):
+            assert settings.warmup_models() == [settings.MODEL_NAME]
+
+    def test_no_preview(self, mock_env):
+        from bg_remove_core import settings
+
+        with patch.object(settings, "PREVIEW_MODEL_NAME", ""):
+            assert settings.warmup_models() == [settings.MODEL_NAME]
+
+    def test_steps_run_a_dummy_inference_on_shared_sessions(self, mock_env):
+        from bg_remove_core import settings
+
+        registry = MagicMock()
+        with patch.object(settings, "model_registry", return_value=registry):
+            with patch.object(settings, "predict_masks") as mock_predict:
+                for _, step in settings.warmup_steps():
+                    step()
+
+        assert [
+            c.args[0] for c in registry.get.call_args_list
+        ] == settings.warmup_models()
+        assert mock_predict.call_count == len(settings.warmup_models())
+
+    def test_app_uses_the_warmed_registry(self, mock_env):
+        from bg_remove_core import settings
+
+        assert mock_env["module"].get_model_registry() is settings.model_registry()
+
+
+class TestLauncher:
+    """Tests for serve.py."""
+
+    @pytest.fixture
+    def serve(self, mock_env):
+        stcli = MagicMock()
+        modules = {"streamlit.web": MagicMock(cli=stcli), "streamlit.web.cli": stcli}
+        with patch.dict(sys.modules, modules):
+            sys.modules.pop("serve", None)
+            import serve
+
+            yield serve, stcli
+        sys.modules.pop("serve", None)
+
+    def test_starts_warmup_and_runs_streamlit(self, serve):
+        serve, stcli = serve
+        warmup = MagicMock()
+
+        with patch.object(serve, "Warmup", return_value=warmup) as mock_warmup:
+            with patch.object(serve, "serve_readiness") as mock_serve:
+                with patch.object(serve, "serve_metrics") as mock_metrics:
+                    with patch.object(serve, "warmup_steps", return_value=["step"]):
+                        with patch.object(sys, "argv", ["serve.py"]):
+                            serve.main(["--server.port=8501"])
+                            argv = sys.argv
+
+        mock_warmup.assert_called_once_with(["step"])
+        mock_serve.assert_called_once_with(warmup, serve.READINESS_PORT)
+        mock_metrics.assert_called_once_with(serve.METRICS_PORT, "127.0.0.1")
+        warmup.start.assert_called_once()
+        stcli.main.assert_called_once()
+        assert argv == ["streamlit", "run", serve.APP, "--server.port=8501"]
+
+    def test_warmup_can_be_disabled(self, serve):
+        serve, _ = serve
+
+        with patch.object(serve, "WARMUP", False):
+            with patch.object(serve, "Warmup") as mock_warmup:
+                with patch.object(serve, "serve_readiness"):
+                    with patch.object(serve, "serve_metrics"):
+                        with patch.object(sys, "argv", ["serve.py"]):
+                            serve.main([])
+
+        mock_warmup.assert_called_once_with([])
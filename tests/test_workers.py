@@ -0,0 +1,135 @@
+"""Tests for the process-pool inference backend."""
+
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+
+class InlineExecutor:
+    """Runs submitted work immediately in the calling process."""
+
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args):
+        self.calls.append(args)
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def _rgb_image(width, height):
+    img = MagicMock()
+    img.size = (width, height)
+    img.width = width
+    img.height = height
+    img.convert.return_value = img
+    img.tobytes.return_value = bytes(range(3)) * (width * height)
+    return img
+
+
+class TestSegmentShared:
+    """Tests for the worker-side task."""
+
+    def test_writes_mask_into_shared_memory(self, mock_env):
+        from bg_remove_core import workers
+
+        pixels = shared_memory.SharedMemory(create=True, size=4 * 2 * 3)
+        mask = shared_memory.SharedMemory(create=True, size=4 * 2)
+        try:
+            pixels.buf[:24] = bytes(range(24))
+            fake_mask = MagicMock()
+            fake_mask.tobytes.return_value = bytes([200] * 8)
+
+            with patch.object(
+                workers, "predict_masks", return_value=[fake_mask]
+            ) as mock_predict:
+                workers._segment_shared(pixels.name, mask.name, (4, 2))
+
+            frombytes_args = mock_env["image_module"].frombytes.call_args.args
+            assert frombytes_args[0] == "RGB"
+            assert frombytes_args[1] == (4, 2)
+            mock_predict.assert_called_once()
+            assert bytes(mask.buf[:8]) == bytes([200] * 8)
+        finally:
+            for block in (pixels, mask):
+                block.close()
+                block.unlink()
+
+
+class TestInferencePool:
+    """Tests for the parent-side pool wrapper."""
+
+    def test_round_trips_masks_and_frees_shared_memory(self, mock_env):
+        from bg_remove_core import workers
+
+        pool = workers.InferencePool(workers=2, ort_threads=1)
+        executor = InlineExecutor()
+        fake_mask = MagicMock()
+        fake_mask.tobytes.side_effect = lambda: bytes([9] * 6)
+
+        with patch.object(pool, "_get_executor", return_value=executor):
+            with patch.object(workers, "predict_masks", return_value=[fake_mask]):
+                masks = pool.predict_masks([_rgb_image(3, 2), _rgb_image(3, 2)])
+
+        assert len(masks) == 2
+        names = [args[0] for args in executor.calls] + [
+            args[1] for args in executor.calls
+        ]
+        assert len(set(names)) == 4
+        for name in names:
+            with pytest.raises(FileNotFoundError):
+                shared_memory.SharedMemory(name=name)
+
+    def test_broken_pool_is_replaced(self, mock_env):
+        from bg_remove_core import workers
+
+        pool = workers.InferencePool()
+        broken = MagicMock()
+        failed = Future()
+        failed.set_exception(BrokenProcessPool("worker died"))
+        broken.submit.return_value = failed
+        pool._executor = broken
+
+        with pytest.raises(BrokenProcessPool):
+            pool.predict_masks([_rgb_image(2, 2)])
+
+        assert pool._executor is None
+        broken.shutdown.assert_called_once()
+
+    def test_worker_count_is_at_least_one(self, mock_env):
+        from bg_remove_core import workers
+
+        assert workers.InferencePool(workers=0).workers == 1
+
+
+class TestBackendSelection:
+    """Tests for choosing the inference backend in process_image."""
+
+    def test_process_backend_uses_pool(self, mock_env):
+        from bg_remove_core import processing
+
+        pool = MagicMock()
+        pool.predict_masks.return_value = ["mask"]
+
+        with patch.object(processing, "INFERENCE_BACKEND", "process"):
+            with patch.object(processing, "inference_pool", return_value=pool):
+                with patch.object(processing, "remove") as mock_remove:
+                    masks = processing.predict_masks_for(["image"])
+
+        pool.predict_masks.assert_called_once_with(["image"])
+        mock_remove.assert_not_called()
+        assert masks == ["mask"]
+
+    def test_thread_backend_is_default(self, mock_env):
+        from bg_remove_core import settings
+
+        assert settings.INFERENCE_BACKEND == "thread"
+        assert settings.PROCESS_WORKERS >= 1
+        assert settings.WORKER_ORT_THREADS >= 1